@@ -1,21 +1,24 @@
 import json
 import os
+from functools import lru_cache
 from config import CarApiConfig
 import aiohttp
 
 
-# Загрузка мок-данных из файла
+# Мок-данные из файла: загружаются при первом обращении, а не при импорте
 MOCK_DATA_PATH = os.path.join(os.path.dirname(__file__), "mock_obd2.json")
 
-try:
-    with open(MOCK_DATA_PATH, "r", encoding="utf-8") as f:
-        MOCK_RESPONSES = json.load(f)
-except FileNotFoundError:
-    MOCK_RESPONSES = {}
-    print(f"Файл мок-данных не найден: {MOCK_DATA_PATH}")
-except json.JSONDecodeError as e:
-    MOCK_RESPONSES = {}
-    print(f"Ошибка чтения JSON в {MOCK_DATA_PATH}: {e}")
+
+@lru_cache(maxsize=1)
+def get_mock_responses() -> dict:
+    try:
+        with open(MOCK_DATA_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Файл мок-данных не найден: {MOCK_DATA_PATH}")
+    except json.JSONDecodeError as e:
+        print(f"Ошибка чтения JSON в {MOCK_DATA_PATH}: {e}")
+    return {}
 
 
 async def decode_obd2_code(code: str) -> dict | None:
@@ -30,7 +33,7 @@ async def decode_obd2_code(code: str) -> dict | None:
 
     # Если включён мок — возвращаем локальные данные
     if CarApiConfig.USE_MOCK_API:
-        return MOCK_RESPONSES.get(code)
+        return get_mock_responses().get(code)
 
     # Иначе — идём в настоящий API
     url = f"{CarApiConfig.BASE_URL}{code}"
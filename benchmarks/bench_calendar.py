@@ -0,0 +1,73 @@
+"""
+Бенчмарк отрисовки календаря записи при навигации по 24 месяцам.
+
+Сравнивает:
+- "холодный" проход — кэши каркасов и кнопок очищаются перед каждой отрисовкой
+  (эквивалент прежней сборки всех ~45 кнопок с нуля);
+- "тёплый" проход — мастер листает те же месяцы повторно, каркасы и кнопки берутся из кэша.
+
+Запуск:
+    python -m benchmarks.bench_calendar [--rounds 200]
+"""
+
+import argparse
+import random
+import time
+from datetime import date
+
+from keybords import keybords as kb
+
+
+def _months(count: int) -> list[tuple[int, int]]:
+    """Последовательность (год, месяц) от текущего месяца вперёд."""
+    today = date.today()
+    year, month = today.year, today.month
+    result = []
+    for _ in range(count):
+        result.append((year, month))
+        month += 1
+        if month == 13:
+            year, month = year + 1, 1
+    return result
+
+
+def _clear_caches():
+    kb._calendar_skeleton.cache_clear()
+    kb._calendar_user_buttons.cache_clear()
+
+
+def _navigate(months, busy, user_id: int, cold: bool) -> float:
+    started = time.perf_counter()
+    for year, month in months:
+        if cold:
+            _clear_caches()
+        kb.generate_calendar_buttons(user_id, year, month, busy[(year, month)])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=24, help="Глубина навигации в месяцах")
+    parser.add_argument("--rounds", type=int, default=200, help="Количество проходов навигации")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    months = _months(args.months)
+    busy = {ym: {random.randint(1, 28) for _ in range(random.randint(0, 8))} for ym in months}
+    user_id = random.randint(10 ** 8, 10 ** 10)
+    renders = args.months * args.rounds
+
+    cold = sum(_navigate(months, busy, user_id, cold=True) for _ in range(args.rounds))
+    _clear_caches()
+    _navigate(months, busy, user_id, cold=False)  # прогрев
+    warm = sum(_navigate(months, busy, user_id, cold=False) for _ in range(args.rounds))
+
+    print(f"Месяцев: {args.months}, проходов: {args.rounds}, отрисовок: {renders}")
+    print(f"Холодная отрисовка (без кэша): {cold / renders * 1e6:8.2f} мкс/месяц")
+    print(f"Тёплая отрисовка (кэш):        {warm / renders * 1e6:8.2f} мкс/месяц")
+    print(f"Ускорение: x{cold / warm:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Нагрузочный тест многопроцессного режима (cluster): пропускная способность обработчиков
+при 1, 2, 4… воркерах.
+
+Для каждого числа воркеров поднимаются:
+- заглушка Bot API (`benchmarks.fake_bot_api`) — сеть Telegram не участвует;
+- `cluster.ingress --spawn N` на временной базе из `benchmarks.seed_data` (FSM_STORAGE=db);
+затем на webhook ingress отправляется `--updates` апдейтов от `--chats` разных чатов
+(/start, /help и callback «Прайс» зарегистрированных пользователей), и измеряется время
+до их полной обработки воркерами.
+
+Масштабирование близко к линейному, пока воркеров не больше свободных ядер: ingress, заглушка
+API и генератор нагрузки тоже занимают процессор. На одноядерной машине прироста не будет.
+
+Запуск:
+    python -m benchmarks.bench_cluster [--workers 1 2 4] [--updates 3000] [--chats 500]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from benchmarks.seed_data import TG_ID_BASE, masters_count, seed_database, volumes
+
+INGRESS_PORT = 18080
+FAKE_API_PORT = 18081
+WORKER_BASE_PORT = 18100
+
+
+def _make_updates(count: int, chats: int, users: int, seed: int) -> List[dict]:
+    rnd = random.Random(seed)
+    first_client = TG_ID_BASE + 1 + masters_count(users)
+    chat_ids = [first_client + rnd.randrange(users - (first_client - TG_ID_BASE)) for _ in range(chats)]
+    updates = []
+    for update_id in range(1, count + 1):
+        chat_id = rnd.choice(chat_ids)
+        user = {"id": chat_id, "is_bot": False, "first_name": "Load"}
+        chat = {"id": chat_id, "type": "private", "first_name": "Load"}
+        kind = rnd.random()
+        if kind < 0.4:
+            text = "/start" if kind < 0.25 else "/help"
+            updates.append({"update_id": update_id, "message": {
+                "message_id": update_id, "date": int(time.time()), "chat": chat, "from": user, "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            }})
+        else:
+            updates.append({"update_id": update_id, "callback_query": {
+                "id": str(update_id), "from": user, "chat_instance": str(chat_id), "data": "price",
+                "message": {"message_id": update_id, "date": int(time.time()), "chat": chat, "text": "menu"},
+            }})
+    return updates
+
+
+async def _wait_http(http: aiohttp.ClientSession, url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with http.get(url) as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} не ответил за {timeout} с")
+
+
+async def _stats(http: aiohttp.ClientSession) -> List[Dict]:
+    async with http.get(f"http://127.0.0.1:{INGRESS_PORT}/stats") as resp:
+        return (await resp.json())["workers"]
+
+
+async def _run_load(updates: List[dict], concurrency: int) -> Dict[str, float]:
+    async with aiohttp.ClientSession() as http:
+        await _wait_http(http, f"http://127.0.0.1:{INGRESS_PORT}/health")
+        queue = iter(updates)
+
+        async def sender():
+            for update in queue:
+                async with http.post(f"http://127.0.0.1:{INGRESS_PORT}/webhook", json=update) as resp:
+                    resp.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        sent = time.perf_counter() - started
+        while True:
+            workers = await _stats(http)
+            done = sum(w.get("processed", 0) + w.get("failed", 0) for w in workers)
+            if done >= len(updates):
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        return {
+            "elapsed": elapsed,
+            "sent": sent,
+            "failed": sum(w.get("failed", 0) for w in workers),
+            "per_worker": [w.get("processed", 0) for w in workers],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32, help="Одновременных запросов генератора")
+    parser.add_argument("--scale", type=float, default=0.05, help="Масштаб тестовой базы")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    counts = volumes(args.scale)
+    updates = _make_updates(args.updates, args.chats, counts["users"], args.seed)
+    print(f"Ядер: {os.cpu_count()}, апдейтов: {args.updates}, чатов: {args.chats}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="autofix_cluster_") as tmp_dir:
+        env = dict(
+            os.environ,
+            API_TOKEN=os.environ.get("API_TOKEN", "123456:LOADTEST"),
+            ADMIN_ID=os.environ.get("ADMIN_ID", str(TG_ID_BASE)),
+            FSM_STORAGE="db",
+            TELEGRAM_API_URL=f"http://127.0.0.1:{FAKE_API_PORT}",
+            INGRESS_PORT=str(INGRESS_PORT),
+            CLUSTER_WORKER_BASE_PORT=str(WORKER_BASE_PORT),
+            METRICS_PORT="",
+        )
+        fake_api = subprocess.Popen([sys.executable, "-m", "benchmarks.fake_bot_api", "--port", str(FAKE_API_PORT)])
+        try:
+            for workers in args.workers:
+                env["DB_PATH"] = os.path.join(tmp_dir, f"bench_{workers}.db")
+                seed_database(env["DB_PATH"], scale=args.scale, seed=args.seed)
+                ingress = subprocess.Popen(
+                    [sys.executable, "-m", "cluster.ingress", "--spawn", str(workers), "--port", str(INGRESS_PORT)],
+                    env=env,
+                )
+                try:
+                    result = asyncio.run(_run_load(updates, args.concurrency))
+                finally:
+                    ingress.terminate()
+                    ingress.wait()
+                results[workers] = result
+                print(f"Воркеров: {workers}: {args.updates / result['elapsed']:8.0f} апдейтов/с "
+                      f"(время {result['elapsed']:.2f} с, ошибок {result['failed']}, "
+                      f"по воркерам {result['per_worker']})")
+        finally:
+            fake_api.terminate()
+            fake_api.wait()
+
+    base = min(results)
+    print("\nМасштабирование относительно", base, "воркера(ов):")
+    for workers, result in results.items():
+        speedup = results[base]["elapsed"] / result["elapsed"]
+        print(f"  {workers}: x{speedup:.2f} (идеал x{workers / base:.0f}, эффективность {speedup / (workers / base):.0%})")
+
+
+if __name__ == "__main__":
+    main()
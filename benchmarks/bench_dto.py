@@ -0,0 +1,108 @@
+"""
+Память и время построения объектов строк: словари (как раньше в database.requests)
+против DTO со __slots__ (database.dto), а для записей — и против ORM-сущностей.
+
+Строки один раз читаются Core-запросом из временной базы (`benchmarks.seed_data`), затем
+для каждого варианта N раз строится список объектов. Память — прирост tracemalloc на
+живой список (байт на строку), время — лучший из `--repeat` проходов (нс на строку).
+
+Запуск:
+    python -m benchmarks.bench_dto [--scale 0.2] [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from benchmarks.seed_data import seed_database
+from database.dto import AppointmentRow, OrderRow, UserRow
+from database.models import Appointment, Orders, User
+from database.requests import APPOINTMENT_FIELDS, ORDER_FIELDS
+
+
+def _order_dict(row) -> dict:
+    # Прежний формат get_orders_by_user
+    order = dict(zip(ORDER_FIELDS, row))
+    order["date"] = order["date"].isoformat() if order["date"] else "не указана"
+    return order
+
+
+def _appointment_orm_dict(appt: Appointment) -> dict:
+    # Прежний get_filter_appointments: ORM-сущность, затем словарь
+    return {
+        "id": appt.id,
+        "tg_id_user": appt.tg_id_user,
+        "tg_id_master": appt.tg_id_master,
+        "appointment_date": appt.appointment_date,
+        "appointment_time": appt.appointment_time,
+        "end_time": appt.end_time,
+    }
+
+
+def _measure(build: Callable[[], List[Any]], rows: int, repeat: int) -> Tuple[float, float]:
+    """(байт на строку, нс на строку)"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build()
+        best = min(best, time.perf_counter() - started)
+    return (after - before) / rows, best / rows * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.2)
+    parser.add_argument("--rows", type=int, default=20000, help="Строк каждого вида")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed_database(db_path, scale=args.scale, seed=args.seed)
+        engine = create_engine(f"sqlite:///{db_path}")
+        with engine.connect() as conn:
+            order_rows = conn.execute(select(*[getattr(Orders, n) for n in ORDER_FIELDS]).limit(args.rows)).all()
+            appt_rows = conn.execute(
+                select(*[getattr(Appointment, n) for n in APPOINTMENT_FIELDS], User.user_name, User.contact)
+                .outerjoin(User, User.tg_id == Appointment.tg_id_user)
+                .limit(args.rows)
+            ).all()
+            user_rows = conn.execute(select(*[getattr(User, n) for n in UserRow.__slots__]).limit(args.rows)).all()
+
+        def orm_appointments():
+            with Session(engine) as session:
+                return [_appointment_orm_dict(a) for a in session.scalars(select(Appointment).limit(args.rows))]
+
+        cases = [
+            ("order", "dict", len(order_rows), lambda: [_order_dict(r) for r in order_rows]),
+            ("order", "OrderRow", len(order_rows), lambda: [OrderRow.from_row(r) for r in order_rows]),
+            ("appointment", "dict(row._mapping)", len(appt_rows), lambda: [dict(r._mapping) for r in appt_rows]),
+            ("appointment", "AppointmentRow", len(appt_rows), lambda: [AppointmentRow.from_row(r) for r in appt_rows]),
+            ("appointment", "ORM + dict (incl. query)", len(appt_rows), orm_appointments),
+            ("user", "dict", len(user_rows), lambda: [dict(zip(UserRow.__slots__, r)) for r in user_rows]),
+            ("user", "UserRow", len(user_rows), lambda: [UserRow.from_row(r) for r in user_rows]),
+        ]
+
+        print(f"{'row':<12} {'variant':<26} {'rows':>7} {'B/row':>8} {'ns/row':>8}")
+        for kind, variant, rows, build in cases:
+            per_row_bytes, per_row_ns = _measure(build, rows, args.repeat)
+            print(f"{kind:<12} {variant:<26} {rows:>7} {per_row_bytes:>8.0f} {per_row_ns:>8.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
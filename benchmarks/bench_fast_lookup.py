@@ -0,0 +1,124 @@
+"""
+Быстрый путь чтения роли и имени пользователя (database/fast_lookup.py) против ORM-пути.
+
+На временной базе (`benchmarks.seed_data`) одни и те же вызовы выполняются дважды —
+с `Config.DB_FAST_LOOKUP` выключенным и включённым:
+- get_user_role — как в BlockUserMiddleware на каждый апдейт;
+- get_user_dict[user_name] — без загрузчика апдейта (фоновые задачи);
+- loader[user_name] — через UserLoader, как в обработчиках (пакет из одного tg_id).
+
+Результаты обоих путей сравниваются поэлементно (включая несуществующие tg_id и
+заблокированных пользователей); при расхождении бенчмарк завершается с ошибкой.
+
+Запуск:
+    python -m benchmarks.bench_fast_lookup [--scale 0.05] [--calls 3000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import database.requests as rq
+from benchmarks.seed_data import TG_ID_BASE, seed_database, volumes
+from config import Config
+from database.engine import SQLITE_CACHED_STATEMENTS
+from database.fast_lookup import FastLookup
+from database.loaders import UserLoader, current_user_loader
+
+
+async def _via_loader(tg_id: int) -> Any:
+    token = current_user_loader.set(UserLoader(rq.get_users_dict_batch, list(rq.USER_COLUMNS)))
+    try:
+        return await rq.get_user_dict(tg_id, ["user_name"])
+    finally:
+        current_user_loader.reset(token)
+
+
+CASES: Dict[str, Callable[[int], Awaitable[Any]]] = {
+    "get_user_role": rq.get_user_role,
+    "get_user_dict[user_name]": lambda tg_id: rq.get_user_dict(tg_id, ["user_name"]),
+    "loader[user_name]": _via_loader,
+}
+
+
+async def _run_case(call: Callable[[int], Awaitable[Any]], tg_ids: List[int]) -> Dict[str, Any]:
+    for tg_id in tg_ids[:100]:
+        await call(tg_id)
+    results, timings = [], []
+    for tg_id in tg_ids:
+        started = time.perf_counter()
+        results.append(await call(tg_id))
+        timings.append(time.perf_counter() - started)
+    return {"results": results, "mean": statistics.fmean(timings), "median": statistics.median(timings)}
+
+
+async def run(db_path: str, tg_ids: List[int]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", connect_args={"cached_statements": SQLITE_CACHED_STATEMENTS}
+    )
+    rq.async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    rq.fast_lookup = FastLookup(db_path)
+    # Заблокированные пользователи: их роль должна совпадать на обоих путях
+    for tg_id in tg_ids[:20]:
+        await rq.update_user(tg_id, "role", "blocked")
+
+    results = {}
+    saved = Config.DB_FAST_LOOKUP
+    try:
+        for name, call in CASES.items():
+            Config.DB_FAST_LOOKUP = False
+            orm = await _run_case(call, tg_ids)
+            Config.DB_FAST_LOOKUP = True
+            fast = await _run_case(call, tg_ids)
+            if orm["results"] != fast["results"]:
+                diff = next(i for i, (a, b) in enumerate(zip(orm["results"], fast["results"])) if a != b)
+                raise SystemExit(f"{name}: результаты расходятся для tg_id={tg_ids[diff]}: "
+                                 f"{orm['results'][diff]!r} != {fast['results'][diff]!r}")
+            results[name] = {"orm": orm, "fast": fast}
+    finally:
+        Config.DB_FAST_LOOKUP = saved
+        await rq.fast_lookup.close()
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.05)
+    parser.add_argument("--calls", type=int, default=3000, help="Вызовов каждой функции на каждом пути")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    users = volumes(args.scale)["users"]
+    # ~5% несуществующих tg_id: первое обращение незарегистрированного пользователя
+    tg_ids = [
+        TG_ID_BASE + rnd.randrange(users) if rnd.random() > 0.05 else TG_ID_BASE + users + rnd.randrange(1000)
+        for _ in range(args.calls)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed_database(db_path, scale=args.scale, seed=args.seed)
+        results = asyncio.run(run(db_path, tg_ids))
+
+    print(f"{'function':<26} {'orm, мкс':>16} {'fast, мкс':>16} {'speedup':>8}")
+    print(f"{'':<26} {'mean':>8}{'median':>8} {'mean':>8}{'median':>8}")
+    for name, r in results.items():
+        orm, fast = r["orm"], r["fast"]
+        print(
+            f"{name:<26} {orm['mean'] * 1e6:>8.0f}{orm['median'] * 1e6:>8.0f} "
+            f"{fast['mean'] * 1e6:>8.0f}{fast['median'] * 1e6:>8.0f} {orm['median'] / fast['median']:>7.1f}x"
+        )
+    print(f"Результаты совпадают: {len(tg_ids)} вызовов на функцию")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Накладные расходы Python на горячие запросы database.requests (роль, профиль, проверки записей).
+
+Для каждого запроса на одной и той же временной базе (`benchmarks.seed_data`) измеряется
+среднее время вызова, мкс:
+- sqlite3 — тот же SQL через синхронный sqlite3 с готовым курсором: чистая работа SQLite;
+- inline — прежний способ: select() строится на каждый вызов и выполняется через session.execute;
+- prepared — готовый запрос (database.requests, bindparam) на Core-соединении той же сессии;
+- call — полный вызов функции rq.* (сессия из пула, транзакция, учёт в db_function_stats).
+
+overhead — доля call, приходящаяся не на SQLite: (call − sqlite3) / call.
+Асинхронные варианты включают проход через поток aiosqlite — это часть стоимости нажатия кнопки.
+
+Запуск:
+    python -m benchmarks.bench_hot_queries [--scale 0.05] [--calls 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import database.requests as rq
+from benchmarks.seed_data import TG_ID_BASE, masters_count, seed_database, volumes
+from database.engine import SQLITE_CACHED_STATEMENTS
+from database.models import Appointment, Orders, User
+
+PROFILE_FIELDS = ("user_name", "contact", "brand_auto", "model_auto")
+
+
+def _inline_cases() -> Dict[str, Callable[[Any, Dict[str, Any]], Awaitable[Any]]]:
+    """Прежние реализации: построение select() на каждый вызов."""
+
+    async def role(session, p):
+        return (await session.execute(select(User.role).where(User.tg_id == p["tg_id"]))).scalar()
+
+    async def profile(session, p):
+        columns = [getattr(User, name) for name in PROFILE_FIELDS]
+        row = (await session.execute(select(*columns).where(User.tg_id == p["tg_id"]))).fetchone()
+        return dict(zip(PROFILE_FIELDS, row)) if row else None
+
+    async def has_appointment(session, p):
+        stmt = select(Appointment.id).where(Appointment.tg_id_user == p["tg_id"]).limit(1)
+        return (await session.execute(stmt)).scalar() is not None
+
+    async def active_order(session, p):
+        stmt = select(Orders.id).where(
+            Orders.tg_id_user == p["tg_id_user"],
+            Orders.tg_id_master == p["tg_id_master"],
+            Orders.repair_status == "in_work"
+        )
+        return (await session.execute(stmt)).scalar()
+
+    return {"role": role, "profile": profile, "has_appointment": has_appointment, "active_order": active_order}
+
+
+def _prepared_cases():
+    """Готовые запросы database.requests: (запрос, разбор результата)."""
+
+    def profile(result):
+        row = result.fetchone()
+        return dict(zip(PROFILE_FIELDS, row)) if row else None
+
+    return {
+        "role": (rq._USER_ROLE_STMT, lambda r: r.scalar()),
+        "profile": (rq._user_fields_stmt(PROFILE_FIELDS), profile),
+        "has_appointment": (rq._HAS_APPOINTMENT_STMT, lambda r: r.scalar() is not None),
+        "active_order": (rq._ACTIVE_ORDER_ID_STMT, lambda r: r.scalar()),
+    }
+
+
+def _calls():
+    """Полные вызовы функций rq.*"""
+    return {
+        "role": lambda p: rq.get_user_role(p["tg_id"]),
+        "profile": lambda p: rq._fetch_user_dict(p["tg_id"], list(PROFILE_FIELDS)),
+        "has_appointment": lambda p: rq.has_active_appointment(p["tg_id"]),
+        "active_order": lambda p: rq.get_active_order_id(p["tg_id_user"], p["tg_id_master"]),
+    }
+
+
+def _params(counts: Dict[str, int], calls: int, seed: int) -> Dict[str, List[Dict[str, Any]]]:
+    rnd = random.Random(seed)
+    n_masters = masters_count(counts["users"])
+
+    def client() -> int:
+        return rnd.randrange(TG_ID_BASE + 1 + n_masters, TG_ID_BASE + counts["users"])
+
+    clients = [client() for _ in range(calls)]
+    masters = [TG_ID_BASE + 1 + rnd.randrange(n_masters) for _ in range(calls)]
+    by_client = [{"tg_id": c} for c in clients]
+    return {
+        "role": by_client,
+        "profile": by_client,
+        "has_appointment": by_client,
+        "active_order": [{"tg_id_user": c, "tg_id_master": m} for c, m in zip(clients, masters)],
+    }
+
+
+def _sqlite_baseline(db_path: str, stmt, params: List[Dict[str, Any]]) -> float:
+    """Средняя стоимость выполнения SQL в sqlite3 без SQLAlchemy, мкс."""
+    compiled = stmt.compile(dialect=sqlite.dialect())
+    sql = str(compiled)
+    # Порядок позиционных параметров — как в скомпилированном запросе
+    order = compiled.positiontup
+    conn = sqlite3.connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS)
+    try:
+        cursor = conn.cursor()
+        rows = [tuple(p.get(name, compiled.params[name]) for name in order) for p in params]
+        started = time.perf_counter()
+        for values in rows:
+            cursor.execute(sql, values).fetchone()
+        return (time.perf_counter() - started) / len(rows) * 1e6
+    finally:
+        conn.close()
+
+
+async def _time_async(call: Callable[[Dict[str, Any]], Awaitable[Any]], params: List[Dict[str, Any]]) -> float:
+    for p in params[:50]:
+        await call(p)
+    started = time.perf_counter()
+    for p in params:
+        await call(p)
+    return (time.perf_counter() - started) / len(params) * 1e6
+
+
+async def run(db_path: str, params: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, float]]]:
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", connect_args={"cached_statements": SQLITE_CACHED_STATEMENTS}
+    )
+    rq.async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    inline, prepared, calls = _inline_cases(), _prepared_cases(), _calls()
+    results = []
+    try:
+        for name, case_params in params.items():
+            stmt, unpack = prepared[name]
+            async with rq.async_session() as session:
+                # Оба варианта обязаны давать одинаковый результат
+                for p in case_params[:200]:
+                    assert await inline[name](session, p) == unpack(await rq._execute_prepared(session, stmt, p)), name
+
+                async def run_prepared(p, session=session, stmt=stmt, unpack=unpack):
+                    return unpack(await rq._execute_prepared(session, stmt, p))
+
+                inline_us = await _time_async(lambda p, session=session: inline[name](session, p), case_params)
+                prepared_us = await _time_async(run_prepared, case_params)
+            results.append((name, {
+                "sqlite3": _sqlite_baseline(db_path, stmt, case_params),
+                "inline": inline_us,
+                "prepared": prepared_us,
+                "call": await _time_async(calls[name], case_params),
+            }))
+    finally:
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.05)
+    parser.add_argument("--calls", type=int, default=2000, help="Вызовов каждого запроса")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed_database(db_path, scale=args.scale, seed=args.seed)
+        params = _params(volumes(args.scale), args.calls, args.seed)
+        results = asyncio.run(run(db_path, params))
+
+    print(f"{'query':<16} {'sqlite3':>9} {'inline':>9} {'prepared':>9} {'call':>9} {'overhead':>9}   (мкс на вызов)")
+    for name, r in results:
+        overhead = (r["call"] - r["sqlite3"]) / r["call"]
+        print(f"{name:<16} {r['sqlite3']:>9.1f} {r['inline']:>9.1f} {r['prepared']:>9.1f} {r['call']:>9.1f} {overhead:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
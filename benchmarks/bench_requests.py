@@ -0,0 +1,250 @@
+"""
+Бенчмарк функций database.requests на реалистичном объёме данных.
+
+Временная SQLite-база наполняется `benchmarks.seed_data` (при scale=1.0 — 50k пользователей,
+200k заказов, 100k записей, 50k диагностик), после чего каждая публичная функция чтения
+(и save_api_dtc_record с её проверкой дубликатов через LIKE) вызывается `--repeat` раз.
+Результаты (min/median/mean/p95, мс) печатаются и при необходимости сохраняются в JSON.
+
+Режим сравнения с базовой линией: `--compare baseline.json` печатает отношение медиан
+и завершается с кодом 1, если какая-либо функция медленнее базовой более чем в `--threshold` раз.
+
+Запуск:
+    python -m benchmarks.bench_requests [--scale 1.0] [--repeat 20] [--json out.json]
+    python -m benchmarks.bench_requests --db /tmp/bench.db --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import database.requests as rq
+from benchmarks.seed_data import TG_ID_BASE, masters_count, seed_database, volumes
+
+# Фабрика вызова: (генератор случайных чисел, номер итерации) -> корутина
+CaseFn = Callable[[random.Random, int], Awaitable[Any]]
+
+
+def _cases(counts: Dict[str, int]) -> List[Tuple[str, CaseFn]]:
+    """Набор измеряемых вызовов; идентификаторы выбираются из засеянных диапазонов."""
+    n_masters = masters_count(counts["users"])
+    admin = TG_ID_BASE
+
+    def client(rnd: random.Random) -> int:
+        return rnd.randrange(TG_ID_BASE + 1 + n_masters, TG_ID_BASE + counts["users"])
+
+    def master(rnd: random.Random) -> int:
+        return TG_ID_BASE + 1 + rnd.randrange(n_masters)
+
+    def order_id(rnd: random.Random) -> int:
+        return rnd.randint(1, counts["orders"])
+
+    def day(rnd: random.Random) -> date:
+        return date.today() + timedelta(days=rnd.randint(-30, 30))
+
+    # Уникальный префикс, чтобы на переиспользуемой базе (--db) коды не становились дубликатами
+    run_tag = f"{int(time.time()) % 100000:05d}"
+    profile_fields = ["user_name", "contact", "brand_auto", "model_auto"]
+
+    return [
+        # USER
+        ("get_user_role", lambda r, i: rq.get_user_role(client(r))),
+        ("get_user_dict", lambda r, i: rq.get_user_dict(client(r))),
+        ("get_user_dict[fields]", lambda r, i: rq.get_user_dict(client(r), profile_fields)),
+        ("get_user_by_tg_id", lambda r, i: rq.get_user_by_tg_id(client(r))),
+        ("get_user_dict_by_id", lambda r, i: rq.get_user_dict_by_id(r.randint(1, counts["users"]))),
+        ("get_users_dict_batch[50]", lambda r, i: rq.get_users_dict_batch(
+            [client(r) for _ in range(50)], profile_fields)),
+        ("get_all_masters", lambda r, i: rq.get_all_masters(exclude_tg_id=admin)),
+        ("search_users[name]", lambda r, i: rq.search_users(f"user{r.randint(1, 999)}")),
+        ("search_users[phone]", lambda r, i: rq.search_users(f"{r.randint(0, 9999):04d}")),
+        ("search_users[vin]", lambda r, i: rq.search_users(f"{r.randint(0, counts['users'] - 1):06d}")),
+        ("get_all_active_user_ids", lambda r, i: rq.get_all_active_user_ids()),
+        ("can_mess_true", lambda r, i: rq.can_mess_true()),
+        # COMMENTS
+        ("get_visible_comments[user]", lambda r, i: rq.get_visible_comments("user")),
+        ("get_visible_comments[all]", lambda r, i: rq.get_visible_comments("all")),
+        # ORDERS
+        ("all_orders_by_user", lambda r, i: rq.all_orders_by_user(client(r))),
+        ("get_active_order_id", lambda r, i: rq.get_active_order_id(client(r), master(r))),
+        ("get_orders_by_user[user]", lambda r, i: rq.get_orders_by_user(tg_id_user=client(r))),
+        ("get_orders_by_user[master]", lambda r, i: rq.get_orders_by_user(tg_id_master=master(r))),
+        ("get_orders_by_user[master,closed]", lambda r, i: rq.get_orders_by_user(
+            tg_id_master=master(r), active=False)),
+        ("get_orders_by_user[master,closed,fields]", lambda r, i: rq.get_orders_by_user(
+            tg_id_master=master(r), active=False, fields=["id", "brand_auto", "model_auto", "year_auto"])),
+        ("get_orders_by_user[master,closed,count]", lambda r, i: rq.get_orders_by_user(
+            tg_id_master=master(r), active=False, count_only=True)),
+        ("get_orders_by_user[order_id]", lambda r, i: rq.get_orders_by_user(order_id=order_id(r))),
+        ("get_closed_orders_page[master]", lambda r, i: rq.get_closed_orders_page(tg_id_master=master(r), limit=5)),
+        # APPOINTMENTS
+        ("get_available_hours", lambda r, i: rq.get_available_hours(day(r))),
+        ("get_appointment_by_users", lambda r, i: rq.get_appointment_by_users(client(r), master(r))),
+        ("has_active_appointment", lambda r, i: rq.has_active_appointment(client(r))),
+        ("get_filter_appointments[master,today]", lambda r, i: rq.get_filter_appointments(
+            tg_id_master=master(r), date_filter="today", counterpart="user")),
+        ("get_filter_appointments[master,month]", lambda r, i: rq.get_filter_appointments(
+            tg_id_master=master(r), date_filter="month", counterpart="user")),
+        ("get_filter_appointments[user,all]", lambda r, i: rq.get_filter_appointments(
+            tg_id_user=client(r), counterpart="master")),
+        # DIAGNOSTICS
+        ("get_diagnostics_by_filter[high]", lambda r, i: rq.get_diagnostics_by_filter("high")),
+        ("get_diagnostics_by_filter[low]", lambda r, i: rq.get_diagnostics_by_filter("low")),
+        ("get_api_dtc_history", lambda r, i: rq.get_api_dtc_history()),
+        ("save_api_dtc_record[new]", lambda r, i: rq.save_api_dtc_record(
+            master(r), f"B{run_tag}{i:04d}", "Бенчмарк", ["Причина"])),
+        ("save_api_dtc_record[duplicate]", lambda r, i: rq.save_api_dtc_record(
+            master(r), f"B{run_tag}{i:04d}", "Бенчмарк", ["Причина"])),
+        # СТАТИСТИКА
+        ("get_user_statistics", lambda r, i: rq.get_user_statistics()),
+        ("get_appointment_statistics", lambda r, i: rq.get_appointment_statistics()),
+        ("get_order_statistics", lambda r, i: rq.get_order_statistics()),
+        ("get_top_clients_statistics", lambda r, i: rq.get_top_clients_statistics()),
+        ("get_top_masters_statistics", lambda r, i: rq.get_top_masters_statistics()),
+    ]
+
+
+async def _measure(case: CaseFn, repeat: int, warmup: int, seed: int) -> Dict[str, float]:
+    rnd = random.Random(seed)
+    for i in range(warmup):
+        await case(rnd, -1 - i)
+    # Тот же seed для замеров: [duplicate] повторяет коды, созданные в [new]
+    rnd = random.Random(seed)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        await case(rnd, i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+async def run_benchmarks(db_path: str, counts: Dict[str, int], repeat: int, warmup: int, seed: int,
+                         only: List[str] = None, verbose: bool = True) -> Dict[str, Dict[str, float]]:
+    """Переключает database.requests на базу `db_path` и измеряет все (или выбранные) функции."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    rq.async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = {}
+    try:
+        for name, case in _cases(counts):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            try:
+                results[name] = await _measure(case, repeat, warmup, seed)
+            except Exception as e:
+                # Упавшая функция фиксируется в отчёте, остальные продолжают измеряться
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                if verbose:
+                    print(f"  {name:<40} ОШИБКА {results[name]['error']}")
+                continue
+            if verbose:
+                print(f"  {name:<40} median {results[name]['median_ms']:9.2f} мс | "
+                      f"min {results[name]['min_ms']:9.2f} мс | p95 {results[name]['p95_ms']:9.2f} мс")
+    finally:
+        await engine.dispose()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Печатает отношение медиан к базовой линии; возвращает имена регрессий."""
+    base_results = baseline.get("results", {})
+    regressions = []
+    print(f"\nСравнение с базовой линией (порог x{threshold}):")
+    for name, current in results.items():
+        base = base_results.get(name)
+        if "error" in current:
+            print(f"  {name:<40} ОШИБКА {current['error']}")
+            regressions.append(name)
+            continue
+        if base is None or "error" in base:
+            print(f"  {name:<40} нет в базовой линии")
+            continue
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        mark = ""
+        if ratio > threshold:
+            mark = "  <-- РЕГРЕССИЯ"
+            regressions.append(name)
+        print(f"  {name:<40} {base['median_ms']:9.2f} -> {current['median_ms']:9.2f} мс  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="Масштаб данных (1.0 = 50k пользователей, 200k заказов)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Путь к базе: наполняется, если файла нет, иначе переиспользуется")
+    parser.add_argument("--repeat", type=int, default=20, help="Замеров на функцию")
+    parser.add_argument("--warmup", type=int, default=2, help="Прогревочных вызовов на функцию")
+    parser.add_argument("--only", nargs="*", help="Префиксы имён измеряемых функций")
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON базовой линии для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Допустимое замедление медианы")
+    args = parser.parse_args()
+
+    counts = volumes(args.scale)
+    tmp_dir = None
+    db_path = args.db
+    if db_path is None:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="autofix_bench_")
+        db_path = os.path.join(tmp_dir.name, "bench.db")
+
+    try:
+        if not os.path.exists(db_path):
+            started = time.perf_counter()
+            seed_database(db_path, scale=args.scale, seed=args.seed)
+            print(f"База наполнена за {time.perf_counter() - started:.1f} с: "
+                  + ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+        print(f"Замеров на функцию: {args.repeat} (прогрев {args.warmup})")
+        results = asyncio.run(run_benchmarks(db_path, counts, args.repeat, args.warmup, args.seed, args.only))
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "counts": counts,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+        },
+        "results": results,
+    }
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.json_out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
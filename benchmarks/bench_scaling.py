@@ -0,0 +1,129 @@
+"""
+Отчёт о масштабировании функций database.requests с ростом объёма данных.
+
+Для каждого масштаба (по умолчанию base×1, ×10, ×100) генерируется своя временная база
+(`benchmarks.seed_data`), и выбранные функции измеряются тем же набором вызовов, что и в
+`benchmarks.bench_requests`. Для каждого шага считается показатель роста
+
+    k = log(t_больший / t_меньший) / log(объём_больший / объём_меньший)
+
+k≈0 — время не зависит от объёма (индексный поиск), k≈1 — линейный рост (полный проход),
+k > 1 + tolerance — сверхлинейный рост, такие функции помечаются. На малых масштабах время
+включает постоянные накладные расходы сессии, поэтому k на первом шаге обычно занижен.
+
+Запуск:
+    python -m benchmarks.bench_scaling [--base-scale 0.01] [--factors 1 10 100] [--only get_orders_by_user ...]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.bench_requests import run_benchmarks
+from benchmarks.seed_data import seed_database, volumes
+
+# Функции по умолчанию: горячие пути обработчиков и тяжёлые отчёты
+DEFAULT_FUNCTIONS = [
+    "get_user_role",
+    "get_user_dict",
+    "get_orders_by_user[master]",
+    "get_orders_by_user[master,closed]",
+    "get_available_hours",
+    "get_filter_appointments[master,month]",
+    "get_visible_comments[user]",
+    "get_api_dtc_history",
+    "save_api_dtc_record[new]",
+    "get_order_statistics",
+    "get_top_clients_statistics",
+    "get_top_masters_statistics",
+]
+
+
+def growth_exponent(small_ms: float, big_ms: float, factor: float) -> float:
+    """Показатель k в t ~ N^k между двумя масштабами."""
+    if small_ms <= 0 or big_ms <= 0:
+        return float("nan")
+    return math.log(big_ms / small_ms) / math.log(factor)
+
+
+def _classify(k: float, tolerance: float) -> str:
+    if math.isnan(k):
+        return "?"
+    if k > 1 + tolerance:
+        return "СВЕРХЛИНЕЙНО"
+    if k > 0.5:
+        return "линейно"
+    if k > 0.15:
+        return "сублинейно"
+    return "≈константа"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-scale", type=float, default=0.01, help="Масштаб ×1 (1.0 = 50k пользователей)")
+    parser.add_argument("--factors", type=float, nargs="+", default=[1, 10, 100], help="Множители масштаба")
+    parser.add_argument("--only", nargs="*", default=DEFAULT_FUNCTIONS, help="Префиксы имён измеряемых вызовов")
+    parser.add_argument("--repeat", type=int, default=10, help="Замеров на функцию")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Допуск k над 1 до пометки сверхлинейности")
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    factors = sorted(args.factors)
+    by_factor: Dict[float, Dict[str, Dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory(prefix="autofix_scaling_") as tmp_dir:
+        for factor in factors:
+            scale = args.base_scale * factor
+            db_path = os.path.join(tmp_dir, f"scale_{factor:g}.db")
+            counts = volumes(scale)
+            started = time.perf_counter()
+            seed_database(db_path, scale=scale, seed=args.seed)
+            print(f"×{factor:g}: orders={counts['orders']}, users={counts['users']} "
+                  f"(наполнение {time.perf_counter() - started:.1f} с), замеры…")
+            by_factor[factor] = asyncio.run(
+                run_benchmarks(db_path, counts, args.repeat, 1, args.seed, args.only, verbose=False)
+            )
+            os.remove(db_path)
+
+    names = [name for name in by_factor[factors[0]] if all(name in by_factor[f] for f in factors)]
+    header = "".join(f"{'×' + format(f, 'g'):>11}" for f in factors)
+    steps = list(zip(factors, factors[1:]))
+    step_header = "".join(f"{'k ' + format(a, 'g') + '→' + format(b, 'g'):>12}" for a, b in steps)
+    print(f"\nМедиана, мс (база ×1 = scale {args.base_scale:g}):")
+    print(f"{'функция':<40}{header}{step_header}  оценка")
+
+    flagged: List[str] = []
+    report = {}
+    for name in names:
+        medians = [by_factor[f][name].get("median_ms") for f in factors]
+        if any(m is None for m in medians):
+            print(f"{name:<40} ОШИБКА {by_factor[factors[-1]][name].get('error', '')}")
+            continue
+        exponents = [growth_exponent(medians[i], medians[i + 1], b / a) for i, (a, b) in enumerate(steps)]
+        # Оценка по последнему шагу: на больших объёмах постоянные расходы меньше искажают картину
+        verdict = _classify(exponents[-1], args.tolerance) if exponents else "?"
+        if verdict == "СВЕРХЛИНЕЙНО":
+            flagged.append(name)
+        report[name] = {"median_ms": dict(zip(map(str, factors), medians)), "exponents": exponents, "verdict": verdict}
+        print(f"{name:<40}" + "".join(f"{m:11.2f}" for m in medians)
+              + "".join(f"{k:12.2f}" for k in exponents) + f"  {verdict}")
+
+    if flagged:
+        print(f"\nСверхлинейный рост: {', '.join(flagged)}")
+    else:
+        print("\nСверхлинейного роста не обнаружено")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"base_scale": args.base_scale, "factors": factors, "results": report},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Списочные функции чтения database.requests против потоковых (stream_*) с ростом объёма данных.
+
+Для каждого масштаба генерируется временная база (`benchmarks.seed_data`), и каждая пара
+вызывается на самой тяжёлой выборке (мастер с наибольшим числом заказов, все отзывы и т.д.).
+Измеряются:
+- first — время до первой строки (у списочной функции — до возврата всего списка);
+- total — полный обход;
+- peak — пик памяти Python (tracemalloc) за обход.
+
+У потоковых функций first и peak не должны расти с объёмом, у списочных растут линейно.
+
+Запуск:
+    python -m benchmarks.bench_streaming [--scales 0.05 0.2 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import database.requests as rq
+from benchmarks.seed_data import TG_ID_BASE, seed_database
+
+# Мастер с наибольшей долей заказов и записей (распределение seed_data — с перекосом к первым)
+TOP_MASTER = TG_ID_BASE + 1
+
+# (имя, списочный вызов, потоковый вызов)
+PAIRS: List[Tuple[str, Callable[[], Any], Callable[[], Any]]] = [
+    ("orders_by_user[master,closed]",
+     lambda: rq.get_orders_by_user(tg_id_master=TOP_MASTER, active=False),
+     lambda: rq.stream_orders_by_user(tg_id_master=TOP_MASTER, active=False)),
+    ("filter_appointments[master,user]",
+     lambda: rq.get_filter_appointments(tg_id_master=TOP_MASTER, counterpart="user"),
+     lambda: rq.stream_filter_appointments(tg_id_master=TOP_MASTER, counterpart="user")),
+    ("visible_comments[all]",
+     lambda: rq.get_visible_comments(mode="all"),
+     lambda: rq.stream_visible_comments(mode="all")),
+    ("api_dtc_history",
+     lambda: rq.get_api_dtc_history(),
+     lambda: rq.stream_api_dtc_history()),
+    ("active_user_ids",
+     lambda: rq.get_all_active_user_ids(),
+     lambda: rq.stream_active_user_ids()),
+]
+
+
+async def _measure_list(call: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = await call()
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": len(rows), "first": total, "total": total, "peak": peak}
+
+
+async def _measure_stream(call: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    rows = 0
+    async for _ in call():
+        if first is None:
+            first = time.perf_counter() - started
+        rows += 1
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": rows, "first": first or total, "total": total, "peak": peak}
+
+
+async def run_scale(db_path: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    rq.async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = {}
+    try:
+        for name, list_call, stream_call in PAIRS:
+            # Прогрев: кэш страниц SQLite и компиляции запросов
+            await list_call()
+            results[name] = {"list": await _measure_list(list_call), "stream": await _measure_stream(stream_call)}
+    finally:
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.05, 0.2, 1.0])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'function':<34} {'scale':>6} {'rows':>7}   {'first, ms':>17}   {'total, ms':>17}   {'peak, KB':>17}")
+    print(f"{'':<34} {'':>6} {'':>7}   {'list':>8} {'stream':>8}   {'list':>8} {'stream':>8}   {'list':>8} {'stream':>8}")
+    by_scale = {}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            seed_database(db_path, scale=scale, seed=args.seed)
+            by_scale[scale] = asyncio.run(run_scale(db_path))
+
+    for name, _, _ in PAIRS:
+        for scale, results in by_scale.items():
+            lst, stm = results[name]["list"], results[name]["stream"]
+            print(
+                f"{name:<34} {scale:>6g} {stm['rows']:>7}   "
+                f"{lst['first'] * 1000:>8.1f} {stm['first'] * 1000:>8.1f}   "
+                f"{lst['total'] * 1000:>8.1f} {stm['total'] * 1000:>8.1f}   "
+                f"{lst['peak'] / 1024:>8.0f} {stm['peak'] / 1024:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
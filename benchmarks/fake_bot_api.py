@@ -0,0 +1,58 @@
+"""
+Заглушка Bot API для нагрузочных тестов: отвечает на любой метод мгновенно и без сети.
+
+Методы send*/edit*/copyMessage возвращают сообщение в тот же чат (sendPhoto — с file_id,
+чтобы бот переиспользовал загруженную картинку), остальные — True.
+Бот направляется сюда переменной окружения TELEGRAM_API_URL=http://127.0.0.1:<port>.
+
+Запуск:
+    python -m benchmarks.fake_bot_api --port 8081
+"""
+
+import argparse
+import itertools
+import time
+
+from aiohttp import web
+
+_message_ids = itertools.count(1)
+_calls = {"total": 0}
+
+
+async def method_view(request: web.Request) -> web.Response:
+    method = request.match_info["method"]
+    form = await request.post()
+    _calls["total"] += 1
+
+    if not method.startswith(("send", "edit", "copyMessage")):
+        return web.json_response({"ok": True, "result": True})
+
+    chat_id = int(form.get("chat_id") or 0)
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "text": str(form.get("text") or ""),
+    }
+    if method == "sendPhoto":
+        message["photo"] = [{"file_id": "fake-photo", "file_unique_id": "fake-photo", "width": 1, "height": 1}]
+    return web.json_response({"ok": True, "result": message})
+
+
+async def stats_view(request: web.Request) -> web.Response:
+    return web.json_response(_calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", method_view)
+    app.router.add_get("/stats", stats_view)
+    web.run_app(app, host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
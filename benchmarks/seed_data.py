@@ -0,0 +1,271 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков и оценки роста базы.
+
+Наполняет таблицы users, orders, appointments, comments и diagnostics с заданным масштабом
+и seed: одни и те же (scale, seed, параметры распределений) всегда дают одинаковое содержимое.
+Строки вставляются пакетами через executemany драйвера SQLite в уже готовом формате хранения,
+индексы строятся после загрузки (~70 тыс. строк/с, узкое место — генерация на Python).
+
+Базовый объём (scale=1.0): 50 000 пользователей, 200 000 заказов, 100 000 записей,
+50 000 диагностик и 5 000 отзывов.
+
+Распределения:
+- роли: один администратор, ~0.1% мастеров (не меньше 3), `--blocked-share` заблокированных;
+- статусы ремонта зависят от давности заказа: старые почти все закрыты, свежие — в работе/ожидании;
+- заказы и записи распределяются по мастерам по закону Ципфа (`--master-skew`, 0 — равномерно);
+- плотность записей по дням недели (воскресенье — выходной) и часам (пики утром и вечером).
+
+Telegram ID пользователя с номером i (0..users-1) равен `TG_ID_BASE + i`;
+первый пользователь — администратор, следующие `masters_count(users)` — мастера.
+
+Запуск:
+    python -m benchmarks.seed_data --out /tmp/bench.db [--scale 1.0] [--seed 42] [--master-skew 1.0]
+"""
+
+import argparse
+import itertools
+import json
+import random
+import time as perf_time
+from bisect import bisect
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import create_engine
+
+from database.models import Base
+from database.search import ensure_user_search
+from database.order_counters import ensure_order_counters
+from database.daily_stats import ensure_daily_stats
+
+TG_ID_BASE = 1_000_000_000
+BATCH_SIZE = 20_000
+
+BASE_VOLUME = {
+    "users": 50_000,
+    "orders": 200_000,
+    "appointments": 100_000,
+    "diagnostics": 50_000,
+    "comments": 5_000,
+}
+
+# Статусы ремонта: заказы моложе RECENT_ORDER_DAYS ещё в работе, старые почти все закрыты
+RECENT_ORDER_DAYS = 14
+RECENT_STATUS_WEIGHTS = {"in_work": 45, "wait": 35, "close": 20}
+OLD_STATUS_WEIGHTS = {"close": 97, "in_work": 2, "wait": 1}
+
+# Плотность записей: дни недели (пн..вс) и часы начала слота
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 1.2, 0.7, 0.0)
+HOUR_WEIGHTS = {8: 6, 9: 10, 10: 9, 11: 7, 12: 5, 13: 4, 14: 5, 15: 6, 16: 8, 17: 9, 18: 6}
+DURATION_WEIGHTS = {1: 60, 2: 30, 3: 10}
+APPOINTMENT_DAYS_BACK = 365
+APPOINTMENT_DAYS_AHEAD = 30
+
+DIAGNOSTIC_TYPE_WEIGHTS = {"api_dtc": 30, "manual_dtc": 60, "symptom_manual": 10}
+COMMENT_VISIBLE_SHARE = 0.9
+HISTORY_DAYS = 1000
+
+_BRANDS = ["Lada", "Kia", "Hyundai", "Toyota", "Renault", "VW", "Skoda", "Nissan", "Ford", "BMW"]
+_MODELS = ["Vesta", "Rio", "Solaris", "Camry", "Logan", "Polo", "Octavia", "Almera", "Focus", "X5"]
+
+
+def volumes(scale: float) -> Dict[str, int]:
+    """Количество строк по таблицам для заданного масштаба."""
+    return {table: max(1, int(count * scale)) for table, count in BASE_VOLUME.items()}
+
+
+def masters_count(users: int) -> int:
+    """Число мастеров: ~0.1% пользователей, не меньше 3."""
+    return max(3, users // 1000)
+
+
+class _WeightedChoice:
+    """Быстрый выбор по весам через накопленные суммы (один random() и bisect на значение)."""
+
+    def __init__(self, rnd: random.Random, population: Sequence, weights: Iterable[float]):
+        self._random = rnd.random
+        self._population = list(population)
+        self._cum_weights = list(itertools.accumulate(weights))
+        self._total = self._cum_weights[-1]
+
+    def __call__(self):
+        return self._population[bisect(self._cum_weights, self._random() * self._total)]
+
+
+def _zipf_weights(count: int, skew: float) -> List[float]:
+    """Веса 1/rank^skew: при skew=1 первый мастер получает в ~count/ln(count) раз больше среднего."""
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def _bulk_insert(conn, table, rows: Iterator[tuple]) -> None:
+    """
+    Вставляет кортежи (в порядке колонок таблицы) пакетами через executemany драйвера.
+    Значения должны быть уже в формате хранения SQLAlchemy для SQLite (см. _sa_datetime).
+    """
+    sql = (
+        f"INSERT INTO {table.name} ({', '.join(column.name for column in table.columns)}) "
+        f"VALUES ({', '.join('?' for _ in table.columns)})"
+    )
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        conn.exec_driver_sql(sql, batch)
+
+
+def _sa_datetime(value: datetime) -> str:
+    """DateTime в формате хранения SQLAlchemy для SQLite: '2024-01-31 12:00:00.000000'."""
+    return value.isoformat(" ", "microseconds")
+
+
+def seed_database(
+        db_path: str,
+        scale: float = 1.0,
+        seed: int = 42,
+        master_skew: float = 1.0,
+        blocked_share: float = 0.02
+) -> Dict[str, int]:
+    """
+    Пересоздаёт таблицы в `db_path` и наполняет их синтетическими данными.
+
+    :param db_path: Путь к файлу SQLite.
+    :param scale: Множитель базового объёма (BASE_VOLUME).
+    :param seed: Seed генератора случайных чисел.
+    :param master_skew: Показатель Ципфа для распределения заказов и записей по мастерам.
+    :param blocked_share: Доля заблокированных клиентов.
+    :return: Число строк по таблицам.
+    """
+    rnd = random.Random(seed)
+    rand = rnd.random
+    counts = volumes(scale)
+    n_users = counts["users"]
+    n_masters = masters_count(n_users)
+    first_client = TG_ID_BASE + 1 + n_masters
+    n_clients = max(1, TG_ID_BASE + n_users - first_client)
+    today = date.today()
+    now = datetime.combine(today, time(12, 0))
+
+    masters = [TG_ID_BASE + 1 + i for i in range(n_masters)]
+    pick_master = _WeightedChoice(rnd, masters, _zipf_weights(n_masters, master_skew))
+    pick_brand = _WeightedChoice(rnd, _BRANDS, [1] * len(_BRANDS))
+    pick_model = _WeightedChoice(rnd, _MODELS, [1] * len(_MODELS))
+    pick_recent_status = _WeightedChoice(rnd, RECENT_STATUS_WEIGHTS, RECENT_STATUS_WEIGHTS.values())
+    pick_old_status = _WeightedChoice(rnd, OLD_STATUS_WEIGHTS, OLD_STATUS_WEIGHTS.values())
+    days = [today + timedelta(days=offset) for offset in range(-APPOINTMENT_DAYS_BACK, APPOINTMENT_DAYS_AHEAD + 1)]
+    pick_day = _WeightedChoice(rnd, [day.isoformat() for day in days], [WEEKDAY_WEIGHTS[day.weekday()] for day in days])
+    pick_hour = _WeightedChoice(rnd, HOUR_WEIGHTS, HOUR_WEIGHTS.values())
+    # Date/Time хранятся строками 'YYYY-MM-DD' и 'HH:MM:SS.ffffff'
+    hour_str = {hour: time(hour, 0).isoformat("microseconds") for hour in range(24)}
+    pick_duration = _WeightedChoice(rnd, DURATION_WEIGHTS, DURATION_WEIGHTS.values())
+    pick_diag_type = _WeightedChoice(rnd, DIAGNOSTIC_TYPE_WEIGHTS, DIAGNOSTIC_TYPE_WEIGHTS.values())
+
+    def client() -> int:
+        return first_client + int(rand() * n_clients)
+
+    def year() -> str:
+        return str(1995 + int(rand() * 31))
+
+    def past(days_back: int = HISTORY_DAYS) -> datetime:
+        return now - timedelta(seconds=int(rand() * days_back * 86400))
+
+    def past_str() -> str:
+        return _sa_datetime(past())
+
+    def users():
+        for i in range(n_users):
+            if i == 0:
+                role = "admin"
+            elif i <= n_masters:
+                role = "master"
+            else:
+                role = "blocked" if rand() < blocked_share else "user"
+            is_master = role == "master"
+            yield (
+                None, TG_ID_BASE + i, f"user{i}", "Мастер" if is_master else None,
+                int(rand() * 500) if is_master else 0, f"+79{int(rand() * 10 ** 9):09d}",
+                pick_brand(), pick_model(), year(), f"А{100 + int(rand() * 900)}АА55",
+                f"VIN{i:014d}", str(int(rand() * 400_000)), role,
+                role in ("admin", "master"), past_str(),
+            )
+
+    def orders():
+        for _ in range(counts["orders"]):
+            created = past()
+            is_recent = (now - created).days < RECENT_ORDER_DAYS
+            status = pick_recent_status() if is_recent else pick_old_status()
+            # Закрыт в течение нескольких дней после создания, но не позже «сейчас»
+            closed_at = min(created + timedelta(seconds=int(rand() * 3 * 86400)), now) if status == "close" else None
+            yield (
+                None, "Диагностика и ремонт", pick_brand(), pick_model(), "-", year(), "-", "-",
+                client(), pick_master(), "client", "-", "master", "-", status, _sa_datetime(created),
+                status == "close", closed_at and _sa_datetime(closed_at),
+            )
+
+    def appointments():
+        for _ in range(counts["appointments"]):
+            start = pick_hour()
+            end = min(start + pick_duration(), 23)
+            yield None, client(), pick_master(), pick_day(), hour_str[start], hour_str[end]
+
+    def diagnostics():
+        for i in range(counts["diagnostics"]):
+            entry_type = pick_diag_type()
+            # Коды api_dtc уникальны (save_api_dtc_record не допускает дубликатов), ручные повторяются
+            code = f"P{i:05d}" if entry_type == "api_dtc" else f"P{int(rand() * 1000):04d}"
+            payload = json.dumps(
+                {"code": code, "definition": "Описание неисправности", "causes": ["Причина 1", "Причина 2"]},
+                ensure_ascii=False
+            )
+            yield None, entry_type, pick_brand(), pick_model(), year(), payload, pick_master(), None, past_str()
+
+    def comments():
+        for _ in range(counts["comments"]):
+            yield None, client(), "client", "Отличный сервис", past_str(), rand() < COMMENT_VISIBLE_SHARE
+
+    tables = Base.metadata.tables
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    indexes = [index for table in tables.values() for index in table.indexes]
+    with engine.begin() as conn:
+        # Временная база фикстур: надёжность записи не нужна, важна скорость
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+        # Индексы строятся один раз после загрузки — быстрее, чем обновлять их на каждой вставке
+        for index in indexes:
+            index.drop(conn)
+        for name, rows in (("users", users()), ("orders", orders()), ("appointments", appointments()),
+                           ("diagnostics", diagnostics()), ("comments", comments())):
+            _bulk_insert(conn, tables[name], rows)
+        for index in indexes:
+            index.create(conn)
+        # Поисковый индекс пользователей (триггеры и FTS), как после init_db
+        ensure_user_search(conn)
+        # Счётчики закрытых заказов (триггеры и заполнение)
+        ensure_order_counters(conn)
+        ensure_daily_stats(conn)
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Путь к файлу SQLite (таблицы пересоздаются)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Множитель базового объёма")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--master-skew", type=float, default=1.0, help="Показатель Ципфа нагрузки мастеров")
+    parser.add_argument("--blocked-share", type=float, default=0.02, help="Доля заблокированных клиентов")
+    args = parser.parse_args()
+
+    started = perf_time.perf_counter()
+    counts = seed_database(args.out, args.scale, args.seed, args.master_skew, args.blocked_share)
+    elapsed = perf_time.perf_counter() - started
+    total = sum(counts.values())
+
+    for table, count in counts.items():
+        print(f"{table:<14} {count:>10}")
+    print(f"Всего строк: {total} за {elapsed:.1f} с ({total / elapsed:,.0f} строк/с) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 from aiogram import Bot
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from config import Config
 
 if not Config.API_TOKEN:
     raise ValueError("❌ API_TOKEN не найден в .env")
 
+# Свой адрес Bot API (локальный сервер Telegram или заглушка нагрузочного теста)
+session = AiohttpSession(api=TelegramAPIServer.from_base(Config.TELEGRAM_API_URL)) if Config.TELEGRAM_API_URL else None
+
 bot = Bot(
     token=Config.API_TOKEN,
+    session=session,
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
@@ -0,0 +1,20 @@
+"""
+Многопроцессный режим бота.
+
+    Telegram --webhook--> ingress --(консистентный хеш chat_id)--> воркер 1..N
+
+- `cluster.ingress` принимает webhook, определяет чат апдейта и пересылает его воркеру,
+  выбранному по кольцу консистентного хеширования. Апдейты одного чата всегда попадают
+  к одному воркеру и пересылаются ему строго по порядку.
+- `cluster.worker` — обычный диспетчер бота (main.dp) за HTTP-эндпоинтом; апдейты одного
+  чата обрабатываются последовательно, разных чатов — параллельно.
+- Воркеры делят базу SQLite (WAL) и хранилище FSM в ней (`FSM_STORAGE=db`).
+
+Запуск (ingress сам поднимает воркеры):
+    FSM_STORAGE=db python -m cluster.ingress --spawn 4 [--set-webhook]
+
+Кэши в памяти процесса (профили в рамках апдейта, длинные callback-данные) остаются
+локальными для воркера: благодаря привязке чата к воркеру это безопасно для собственных
+кнопок чата, но кнопка, отправленная в чужой чат с данными из серверного хранилища,
+после смены воркера обрабатывается как устаревшая.
+"""
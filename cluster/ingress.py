@@ -0,0 +1,198 @@
+"""
+Ingress кластера: принимает webhook Telegram и распределяет апдейты по воркерам.
+
+Воркер выбирается по кольцу консистентного хеширования chat_id, поэтому все апдейты чата
+идут к одному воркеру. На каждый воркер — своя очередь и один пересылающий цикл: пачка
+отправляется только после подтверждения предыдущей (при ошибке — повтор той же пачки),
+так порядок апдейтов чата сохраняется. Webhook получает ответ сразу после постановки в очередь.
+
+Перед запуском воркеров ingress один раз создаёт таблицы и администратора —
+воркеры этого не делают, чтобы не состязаться за схему.
+
+Запуск:
+    FSM_STORAGE=db python -m cluster.ingress --spawn 4 [--port 8080] [--set-webhook]
+    python -m cluster.ingress --worker-urls http://10.0.0.2:8100 http://10.0.0.3:8100
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import List
+
+import aiohttp
+from aiohttp import web
+
+from cluster.routing import HashRing, extract_chat_id
+from config import ClusterConfig, Config, LoggingConfig
+
+logger = logging.getLogger(__name__)
+
+_RETRY_DELAYS = (0.1, 0.5, 1.0, 2.0, 5.0)
+
+
+class WorkerForwarder:
+    """Очередь апдейтов одного воркера и цикл их упорядоченной пересылки пачками."""
+
+    def __init__(self, url: str, batch_size: int):
+        self.url = url.rstrip("/")
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.forwarded = 0
+        self.retries = 0
+
+    async def run(self, http: aiohttp.ClientSession) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            await self._send(http, batch)
+            self.forwarded += len(batch)
+
+    async def _send(self, http: aiohttp.ClientSession, batch: List[dict]) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with http.post(f"{self.url}/updates", json=batch) as resp:
+                    if resp.status == 200:
+                        return
+                    error = f"HTTP {resp.status}"
+            except aiohttp.ClientError as e:
+                error = str(e)
+            delay = _RETRY_DELAYS[min(attempt, len(_RETRY_DELAYS) - 1)]
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"Воркер {self.url} недоступен ({error}), повтор через {delay} с")
+            await asyncio.sleep(delay)
+
+
+async def spawn_workers(count: int, base_port: int) -> List[asyncio.subprocess.Process]:
+    """Запускает `count` процессов cluster.worker на портах base_port..base_port+count-1."""
+    env = dict(os.environ, FSM_STORAGE="db")
+    return [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "cluster.worker", "--index", str(index), "--port", str(base_port + index), env=env
+        )
+        for index in range(count)
+    ]
+
+
+async def wait_healthy(http: aiohttp.ClientSession, urls: List[str], timeout: float = 60.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    for url in urls:
+        while True:
+            try:
+                async with http.get(f"{url}/health") as resp:
+                    if resp.status == 200:
+                        break
+            except aiohttp.ClientError:
+                pass
+            if asyncio.get_running_loop().time() > deadline:
+                raise RuntimeError(f"Воркер {url} не запустился за {timeout} с")
+            await asyncio.sleep(0.2)
+
+
+def create_app(worker_urls: List[str], spawn: int = 0, set_webhook: bool = False) -> web.Application:
+    ring = HashRing(range(len(worker_urls)), vnodes=ClusterConfig.HASH_RING_VNODES)
+    forwarders = [WorkerForwarder(url, ClusterConfig.FORWARD_BATCH_SIZE) for url in worker_urls]
+    state = {"processes": [], "tasks": []}
+
+    async def webhook_view(request: web.Request) -> web.Response:
+        if ClusterConfig.WEBHOOK_SECRET and (
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token") != ClusterConfig.WEBHOOK_SECRET):
+            return web.Response(status=401)
+        update = await request.json()
+        forwarders[ring.node_for(extract_chat_id(update))].queue.put_nowait(update)
+        return web.Response(text="ok")
+
+    async def stats_view(request: web.Request) -> web.Response:
+        """Очереди ingress и счётчики воркеров (для мониторинга и нагрузочного теста)."""
+        workers = []
+        for forwarder in forwarders:
+            entry = {"url": forwarder.url, "queued": forwarder.queue.qsize(),
+                     "forwarded": forwarder.forwarded, "retries": forwarder.retries}
+            try:
+                async with state["http"].get(f"{forwarder.url}/stats") as resp:
+                    entry.update(await resp.json())
+            except aiohttp.ClientError as e:
+                entry["error"] = str(e)
+            workers.append(entry)
+        return web.json_response({"workers": workers})
+
+    async def health_view(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def on_startup(app: web.Application) -> None:
+        from database.engine import init_db
+        from services.init_admin import init_admin_user
+
+        await init_db()
+        await init_admin_user()
+        # Фоновые задачи над общей базой — один раз на кластер, в ingress
+        if Config.ORDERS_ARCHIVE_AFTER_DAYS:
+            from services.order_archive import run_orders_archiver
+            state["tasks"].append(asyncio.create_task(run_orders_archiver()))
+        state["http"] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        if spawn:
+            state["processes"] = await spawn_workers(spawn, ClusterConfig.WORKER_BASE_PORT)
+        await wait_healthy(state["http"], worker_urls)
+        state["tasks"] += [asyncio.create_task(forwarder.run(state["http"])) for forwarder in forwarders]
+
+        if set_webhook:
+            from bot import bot
+            await bot.set_webhook(
+                ClusterConfig.WEBHOOK_URL,
+                secret_token=ClusterConfig.WEBHOOK_SECRET or None,
+                max_connections=ClusterConfig.WEBHOOK_MAX_CONNECTIONS,
+            )
+            await bot.session.close()
+        logger.info(f"Ingress готов: воркеров {len(worker_urls)}")
+
+    async def on_shutdown(app: web.Application) -> None:
+        # Досылаем принятые апдейты, затем останавливаем воркеры
+        for forwarder in forwarders:
+            while not forwarder.queue.empty():
+                await asyncio.sleep(0.05)
+        for task in state["tasks"]:
+            task.cancel()
+        await state["http"].close()
+        for process in state["processes"]:
+            process.terminate()
+        for process in state["processes"]:
+            await process.wait()
+
+    app = web.Application()
+    app.router.add_post(ClusterConfig.WEBHOOK_PATH, webhook_view)
+    app.router.add_get("/stats", stats_view)
+    app.router.add_get("/health", health_view)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=ClusterConfig.INGRESS_PORT)
+    parser.add_argument("--spawn", type=int, default=0, help="Запустить N локальных воркеров")
+    parser.add_argument("--worker-urls", nargs="*", default=[], help="Адреса уже запущенных воркеров")
+    parser.add_argument("--set-webhook", action="store_true", help="Зарегистрировать ClusterConfig.WEBHOOK_URL")
+    args = parser.parse_args()
+
+    worker_urls = args.worker_urls or [
+        f"http://{ClusterConfig.WORKER_HOST}:{ClusterConfig.WORKER_BASE_PORT + index}"
+        for index in range(args.spawn or ClusterConfig.WORKERS)
+    ]
+
+    LoggingConfig.LOG_DIR = LoggingConfig.LOG_DIR / "ingress"
+    from logger import setup_logging
+    setup_logging()
+    if not args.spawn and not args.worker_urls:
+        logger.info(f"Воркеры не запускаются, ожидаются по адресам: {', '.join(worker_urls)}")
+
+    web.run_app(create_app(worker_urls, args.spawn, args.set_webhook),
+                host=ClusterConfig.INGRESS_HOST, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Маршрутизация апдейтов: кольцо консистентного хеширования и определение чата апдейта.
+"""
+
+import hashlib
+from bisect import bisect
+from typing import Any, Dict, List, Sequence
+
+
+class HashRing:
+    """
+    Кольцо консистентного хеширования с виртуальными узлами.
+    При добавлении/удалении воркера переезжает лишь ~1/N чатов, остальные остаются на месте.
+    """
+
+    def __init__(self, nodes: Sequence[int], vnodes: int = 64):
+        if not nodes:
+            raise ValueError("Кольцо хеширования требует хотя бы один узел")
+        points = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(vnodes)
+        )
+        self._keys: List[int] = [point for point, _ in points]
+        self._nodes: List[int] = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+    def node_for(self, key: int) -> int:
+        """Узел, отвечающий за ключ (chat_id)."""
+        index = bisect(self._keys, self._hash(str(key))) % len(self._keys)
+        return self._nodes[index]
+
+
+def extract_chat_id(update: Dict[str, Any]) -> int:
+    """
+    Чат, к которому относится апдейт (JSON от Telegram): chat.id сообщения,
+    для callback/inline-запросов — чат сообщения или id пользователя. 0 — если не найден.
+    """
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = payload.get("from") or payload.get("user")
+        if user:
+            return user["id"]
+    return 0
@@ -0,0 +1,125 @@
+"""
+Воркер кластера: диспетчер бота (main.dp) за локальным HTTP-эндпоинтом.
+
+POST /updates принимает пачку апдейтов (JSON-массив) от ingress в порядке поступления
+и сразу отвечает; обработка идёт в фоне «дорожками» по чатам: апдейты одного чата —
+строго по очереди, разных чатов — параллельно (не больше ClusterConfig.WORKER_MAX_CONCURRENCY).
+
+Запуск (обычно — из `cluster.ingress --spawn N`):
+    FSM_STORAGE=db python -m cluster.worker --index 0 --port 8100
+"""
+
+import argparse
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+
+from cluster.routing import extract_chat_id
+from config import ClusterConfig, Config, LoggingConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ChatLanes:
+    """Последовательная обработка в пределах чата при общей ограниченной параллельности."""
+
+    def __init__(self, max_concurrency: int):
+        self._tails: Dict[int, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, chat_id: int, job: Callable[[], Awaitable]) -> None:
+        previous = self._tails.get(chat_id)
+        task = asyncio.create_task(self._run(previous, job))
+        self._tails[chat_id] = task
+        self.pending += 1
+        task.add_done_callback(partial(self._forget, chat_id))
+
+    async def _run(self, previous: Optional[asyncio.Task], job: Callable[[], Awaitable]) -> None:
+        if previous is not None:
+            # Ждём предыдущий апдейт чата; его ошибки обработаны в его собственной задаче
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            try:
+                await job()
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Ошибка обработки апдейта")
+
+    def _forget(self, chat_id: int, task: asyncio.Task) -> None:
+        self.pending -= 1
+        if self._tails.get(chat_id) is task:
+            del self._tails[chat_id]
+
+    async def drain(self) -> None:
+        """Дожидается обработки всех принятых апдейтов."""
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+def create_app(index: int) -> web.Application:
+    from aiogram.types import Update
+    from main import bot, dp
+    from database.fast_lookup import fast_lookup
+    from utils.content import warmup_content
+
+    lanes = ChatLanes(ClusterConfig.WORKER_MAX_CONCURRENCY)
+
+    async def updates_view(request: web.Request) -> web.Response:
+        for raw in await request.json():
+            update = Update.model_validate(raw, context={"bot": bot})
+            lanes.submit(extract_chat_id(raw), partial(dp.feed_update, bot, update))
+        return web.Response(text="ok")
+
+    async def stats_view(request: web.Request) -> web.Response:
+        return web.json_response({
+            "worker": index, "pending": lanes.pending, "processed": lanes.processed, "failed": lanes.failed,
+        })
+
+    async def health_view(request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def on_startup(app: web.Application) -> None:
+        await warmup_content()
+        logger.info(f"Воркер {index} готов (FSM: {Config.FSM_STORAGE})")
+
+    async def on_shutdown(app: web.Application) -> None:
+        await lanes.drain()
+        await dp.storage.close()
+        await fast_lookup.close()
+        await bot.session.close()
+
+    app = web.Application(client_max_size=16 * 1024 ** 2)
+    app.router.add_post("/updates", updates_view)
+    app.router.add_get("/stats", stats_view)
+    app.router.add_get("/health", health_view)
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", type=int, required=True, help="Номер воркера (для логов и /stats)")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    if Config.FSM_STORAGE != "db":
+        raise SystemExit("Воркеру нужно общее хранилище FSM: задайте FSM_STORAGE=db")
+
+    # Отдельный каталог логов: RotatingFileHandler нельзя делить между процессами
+    LoggingConfig.LOG_DIR = LoggingConfig.LOG_DIR / f"worker-{args.index}"
+    from logger import setup_logging
+    setup_logging()
+
+    web.run_app(create_app(args.index), host=ClusterConfig.WORKER_HOST, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
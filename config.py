@@ -13,9 +13,20 @@ class LoggingConfig:
     DB_LOG_FILE = "database.log"
     API_LOG_FILE = "api.log"
 
+    # Формат записей в файлах: "text" (как раньше) или "json" (с update_id, user_id и обработчиком)
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+    # Ограничение частоты WARNING с одного места вызова (например, ошибки рассылки на каждого пользователя):
+    # BURST записей подряд, затем не чаще RATE_PER_SEC; из превысивших лимит проходит каждая
+    # SAMPLE_EVERY-я (0 — ни одной). Подавленные учитываются в следующей пропущенной записи.
+    # WARNING_RATE_PER_SEC = 0 — ограничение выключено.
+    WARNING_BURST = 20
+    WARNING_RATE_PER_SEC = 1.0
+    WARNING_SAMPLE_EVERY = 100
+
     @classmethod
     def ensure_log_dir(cls):
-        cls.LOG_DIR.mkdir(exist_ok=True)
+        cls.LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 
 class CarApiConfig:
@@ -39,6 +50,80 @@ class Config:
         raise ValueError("Переменная окружения ADMIN_ID обязательна!")
 
     TEMP_MESSAGE_LIFETIME_SEC: int = 5
+    # Максимальная длина текста одного сообщения Telegram
+    MESSAGE_TEXT_LIMIT: int = 4096
+
+    # Максимум UID в одной массовой операции администратора (списки и диапазоны)
+    BULK_USERS_MAX: int = 1000
+    # Строк на странице результатов поиска пользователей (/find)
+    SEARCH_PAGE_SIZE: int = 8
+
+    # Сколько последних оценок мастера хранится в master_ratings и показывается в профиле
+    RATING_LAST_GRADES: int = 5
+
+    # Размер LRU-кэша параметризованных inline-клавиатур (на каждый генератор)
+    KEYBOARD_CACHE_SIZE: int = 1024
+
+    # Время жизни callback-данных, вынесенных в серверное хранилище (не влезли в 64 байта)
+    CALLBACK_PAYLOAD_TTL_SEC: int = 900
+
+    # Анти-флуд нажатий: префикс callback_data -> (ёмкость корзины, пополнение токенов в секунду).
+    # Действует самый длинный совпавший префикс, "" — правило по умолчанию. Корзины — на пользователя
+    THROTTLE_RULES = {
+        "": (10, 3.0),
+        "cn:": (4, 1.0),        # листание календаря: каждый месяц — выборка доступности
+        "cd:": (6, 2.0),        # выбор дня — часы мастера
+        "appt_period:": (4, 1.0),
+        "stat:": (4, 1.0),
+        "trend:": (4, 1.0),
+        "admin_stats": (4, 1.0),
+    }
+    # Повтор той же кнопки (чат, сообщение, callback_data) в течение окна отбрасывается.
+    # Только для кнопок с записью в БД: повторное листание и меню должны работать
+    CALLBACK_DEDUP_WINDOW_SEC: float = 2.0
+    CALLBACK_DEDUP_PREFIXES = (
+        "ca:", "aw:", "oa:", "bu:", "rr:", "sa:", "da:", "dm:", "au:", "ta:",
+        "grade:", "broadcast_confirm", "confirm_booking",
+    )
+
+    # Метрики обработчиков: порт локального эндпоинта /metrics (пусто — эндпоинт выключен)
+    METRICS_PORT = os.getenv("METRICS_PORT")
+    METRICS_HOST: str = "127.0.0.1"
+    # Периодическая сводка top-N обработчиков в bot.log (0 — выключена)
+    METRICS_SUMMARY_INTERVAL_SEC: int = 900
+    METRICS_SUMMARY_TOP_N: int = 10
+
+    # Журнал медленных SQL-запросов (database.log) и окно статистики функций БД (/db_stats)
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    DB_STATS_WINDOW_MIN: int = 60
+
+    # Архив заказов: закрытые заказы старше N дней раз в интервал переносятся в orders_archive
+    # пачками по ORDERS_ARCHIVE_BATCH (0 дней — архивация выключена)
+    ORDERS_ARCHIVE_AFTER_DAYS: int = 180
+    ORDERS_ARCHIVE_INTERVAL_SEC: int = 6 * 3600
+    ORDERS_ARCHIVE_BATCH: int = 5000
+    # Заказов на странице «Истории работ» мастера
+    WORK_HISTORY_PAGE_SIZE: int = 5
+
+    # Строк в одной пачке чтения потоковых функций database.requests (stream_*)
+    STREAM_CHUNK_ROWS: int = 500
+
+    # Готовые запросы профиля пользователя по наборам полей (database.requests._user_fields_stmt)
+    PREPARED_STATEMENTS_CACHE_SIZE: int = 256
+    # Роль и имя пользователя по tg_id — через отдельное read-only соединение aiosqlite,
+    # минуя сессию SQLAlchemy (database/fast_lookup.py, benchmarks.bench_fast_lookup)
+    DB_FAST_LOOKUP: bool = os.getenv("DB_FAST_LOOKUP", "0") == "1"
+
+    # Экспорт для бухгалтерии и страховых (/export): строк в одной пачке чтения и
+    # предельный размер файла (ограничение Bot API на отправку документа — 50 МБ)
+    EXPORT_CHUNK_ROWS: int = 1000
+    EXPORT_MAX_BYTES: int = 50 * 1024 * 1024
+
+    # Хранилище FSM: "memory" (один процесс) или "db" (таблица fsm_storage, общая для воркеров)
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+
+    # Адрес Bot API (пусто — api.telegram.org; локальный Bot API-сервер или заглушка нагрузочного теста)
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
 
     SERVICE_LOCATION_URL = (
         "https://yandex.ru/navi/?whatshere%5Bpoint%5D=73.305003%2C54.908418"
@@ -50,3 +135,25 @@ class Config:
     OFFICE_ADDRESS = "г. Омск, ул. 2-я Казахстанская, 3Б"
     WORKING_HOURS = "Пн–Сб: 08:00–19:00\nВс: выходной"
     DEFAULT_HOURS = set(range(8, 24))
+
+
+class ClusterConfig:
+    """Многопроцессный режим: ingress принимает webhook и распределяет апдейты по воркерам."""
+    # Публичный URL webhook (регистрируется в Telegram при запуске ingress с --set-webhook)
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_PATH = "/webhook"
+    # Telegram доставляет апдейты по этому числу соединений; ingress отвечает сразу после постановки в очередь
+    WEBHOOK_MAX_CONNECTIONS = 40
+    INGRESS_HOST = "0.0.0.0"
+    INGRESS_PORT = int(os.getenv("INGRESS_PORT", "8080"))
+
+    WORKERS = int(os.getenv("CLUSTER_WORKERS", "2"))
+    WORKER_HOST = "127.0.0.1"
+    WORKER_BASE_PORT = int(os.getenv("CLUSTER_WORKER_BASE_PORT", "8100"))
+    # Виртуальных узлов на воркер в кольце консистентного хеширования
+    HASH_RING_VNODES = 64
+    # Максимум апдейтов в одной пересылке ingress -> воркер
+    FORWARD_BATCH_SIZE = 100
+    # Одновременно обрабатываемых апдейтов в воркере (в пределах одного чата — строго по очереди)
+    WORKER_MAX_CONCURRENCY = 64
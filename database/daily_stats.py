@@ -0,0 +1,102 @@
+"""
+Суточные итоги для статистики администратора (таблица daily_stats: день × мастер).
+
+Триггеры записывают событие в строку дня в той же транзакции, что и сама запись:
+- заказ создан — orders_created в день создания (orders.date хранится в UTC, день — местный);
+  возврат заказа из архива новым заказом не считается;
+- заказ закрыт — orders_closed +1 в день закрытия; триггер же ставит orders.closed_at;
+- заказ переоткрыт — orders_closed -1 в день его закрытия (closed_at, а у заказов, закрытых
+  до появления closed_at, — день создания, как при заполнении), но не ниже нуля; closed_at сбрасывается;
+- запись на приём создана — appointments в день приёма; перенос записи на другой день
+  или к другому мастеру переносит и счётчик. Удаление записи (в том числе при создании
+  заказа из записи) итоги не меняет.
+
+На базе без итогов (первый запуск после обновления) ensure_daily_stats заполняет таблицу
+по имеющимся данным: закрытые заказы — по closed_at, а без неё — по дате создания,
+записи — только ещё не удалённые.
+"""
+
+import logging
+
+from sqlalchemy import text
+
+db_logger = logging.getLogger("database")
+
+_TODAY = "date('now', 'localtime')"
+_ORDER_DAY = "date(new.date, 'localtime')"
+_CLOSED_DAY = "date(coalesce(old.closed_at, old.date), 'localtime')"
+# Формат DateTime SQLAlchemy в SQLite (UTC, как current_time())
+_NOW_UTC = "strftime('%Y-%m-%d %H:%M:%S.000000', 'now')"
+_OLD_CLOSED = "old.repair_status = 'close'"
+_NEW_CLOSED = "new.repair_status = 'close'"
+
+
+def _bump(day: str, master: str, column: str, delta: int, condition: str = "1") -> str:
+    return (
+        f"INSERT INTO daily_stats (day, tg_id_master, {column}) SELECT {day}, {master}, {delta} "
+        f"WHERE {condition} "
+        f"ON CONFLICT(day, tg_id_master) DO UPDATE SET {column} = {column} + excluded.{column};"
+    )
+
+
+def _drop(day: str, master: str, column: str, condition: str = "1") -> str:
+    # Только UPDATE существующей строки и не ниже нуля: итог дня не становится отрицательным,
+    # даже если закрытие было учтено в другой день (до появления closed_at)
+    return (
+        f"UPDATE daily_stats SET {column} = max({column} - 1, 0) "
+        f"WHERE day = {day} AND tg_id_master = {master} AND {condition};"
+    )
+
+
+_DAILY_STATS_DDL = (
+    # Возврат из архива (_restore_archived_order) вставляет строку с id, ещё присутствующим в архиве
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_daily_insert AFTER INSERT ON orders "
+    "WHEN NOT EXISTS (SELECT 1 FROM orders_archive WHERE id = new.id) BEGIN "
+    f"{_bump(_ORDER_DAY, 'new.tg_id_master', 'orders_created', 1)} END",
+    # Прежний триггер вычитал переоткрытие из текущего дня (итог мог стать отрицательным)
+    "DROP TRIGGER IF EXISTS trg_orders_daily_close",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_daily_status AFTER UPDATE OF repair_status ON orders "
+    f"WHEN ({_OLD_CLOSED}) IS NOT ({_NEW_CLOSED}) BEGIN "
+    f"{_bump(_TODAY, 'new.tg_id_master', 'orders_closed', 1, _NEW_CLOSED)} "
+    f"{_drop(_CLOSED_DAY, 'old.tg_id_master', 'orders_closed', _OLD_CLOSED)} "
+    f"UPDATE orders SET closed_at = CASE WHEN {_NEW_CLOSED} THEN {_NOW_UTC} END WHERE id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_daily_insert AFTER INSERT ON appointments BEGIN "
+    f"{_bump('new.appointment_date', 'new.tg_id_master', 'appointments', 1)} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_appointments_daily_update "
+    "AFTER UPDATE OF appointment_date, tg_id_master ON appointments "
+    "WHEN old.appointment_date IS NOT new.appointment_date OR old.tg_id_master IS NOT new.tg_id_master BEGIN "
+    f"{_bump('old.appointment_date', 'old.tg_id_master', 'appointments', -1)} "
+    f"{_bump('new.appointment_date', 'new.tg_id_master', 'appointments', 1)} END",
+)
+
+_BACKFILL = """
+INSERT INTO daily_stats (day, tg_id_master, orders_created, orders_closed, appointments)
+SELECT day, tg_id_master, sum(created), sum(closed), sum(appointments) FROM (
+    SELECT date(date, 'localtime') AS day, tg_id_master, 1 AS created, 0 AS closed, 0 AS appointments FROM orders
+    UNION ALL
+    SELECT date(date, 'localtime'), tg_id_master, 1, 0, 0 FROM orders_archive
+    UNION ALL
+    SELECT date(coalesce(closed_at, date), 'localtime'), tg_id_master, 0, 1, 0 FROM orders
+    WHERE repair_status = 'close'
+    UNION ALL
+    SELECT date(coalesce(closed_at, date), 'localtime'), tg_id_master, 0, 1, 0 FROM orders_archive
+    UNION ALL
+    SELECT appointment_date, tg_id_master, 0, 0, 1 FROM appointments
+)
+GROUP BY day, tg_id_master
+"""
+
+
+def ensure_daily_stats(sync_conn) -> None:
+    """
+    Создаёт триггеры суточных итогов; если итогов ещё нет, а заказы или записи есть — заполняет таблицу.
+    Вызывается из init_db после create_all.
+    """
+    for statement in _DAILY_STATS_DDL:
+        sync_conn.execute(text(statement))
+
+    if sync_conn.execute(text("SELECT 1 FROM daily_stats LIMIT 1")).first():
+        return
+    result = sync_conn.execute(text(_BACKFILL))
+    if result.rowcount:
+        db_logger.info(f"Суточные итоги заполнены по имеющимся данным: {result.rowcount} строк")
@@ -0,0 +1,123 @@
+"""
+Лёгкие объекты строк для горячих путей чтения database.requests.
+
+Строятся напрямую из кортежей Core-запросов (select по колонкам, без ORM-сущностей
+и identity map): `OrderRow.from_row(row)` — позиционный конструктор, порядок полей
+совпадает с порядком колонок запроса. Классы со __slots__ занимают в 2–3 раза меньше
+памяти, чем dict на строку, и создаются в 3 раза быстрее (benchmarks.bench_dto).
+
+Основной доступ — атрибуты (`order.master_name`); чтение по ключу (`order["id"]`,
+`order.get("brand_auto")`) оставлено для обработчиков, написанных под словари.
+Для сохранения в FSM/JSON — `to_dict()`.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Any, Optional
+
+
+class _RowAccess:
+    """Чтение полей по ключу, как у словаря."""
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# ==============================
+# USER
+# ==============================
+@dataclass(slots=True)
+class UserRow(_RowAccess):
+    """Полная строка users (порядок — как у колонок модели User)."""
+    id: int
+    tg_id: int
+    user_name: str
+    status: Optional[str]
+    rating: Optional[int]
+    contact: Optional[str]
+    brand_auto: Optional[str]
+    model_auto: Optional[str]
+    year_auto: Optional[str]
+    gos_num: Optional[str]
+    vin_number: Optional[str]
+    total_km: Optional[str]
+    role: str
+    can_messages: bool
+    date: Optional[datetime]
+
+
+# ==============================
+# ORDERS
+# ==============================
+@dataclass(slots=True)
+class OrderRow(_RowAccess):
+    """Заказ из orders или orders_archive (поля — requests.ORDER_FIELDS)."""
+    id: int
+    tg_id_user: int
+    tg_id_master: int
+    user_name: str
+    user_contact: Optional[str]
+    master_name: str
+    master_contact: Optional[str]
+    repair_status: str
+    complied: bool
+    description: Optional[str]
+    brand_auto: Optional[str]
+    model_auto: Optional[str]
+    total_km: Optional[str]
+    year_auto: Optional[str]
+    gos_num: Optional[str]
+    vin_number: Optional[str]
+    date: Optional[datetime]
+
+    @property
+    def date_str(self) -> str:
+        """Дата создания для карточки заказа: ГГГГ-ММ-ДД."""
+        return order_date_str(self.date)
+
+
+def order_date_str(value: Optional[datetime]) -> str:
+    """Дата создания заказа для карточки (и для проекций get_orders_by_user(fields=...))."""
+    return value.date().isoformat() if value else "не указана"
+
+
+# ==============================
+# APPOINTMENT
+# ==============================
+@dataclass(slots=True)
+class AppointmentRow(_RowAccess):
+    """Запись на приём; user_name и contact — второй стороны записи (если запрошен JOIN users)."""
+    id: int
+    tg_id_user: int
+    tg_id_master: int
+    appointment_date: date
+    appointment_time: time
+    end_time: time
+    user_name: Optional[str] = None
+    contact: Optional[str] = None
+
+
+# ==============================
+# DIAGNOSTICS
+# ==============================
+@dataclass(slots=True)
+class DtcRow(_RowAccess):
+    """Расшифровка DTC-кода из истории запросов к API (diagnostics.issue_and_causes)."""
+    code: str
+    definition: str
+    causes: list
+    created_at: Optional[datetime]
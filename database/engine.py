@@ -1,12 +1,93 @@
+import logging
+import os
+from sqlalchemy import MetaData, event, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
-from database.models import Base
+from database.models import Base, Orders
+from database.search import ensure_user_search
+from database.order_counters import ensure_order_counters
+from database.daily_stats import ensure_daily_stats
 
-DB_PATH = 'database/data_users.db'
-engine = create_async_engine(f'sqlite+aiosqlite:///{DB_PATH}')
+db_logger = logging.getLogger("database")
+
+DB_PATH = os.getenv("DB_PATH", 'database/data_users.db')
+# Подготовленных выражений sqlite3 на одно соединение (по умолчанию 128): с запасом на все
+# различные тексты SQL бота, чтобы горячие запросы не вытеснялись редкими отчётами
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", "512"))
+engine = create_async_engine(
+    f'sqlite+aiosqlite:///{DB_PATH}',
+    connect_args={"cached_statements": SQLITE_CACHED_STATEMENTS}
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+# Базу могут одновременно использовать несколько процессов (воркеры cluster):
+# WAL позволяет читать во время записи, busy_timeout — ждать блокировку, а не падать с "database is locked"
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 # Асинхронная функция для создания таблиц
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all не добавляет новые колонки к уже существующим таблицам (orders.closed_at)
+        await conn.run_sync(_add_missing_columns)
+        # orders, созданная до AUTOINCREMENT, пересоздаётся (индексы и триггеры — ниже)
+        await conn.run_sync(_ensure_orders_autoincrement)
+        # create_all не добавляет индексы к уже существующим таблицам — досоздаём их отдельно
+        await conn.run_sync(_create_missing_indexes)
+        # Триггеры и FTS-индекс поиска пользователей (при расхождении с users — перестройка)
+        await conn.run_sync(ensure_user_search)
+        # Триггеры счётчиков закрытых заказов (на существующей базе — начальное заполнение)
+        await conn.run_sync(ensure_order_counters)
+        # Триггеры суточных итогов статистики (на существующей базе — начальное заполнение)
+        await conn.run_sync(ensure_daily_stats)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    """Добавляет в существующие таблицы колонки модели, которых в них нет (только nullable, без значения)."""
+    for table in Base.metadata.sorted_tables:
+        existing = {row[1] for row in sync_conn.execute(text(f"PRAGMA table_info({table.name})"))}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            db_logger.info(f"Добавлена колонка {table.name}.{column.name}")
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _ensure_orders_autoincrement(sync_conn) -> None:
+    """
+    Переводит orders на AUTOINCREMENT (id не выдаются повторно после архивации или удаления).
+    Таблица копируется в новую, счётчик sqlite_sequence ставится не ниже наибольшего id
+    в orders и orders_archive. Индексы и триггеры orders удаляются вместе со старой таблицей
+    и создаются заново следующими шагами init_db.
+    """
+    ddl = sync_conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'orders'")).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return
+
+    new_table = Orders.__table__.to_metadata(MetaData(), name="orders_new")
+    columns = ", ".join(column.name for column in Orders.__table__.columns)
+    sync_conn.execute(CreateTable(new_table))
+    sync_conn.execute(text(f"INSERT INTO orders_new ({columns}) SELECT {columns} FROM orders"))
+    sync_conn.execute(text("DROP TABLE orders"))
+    sync_conn.execute(text("ALTER TABLE orders_new RENAME TO orders"))
+
+    last_id = sync_conn.execute(text(
+        "SELECT max(coalesce((SELECT max(id) FROM orders), 0), coalesce((SELECT max(id) FROM orders_archive), 0))"
+    )).scalar()
+    sync_conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'orders'"))
+    sync_conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('orders', :seq)"), {"seq": last_id})
@@ -0,0 +1,63 @@
+"""
+Быстрый путь для самых частых точечных чтений users: роль и имя пользователя по tg_id.
+
+Такие запросы выполняются почти на каждый апдейт (BlockUserMiddleware, приветствия,
+подписи сообщений), а сами по себе стоят ~10 мкс в SQLite; основная цена — сессия,
+транзакция и обработка результата SQLAlchemy (benchmarks.bench_hot_queries).
+`FastLookup` держит отдельное соединение aiosqlite только для чтения (mode=ro, query_only)
+в режиме autocommit и выполняет единственный запрос, подготовленный один раз
+(кэш выражений sqlite3), за один переход в поток aiosqlite. Результат — кортеж.
+
+Включается `Config.DB_FAST_LOOKUP`; вызывается из database.requests (get_user_role,
+get_user_dict по полям role/user_name). Запросы быстрого пути не попадают в журнал
+медленных запросов и счётчик SQL апдейта — только в db_function_stats.
+"""
+
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+import aiosqlite
+
+from database.engine import DB_PATH
+
+db_logger = logging.getLogger("database")
+
+# Поля users, которые отдаёт быстрый путь (порядок — как в кортеже результата)
+FAST_FIELDS = ("role", "user_name")
+_ROLE_NAME_SQL = "SELECT role, user_name FROM users WHERE tg_id = ? LIMIT 1"
+
+
+class FastLookup:
+    """Точечные чтения users через отдельное read-only соединение aiosqlite."""
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def role_and_name(self, tg_id: int) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(role, user_name) пользователя или None, если его нет (как fetchone() для первой строки)."""
+        conn = self._conn or await self._open()
+        rows = await conn.execute_fetchall(_ROLE_NAME_SQL, (tg_id,))
+        return tuple(rows[0]) if rows else None
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+
+    async def _open(self) -> aiosqlite.Connection:
+        async with self._lock:
+            if self._conn is None:
+                conn = await aiosqlite.connect(
+                    f"file:{self._db_path}?mode=ro", uri=True, isolation_level=None
+                )
+                await conn.execute("PRAGMA query_only=1")
+                await conn.execute("PRAGMA busy_timeout=5000")
+                self._conn = conn
+                db_logger.info(f"Быстрый путь чтения users открыт: {self._db_path}")
+            return self._conn
+
+
+fast_lookup = FastLookup(DB_PATH)
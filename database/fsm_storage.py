@@ -0,0 +1,105 @@
+"""
+Хранилище FSM aiogram в общей базе данных (таблица fsm_storage).
+
+Нужно для многопроцессного режима (cluster): воркеры не делят память, а состояние
+сценария должно переживать перезапуск воркера и изменение их числа.
+Данные FSM сериализуются в JSON; datetime/date/time сохраняются с пометкой типа
+и восстанавливаются теми же объектами (обработчики кладут в FSM даты и профили из БД).
+"""
+
+import json
+from datetime import date, datetime, time
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from config import Config
+from database.models import FSMRecord
+
+_TYPE_TAG = "__type__"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {_TYPE_TAG: "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {_TYPE_TAG: "date", "value": value.isoformat()}
+    if isinstance(value, time):
+        return {_TYPE_TAG: "time", "value": value.isoformat()}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Значение типа {type(value).__name__} нельзя сохранить в FSM")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    kind = obj.get(_TYPE_TAG)
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["value"])
+    if kind == "date":
+        return date.fromisoformat(obj["value"])
+    if kind == "time":
+        return time.fromisoformat(obj["value"])
+    return obj
+
+
+def dumps_fsm_data(data: Mapping[str, Any]) -> str:
+    return json.dumps(dict(data), ensure_ascii=False, default=_encode)
+
+
+def loads_fsm_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode) if raw else {}
+
+
+class DBStorage(BaseStorage):
+    """FSM-хранилище на SQLAlchemy: одна строка на ключ (состояние + JSON данных)."""
+
+    def __init__(self, session_factory=None, key_builder: Optional[KeyBuilder] = None):
+        if session_factory is None:
+            from database.engine import async_session as session_factory
+        self._session_factory = session_factory
+        self._key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._upsert(key, state=value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        async with self._session_factory() as session:
+            return await session.scalar(select(FSMRecord.state).where(FSMRecord.key == self._build(key)))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._upsert(key, data=dumps_fsm_data(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self._session_factory() as session:
+            raw = await session.scalar(select(FSMRecord.data).where(FSMRecord.key == self._build(key)))
+        return loads_fsm_data(raw)
+
+    async def close(self) -> None:
+        pass
+
+    def _build(self, key: StorageKey) -> str:
+        return self._key_builder.build(key)
+
+    async def _upsert(self, key: StorageKey, **values) -> None:
+        storage_key = self._build(key)
+        async with self._session_factory() as session:
+            stmt = insert(FSMRecord).values(key=storage_key, **{"state": None, "data": "{}", **values})
+            await session.execute(stmt.on_conflict_do_update(index_elements=[FSMRecord.key], set_=values))
+            # state.clear() обнуляет и состояние, и данные — пустые строки удаляем, чтобы таблица не росла
+            if values.get("state", "") is None or values.get("data") == "{}":
+                await session.execute(delete(FSMRecord).where(
+                    FSMRecord.key == storage_key, FSMRecord.state.is_(None), FSMRecord.data == "{}"
+                ))
+            await session.commit()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Хранилище FSM по Config.FSM_STORAGE: "db" — общая таблица, иначе память процесса."""
+    if Config.FSM_STORAGE == "db":
+        return DBStorage()
+    return MemoryStorage()
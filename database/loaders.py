@@ -0,0 +1,113 @@
+"""
+Загрузчики данных, привязанные к одному апдейту Telegram (в стиле DataLoader).
+
+`UserLoader` собирает запросы профилей пользователей, сделанные в одном «тике»
+цикла событий (например, через asyncio.gather), и выполняет их одним запросом
+`WHERE tg_id IN (...)` по объединению запрошенных полей. Результаты запоминаются
+до конца обработки апдейта, поэтому повторные запросы того же профиля не идут в БД.
+
+Загрузчик создаётся middleware на каждый апдейт и доступен через `current_user_loader`;
+вне апдейта (фоновые задачи, init_admin) `get_user_dict` работает напрямую с БД.
+"""
+
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# Пакетная функция: (tg_ids, fields | None) -> {tg_id: {поле: значение}}
+BatchUserFn = Callable[[List[int], Optional[List[str]]], Awaitable[Dict[int, Dict[str, Any]]]]
+
+# Загрузчик текущего апдейта (None — вне обработки апдейта)
+current_user_loader: ContextVar[Optional["UserLoader"]] = ContextVar("current_user_loader", default=None)
+
+
+class UserLoader:
+    """
+    Пакетный загрузчик профилей пользователей с мемоизацией на время апдейта.
+    Поля ранее не загружавшиеся для пользователя догружаются отдельным пакетом.
+    """
+
+    def __init__(self, batch_fn: BatchUserFn, all_fields: List[str]):
+        self._batch_fn = batch_fn
+        self._all_fields = frozenset(all_fields)
+        # tg_id -> (загруженные поля, данные или None если пользователь не найден)
+        self._cache: Dict[int, Tuple[FrozenSet[str], Optional[Dict[str, Any]]]] = {}
+        # tg_id -> [(запрошенные поля, future)]
+        self._pending: Dict[int, List[Tuple[FrozenSet[str], asyncio.Future]]] = {}
+        self._dispatch_scheduled = False
+        self._dispatch_task: Optional[asyncio.Task] = None
+        # Статистика (для логов и бенчмарков)
+        self.batches = 0
+        self.hits = 0
+
+    async def load(self, tg_id: int, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает данные пользователя по уже проверенному списку полей.
+        Запрос откладывается до конца текущего тика и объединяется с соседними.
+        """
+        wanted = frozenset(fields)
+        cached = self._cache.get(tg_id)
+        if cached is not None and wanted <= cached[0]:
+            self.hits += 1
+            return self._project(cached[1], fields)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(tg_id, []).append((wanted, future))
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._start_dispatch)
+
+        data = await future
+        return self._project(data, fields)
+
+    def clear(self, tg_id: Optional[int] = None) -> None:
+        """Сбрасывает кэш пользователя (или весь кэш) после изменения данных в БД."""
+        if tg_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(tg_id, None)
+
+    def _start_dispatch(self) -> None:
+        # Ссылка на задачу хранится, чтобы её не собрал сборщик мусора до завершения
+        self._dispatch_task = asyncio.ensure_future(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._dispatch_scheduled = False
+
+        requested = set()
+        for waiters in pending.values():
+            for wanted, _ in waiters:
+                requested |= wanted
+        # Поля, уже загруженные для пользователей пакета, запрашиваем повторно,
+        # чтобы не потерять их при перезаписи кэша
+        for tg_id in pending:
+            if tg_id in self._cache:
+                requested |= self._cache[tg_id][0]
+
+        fields = None if requested >= self._all_fields else sorted(requested)
+        loaded = self._all_fields if fields is None else frozenset(fields)
+
+        try:
+            self.batches += 1
+            rows = await self._batch_fn(list(pending), fields)
+        except Exception as e:
+            for waiters in pending.values():
+                for _, future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for tg_id, waiters in pending.items():
+            data = rows.get(tg_id)
+            self._cache[tg_id] = (loaded, data)
+            for _, future in waiters:
+                if not future.done():
+                    future.set_result(data)
+
+    @staticmethod
+    def _project(data: Optional[Dict[str, Any]], fields: List[str]) -> Optional[Dict[str, Any]]:
+        if data is None:
+            return None
+        return {field: data[field] for field in fields}
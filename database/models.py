@@ -4,10 +4,10 @@
 Все модели наследуются от общего базового класса `Base`.
 """
 
-from sqlalchemy import String, BigInteger, Boolean, Date, DateTime, Time, Text
+from sqlalchemy import String, BigInteger, Boolean, Date, DateTime, Time, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncAttrs
-from datetime import datetime, time
+from datetime import date, datetime, time
 from utils.time_bot import current_time
 
 
@@ -28,7 +28,7 @@ class User(Base):
     __tablename__ = 'users'
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    tg_id: Mapped[int] = mapped_column(BigInteger, comment="Telegram ID пользователя")
+    tg_id: Mapped[int] = mapped_column(BigInteger, index=True, comment="Telegram ID пользователя")
     user_name: Mapped[str] = mapped_column(String(20), comment="Имя пользователя (указано при регистрации)")
     status: Mapped[str] = mapped_column(String(20), nullable=True, comment="Текущий статус (например, 'активен')")
     rating: Mapped[int] = mapped_column(nullable=True, comment="Рейтинг пользователя")
@@ -44,13 +44,8 @@ class User(Base):
     date: Mapped[datetime] = mapped_column(DateTime, default=current_time, comment="Дата регистрации")
 
 
-class Orders(Base):
-    """
-    Таблица заказов на ремонт/обслуживание.
-    Связывает пользователя и мастера, отслеживает статус выполнения работ.
-    """
-    __tablename__ = 'orders'
-
+class _OrderColumns:
+    """Колонки заказа — общие для действующих заказов (orders) и архива (orders_archive)."""
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     description: Mapped[str] = mapped_column(String(100), nullable=True, comment="Описание работ или неисправности")
     brand_auto: Mapped[str] = mapped_column(String(20), nullable=True, comment="Марка автомобиля")
@@ -68,6 +63,45 @@ class Orders(Base):
     repair_status: Mapped[str] = mapped_column(String(20), comment="in_work/wait/close")
     date: Mapped[datetime] = mapped_column(DateTime, default=current_time, comment="Дата создания заказа")
     complied: Mapped[bool] = mapped_column(Boolean(), default=False, comment="True = Заказ выполнен")
+    closed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True,
+                                                      comment="Дата закрытия заказа (UTC)")
+
+
+class Orders(_OrderColumns, Base):
+    """
+    Таблица заказов на ремонт/обслуживание.
+    Связывает пользователя и мастера, отслеживает статус выполнения работ.
+    Закрытые заказы старше Config.ORDERS_ARCHIVE_AFTER_DAYS переносятся в orders_archive.
+    """
+    __tablename__ = 'orders'
+
+    __table_args__ = (
+        # Активные/закрытые заказы мастера и история работ с постраничной выборкой по дате
+        Index("ix_orders_master_status_date", "tg_id_master", "repair_status", "date"),
+        Index("ix_orders_user_status", "tg_id_user", "repair_status"),
+        # AUTOINCREMENT: id не выдаются повторно, даже если заказы с наибольшими id ушли
+        # в архив или удалены — иначе новый заказ получил бы id, уже занятый в orders_archive
+        {"sqlite_autoincrement": True},
+    )
+
+
+class OrdersArchive(_OrderColumns, Base):
+    """
+    Архив закрытых заказов (тот же набор колонок и те же id, что в orders).
+    Горячие запросы работают с небольшой таблицей orders; история работ и статистика
+    читают обе таблицы. Изменение архивного заказа возвращает его в orders.
+    """
+    __tablename__ = 'orders_archive'
+
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime, default=current_time, sort_order=1, comment="Дата переноса в архив"
+    )
+
+    __table_args__ = (
+        Index("ix_orders_archive_master_date", "tg_id_master", "date"),
+        Index("ix_orders_archive_user_date", "tg_id_user", "date"),
+        Index("ix_orders_archive_date", "date"),
+    )
 
 
 class Appointment(Base):
@@ -76,6 +110,11 @@ class Appointment(Base):
     Используется для управления расписанием: клиенты записываются на свободное время.
     """
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Списки записей мастера/клиента с фильтром по дате и сортировкой по дате и времени
+        Index("ix_appointments_master_date", "tg_id_master", "appointment_date", "appointment_time"),
+        Index("ix_appointments_user_date", "tg_id_user", "appointment_date", "appointment_time"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     tg_id_user: Mapped[int] = mapped_column(BigInteger, comment="Telegram ID клиента")
@@ -119,3 +158,107 @@ class Diagnostics(Base):
     order_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, comment="ID заказа (Orders.id)")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=current_time, comment="Дата добавления записи")
 
+
+class FSMRecord(Base):
+    """
+    Состояния и данные FSM (database.fsm_storage.DBStorage).
+    Общая таблица позволяет нескольким процессам-воркерам продолжать сценарии друг друга
+    и переживать перезапуск бота.
+    """
+    __tablename__ = 'fsm_storage'
+
+    key: Mapped[str] = mapped_column(String(200), primary_key=True, comment="Ключ aiogram: бот:чат:пользователь")
+    state: Mapped[str | None] = mapped_column(String(100), nullable=True, comment="Текущее состояние FSM")
+    data: Mapped[str] = mapped_column(Text, default="{}", comment="JSON данных FSM")
+
+
+class UserSearch(Base):
+    """
+    Нормализованные поля пользователей для поиска администратором (database.search).
+    Обновляется функциями записи database.requests; гос. номер и VIN дополнительно индексируются
+    FTS5-таблицей с триграммами для поиска по фрагменту.
+    """
+    __tablename__ = 'user_search'
+
+    uid: Mapped[int] = mapped_column(primary_key=True, autoincrement=False, comment="users.id")
+    name: Mapped[str | None] = mapped_column(String(40), nullable=True, comment="Имя в нижнем регистре, ё -> е")
+    phone: Mapped[str | None] = mapped_column(String(20), nullable=True, comment="Цифры телефона без кода страны")
+    phone_rev: Mapped[str | None] = mapped_column(String(20), nullable=True, comment="phone задом наперёд (поиск по последним цифрам)")
+    plate: Mapped[str | None] = mapped_column(String(20), nullable=True, comment="Гос. номер: латиница, без пробелов")
+    vin: Mapped[str | None] = mapped_column(String(20), nullable=True, comment="VIN: латиница, без пробелов")
+
+    __table_args__ = (
+        Index("ix_user_search_name", "name"),
+        Index("ix_user_search_phone", "phone"),
+        Index("ix_user_search_phone_rev", "phone_rev"),
+    )
+
+
+class Grade(Base):
+    """
+    Журнал оценок мастерам: одна оценка клиента на заказ.
+    Пишется в одной транзакции с закрытием заказа вместе с агрегатами master_ratings.
+    """
+    __tablename__ = 'grades'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(BigInteger, comment="ID заказа (Orders.id)")
+    tg_id_master: Mapped[int] = mapped_column(BigInteger, comment="Telegram ID мастера")
+    tg_id_user: Mapped[int] = mapped_column(BigInteger, comment="Telegram ID клиента")
+    grade: Mapped[int] = mapped_column(comment="Оценка 1–5")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=current_time, comment="Дата оценки")
+
+    __table_args__ = (
+        # Повторная оценка того же заказа (двойное нажатие, повтор апдейта) не учитывается
+        Index("ux_grades_order", "order_id", unique=True),
+        Index("ix_grades_master", "tg_id_master", "id"),
+    )
+
+
+class MasterRating(Base):
+    """
+    Накопительные агрегаты оценок мастера (строка на мастера): количество, сумма и последние оценки.
+    Средняя оценка для профиля и списка мастеров читается одной строкой, без пересчёта журнала grades.
+    """
+    __tablename__ = 'master_ratings'
+
+    tg_id_master: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, comment="Telegram ID мастера")
+    grades_count: Mapped[int] = mapped_column(default=0, comment="Количество оценок")
+    grades_sum: Mapped[int] = mapped_column(default=0, comment="Сумма оценок")
+    last_grades: Mapped[str] = mapped_column(String(40), default="", comment="Последние оценки через запятую, новые первыми")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=current_time, comment="Дата последней оценки")
+
+
+class UserOrderCounter(Base):
+    """
+    Число закрытых заказов пользователя как клиента и как мастера (orders + orders_archive).
+    Поддерживается триггерами на orders и orders_archive (database.order_counters) в той же
+    транзакции, что и закрытие, переоткрытие, удаление или архивация заказа; топ клиентов
+    и мастеров читается по индексу без группировки истории.
+    """
+    __tablename__ = 'user_order_counters'
+
+    tg_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, comment="Telegram ID пользователя")
+    closed_as_client: Mapped[int] = mapped_column(default=0, server_default="0", comment="Закрытых заказов как клиент")
+    closed_as_master: Mapped[int] = mapped_column(default=0, server_default="0", comment="Закрытых заказов как мастер")
+
+    __table_args__ = (
+        Index("ix_user_order_counters_client", "closed_as_client"),
+        Index("ix_user_order_counters_master", "closed_as_master"),
+    )
+
+
+class DailyStat(Base):
+    """
+    Суточные итоги по мастерам: создано и закрыто заказов, записей на приём.
+    Заполняется триггерами (database.daily_stats) в момент записи и не уменьшается при удалении
+    заказа или записи: запись, превращённая в заказ, остаётся в статистике.
+    Любой период считается суммой не более нескольких сотен строк.
+    """
+    __tablename__ = 'daily_stats'
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True, comment="День (местное время сервера)")
+    tg_id_master: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False, comment="Telegram ID мастера")
+    orders_created: Mapped[int] = mapped_column(default=0, server_default="0", comment="Создано заказов")
+    orders_closed: Mapped[int] = mapped_column(default=0, server_default="0", comment="Закрыто заказов (за вычетом переоткрытых)")
+    appointments: Mapped[int] = mapped_column(default=0, server_default="0", comment="Записей на приём на этот день")
@@ -0,0 +1,116 @@
+"""
+Счётчики закрытых заказов на пользователя (таблица user_order_counters).
+
+Заказ считается закрытым, если он в orders с repair_status = 'close' или в orders_archive
+(туда попадают только закрытые). Счётчики меняют триггеры на обеих таблицах, поэтому любое
+изменение — закрытие клиентом или мастером, переоткрытие, передача, удаление, архивация
+(DELETE из orders + INSERT в архив дают в сумме ноль) — учитывается в той же транзакции.
+
+check_order_counters сверяет таблицу с пересчётом по заказам, rebuild_order_counters
+заполняет её заново (первый запуск на существующей базе, исправление расхождений).
+"""
+
+import logging
+
+from sqlalchemy import text
+
+db_logger = logging.getLogger("database")
+
+
+# ==============================
+# ТРИГГЕРЫ
+# ==============================
+def _bump(row: str, column: str, tg_id_column: str, delta: int, condition: str = "1") -> str:
+    # INSERT ... SELECT ... WHERE: счётчик меняется только при выполнении условия;
+    # строка пользователя создаётся при первом закрытом заказе
+    return (
+        f"INSERT INTO user_order_counters (tg_id, {column}) SELECT {row}.{tg_id_column}, {delta} "
+        f"WHERE {condition} "
+        f"ON CONFLICT(tg_id) DO UPDATE SET {column} = {column} + excluded.{column};"
+    )
+
+
+def _bump_both(row: str, delta: int, condition: str = "1") -> str:
+    return (_bump(row, "closed_as_client", "tg_id_user", delta, condition)
+            + " " + _bump(row, "closed_as_master", "tg_id_master", delta, condition))
+
+
+_OLD_CLOSED = "old.repair_status = 'close'"
+_NEW_CLOSED = "new.repair_status = 'close'"
+
+_COUNTER_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_counters_insert AFTER INSERT ON orders "
+    f"WHEN {_NEW_CLOSED} BEGIN {_bump_both('new', 1)} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_counters_delete AFTER DELETE ON orders "
+    f"WHEN {_OLD_CLOSED} BEGIN {_bump_both('old', -1)} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_counters_update "
+    "AFTER UPDATE OF repair_status, tg_id_user, tg_id_master ON orders "
+    f"WHEN {_OLD_CLOSED} OR {_NEW_CLOSED} BEGIN "
+    f"{_bump_both('old', -1, _OLD_CLOSED)} {_bump_both('new', 1, _NEW_CLOSED)} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_archive_counters_insert AFTER INSERT ON orders_archive "
+    f"BEGIN {_bump_both('new', 1)} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_archive_counters_delete AFTER DELETE ON orders_archive "
+    f"BEGIN {_bump_both('old', -1)} END",
+)
+
+# Пересчёт счётчиков по заказам: (tg_id, закрыто как клиент, закрыто как мастер)
+_ACTUAL_COUNTERS = """
+WITH closed AS (
+    SELECT tg_id_user, tg_id_master FROM orders WHERE repair_status = 'close'
+    UNION ALL
+    SELECT tg_id_user, tg_id_master FROM orders_archive
+)
+SELECT tg_id, sum(client), sum(master) FROM (
+    SELECT tg_id_user AS tg_id, 1 AS client, 0 AS master FROM closed
+    UNION ALL
+    SELECT tg_id_master, 0, 1 FROM closed
+)
+GROUP BY tg_id
+"""
+
+
+def ensure_order_counters(sync_conn) -> None:
+    """
+    Создаёт триггеры счётчиков; на базе с закрытыми заказами, но пустой таблицей счётчиков
+    (первый запуск после обновления) заполняет её. Вызывается из init_db после create_all.
+    """
+    for statement in _COUNTER_DDL:
+        sync_conn.execute(text(statement))
+
+    if sync_conn.execute(text("SELECT 1 FROM user_order_counters LIMIT 1")).first():
+        return
+    if sync_conn.execute(text(
+        "SELECT 1 FROM orders WHERE repair_status = 'close' UNION ALL SELECT 1 FROM orders_archive LIMIT 1"
+    )).first():
+        rebuild_order_counters(sync_conn)
+
+
+def check_order_counters(sync_conn) -> list[tuple[int, tuple[int, int], tuple[int, int]]]:
+    """
+    Сверяет user_order_counters с пересчётом по orders и orders_archive.
+
+    :return: Расхождения: (tg_id, (клиент, мастер) в таблице, (клиент, мастер) по заказам).
+    """
+    actual = {tg_id: (client, master) for tg_id, client, master in sync_conn.execute(text(_ACTUAL_COUNTERS))}
+    stored = {
+        tg_id: (client, master)
+        for tg_id, client, master in sync_conn.execute(
+            text("SELECT tg_id, closed_as_client, closed_as_master FROM user_order_counters")
+        )
+    }
+    mismatches = []
+    for tg_id in actual.keys() | stored.keys():
+        have, expected = stored.get(tg_id, (0, 0)), actual.get(tg_id, (0, 0))
+        if have != expected:
+            mismatches.append((tg_id, have, expected))
+    return sorted(mismatches)
+
+
+def rebuild_order_counters(sync_conn) -> int:
+    """Заполняет user_order_counters заново пересчётом по заказам. :return: Число пользователей в таблице."""
+    sync_conn.execute(text("DELETE FROM user_order_counters"))
+    result = sync_conn.execute(text(
+        f"INSERT INTO user_order_counters (tg_id, closed_as_client, closed_as_master) {_ACTUAL_COUNTERS}"
+    ))
+    db_logger.info(f"Счётчики закрытых заказов пересчитаны: {result.rowcount} пользователей")
+    return result.rowcount
@@ -0,0 +1,157 @@
+"""
+Журнал медленных запросов и скользящая статистика функций database.requests.
+
+- `instrument_slow_queries` подписывается на before/after_cursor_execute и пишет в database.log
+  запросы дольше `Config.SLOW_QUERY_THRESHOLD_MS` — с «формой» параметров (типы, без значений),
+  вызвавшей функцией database.requests и update_id текущего апдейта.
+- Декоратор `connection` отмечает текущую функцию (`current_db_function`) и передаёт её время
+  в `db_function_stats` — count/total/max за последние `Config.DB_STATS_WINDOW_MIN` минут.
+"""
+
+import logging
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from itertools import groupby
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import Config
+from utils.metrics import current_update_stats
+
+db_logger = logging.getLogger("database")
+
+# Имя функции database.requests, выполняющейся в текущем контексте
+current_db_function: ContextVar[Optional[str]] = ContextVar("current_db_function", default=None)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_MAX_STATEMENT_LEN = 500
+
+
+# ==============================
+# ЖУРНАЛ МЕДЛЕННЫХ ЗАПРОСОВ
+# ==============================
+def param_shape(parameters: Any, executemany: bool = False) -> str:
+    """
+    Описывает параметры запроса без значений: "(int, str×3, NoneType)".
+    Для executemany — "25×(int, str)"; длинные IN-списки сворачиваются в "int×50".
+    """
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)}×{param_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if not parameters:
+        return "()"
+    parts = []
+    for type_name, group in groupby(type(value).__name__ for value in parameters):
+        count = sum(1 for _ in group)
+        parts.append(type_name if count == 1 else f"{type_name}×{count}")
+    return "(" + ", ".join(parts) + ")"
+
+
+def instrument_slow_queries(sync_engine: Engine, threshold_ms: Optional[float] = None) -> None:
+    """Логирует в database.log запросы дольше порога (мс; по умолчанию Config.SLOW_QUERY_THRESHOLD_MS)."""
+    threshold = (Config.SLOW_QUERY_THRESHOLD_MS if threshold_ms is None else threshold_ms) / 1000
+
+    # Начало запроса — в контексте выполнения (как в utils.metrics): после ошибки
+    # after_cursor_execute не вызывается, и стек на соединении сдвигал бы время следующих запросов
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < threshold:
+            return
+
+        stats = current_update_stats.get()
+        sql = _WHITESPACE_RE.sub(" ", statement).strip()
+        if len(sql) > _MAX_STATEMENT_LEN:
+            sql = sql[:_MAX_STATEMENT_LEN] + "…"
+        db_logger.warning(
+            f"Медленный запрос {elapsed * 1000:.1f} мс | функция={current_db_function.get() or '—'} | "
+            f"update_id={stats.update_id if stats else '—'} | "
+            f"параметры={param_shape(parameters, executemany)} | {sql}"
+        )
+
+
+# ==============================
+# СКОЛЬЗЯЩАЯ СТАТИСТИКА ФУНКЦИЙ
+# ==============================
+class FunctionTimings:
+    """
+    Скользящее окно времени выполнения функций: поминутные корзины [минута, count, total, max],
+    корзины старше окна отбрасываются.
+    """
+
+    def __init__(self, window_min: int):
+        self.window_min = window_min
+        self._buckets: Dict[str, Deque[list]] = {}
+
+    def record(self, name: str, elapsed: float) -> None:
+        minute = int(time.monotonic() // 60)
+        buckets = self._buckets.setdefault(name, deque())
+        if buckets and buckets[-1][0] == minute:
+            bucket = buckets[-1]
+            bucket[1] += 1
+            bucket[2] += elapsed
+            bucket[3] = max(bucket[3], elapsed)
+        else:
+            buckets.append([minute, 1, elapsed, elapsed])
+        self._trim(buckets, minute)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """[{"function", "count", "total", "max", "avg"}] за окно, по убыванию суммарного времени."""
+        minute = int(time.monotonic() // 60)
+        rows = []
+        for name, buckets in self._buckets.items():
+            self._trim(buckets, minute)
+            if not buckets:
+                continue
+            count = sum(b[1] for b in buckets)
+            total = sum(b[2] for b in buckets)
+            rows.append({
+                "function": name,
+                "count": count,
+                "total": total,
+                "max": max(b[3] for b in buckets),
+                "avg": total / count,
+            })
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def reset(self) -> None:
+        self._buckets.clear()
+
+    def _trim(self, buckets: Deque[list], minute: int) -> None:
+        while buckets and buckets[0][0] <= minute - self.window_min:
+            buckets.popleft()
+
+
+db_function_stats = FunctionTimings(window_min=Config.DB_STATS_WINDOW_MIN)
+
+
+def format_db_stats(top_n: int = 15) -> str:
+    """Текст для админ-команды /db_stats."""
+    rows = db_function_stats.snapshot()
+    if not rows:
+        return f"🗄 За последние {db_function_stats.window_min} мин. обращений к БД не было."
+
+    lines = [f"🗄 <b>БД: функции за {db_function_stats.window_min} мин.</b> (по суммарному времени)\n"]
+    for row in rows[:top_n]:
+        lines.append(
+            f"<code>{row['function']}</code>\n"
+            f"   вызовов: {row['count']} | всего: {row['total'] * 1000:.0f} мс | "
+            f"ср: {row['avg'] * 1000:.1f} мс | макс: {row['max'] * 1000:.1f} мс"
+        )
+    lines.append(f"\nПорог журнала медленных запросов: {Config.SLOW_QUERY_THRESHOLD_MS} мс (database.log)")
+    return "\n".join(lines)
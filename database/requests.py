@@ -5,14 +5,29 @@
 Все функции асинхронные и работают через session-обёртку.
 """
 
-from database.models import User, Comments, Orders, Appointment, Diagnostics
+from database.models import (User, Comments, Orders, OrdersArchive, Appointment, Diagnostics, UserSearch,
+                             Grade, MasterRating, UserOrderCounter, DailyStat)
+from database.dto import UserRow, OrderRow, AppointmentRow, DtcRow
+from database.order_counters import check_order_counters, rebuild_order_counters
+from database.search import (MIN_FRAGMENT_LENGTH, normalize_name, normalize_phone, normalize_plate,
+                             SEARCH_SOURCE_COLUMNS, REFRESH_USER_SEARCH_BY_TG_ID, REFRESH_USER_SEARCH_BY_IDS,
+                             DELETE_USER_SEARCH_BY_TG_ID)
 from database.engine import async_session
-from sqlalchemy import func, update, select, delete, and_
+from database.loaders import current_user_loader
+from database.fast_lookup import fast_lookup, FAST_FIELDS
+from database.query_stats import current_db_function, db_function_stats
+from sqlalchemy import (func, update, select, delete, insert, and_, union, union_all, tuple_, literal, table, column, text,
+                        bindparam)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
 from datetime import datetime, timedelta, date, time
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, AsyncIterator, Sequence, Union
+from functools import lru_cache
 from config import Config, CarApiConfig
+from utils.time_bot import current_time
 import json
 import logging
+from time import perf_counter
 
 
 db_logger = logging.getLogger("database")
@@ -22,8 +37,11 @@ def connection(func_):
     """
     Декоратор для автоматического управления сессией базы данных.
     Логирует любые исключения, возникшие в декорируемой функции.
+    Отмечает функцию для журнала медленных запросов и учитывает её время в db_function_stats.
     """
     async def wrapper(*args, **kwargs):
+        token = current_db_function.set(func_.__name__)
+        started = perf_counter()
         try:
             async with async_session() as session:
                 return await func_(session, *args, **kwargs)
@@ -35,12 +53,100 @@ def connection(func_):
             )
             # Пробрасываем исключение дальше чтобы вызывающий код мог реагировать.
             raise
+        finally:
+            db_function_stats.record(func_.__name__, perf_counter() - started)
+            current_db_function.reset(token)
     return wrapper
 
 
+def streaming(func_):
+    """
+    Декоратор для потоковых функций чтения (асинхронных генераторов): сессия открывается
+    на время обхода и закрывается, даже если вызывающий код прервал обход (break, aclose()).
+    Исключения логируются; в db_function_stats учитывается время внутри генератора,
+    без времени обработки строк вызывающим кодом.
+    """
+    async def wrapper(*args, **kwargs):
+        elapsed = 0.0
+        started = perf_counter()
+        try:
+            async with async_session() as session:
+                async for item in func_(session, *args, **kwargs):
+                    elapsed += perf_counter() - started
+                    yield item
+                    started = perf_counter()
+        except Exception as e:
+            db_logger.error(
+                f"Ошибка в функции '{func_.__name__}': {e}",
+                exc_info=True
+            )
+            raise
+        finally:
+            db_function_stats.record(func_.__name__, elapsed + perf_counter() - started)
+    return wrapper
+
+
+# ==============================
+# ГОТОВЫЕ ЗАПРОСЫ ГОРЯЧИХ ПУТЕЙ
+# ==============================
+# Запросы, выполняемые почти на каждый апдейт, строятся один раз с именованными параметрами:
+# ключ кэша компиляции у готового select() запоминается, и вызов не строит и не обходит дерево
+# выражения заново. Текст SQL при этом одинаков, поэтому на том же соединении SQLite выражение
+# берётся из кэша подготовленных выражений sqlite3 (engine.SQLITE_CACHED_STATEMENTS).
+_USER_ROLE_STMT = select(User.role).where(User.tg_id == bindparam("tg_id"))
+_HAS_APPOINTMENT_STMT = select(Appointment.id).where(Appointment.tg_id_user == bindparam("tg_id")).limit(1)
+_ACTIVE_ORDER_ID_STMT = select(Orders.id).where(
+    Orders.tg_id_user == bindparam("tg_id_user"),
+    Orders.tg_id_master == bindparam("tg_id_master"),
+    Orders.repair_status == "in_work"
+)
+
+
+@lru_cache(maxsize=Config.PREPARED_STATEMENTS_CACHE_SIZE)
+def _user_fields_stmt(names: Tuple[str, ...], batch: bool = False):
+    """Выборка колонок `names` из users по tg_id (batch — по списку :tg_ids)."""
+    stmt = select(*[getattr(User, name) for name in names])
+    if batch:
+        return stmt.where(User.tg_id.in_(bindparam("tg_ids", expanding=True)))
+    return stmt.where(User.tg_id == bindparam("tg_id"))
+
+
+async def _execute_prepared(session, stmt, params: Dict[str, Any]):
+    """Выполняет готовый запрос на Core-соединении сессии — без ORM-обработки результата."""
+    conn = await session.connection()
+    return await conn.execute(stmt, params)
+
+
+# Поля профиля, которые можно прочитать быстрым путём (Config.DB_FAST_LOOKUP, database/fast_lookup.py)
+_FAST_USER_FIELDS = frozenset(FAST_FIELDS + ("tg_id",))
+
+
+async def _fast_user_fields(tg_id: int, names: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """Профиль по полям из _FAST_USER_FIELDS через быстрый путь — в формате _fetch_user_dict."""
+    row = await fast_lookup.role_and_name(tg_id)
+    if row is None:
+        return None
+    data = dict(zip(FAST_FIELDS, row), tg_id=tg_id)
+    return {name: data[name] for name in names}
+
+
 # ==============================
 # USER
 # ==============================
+# Имена колонок users в порядке объявления модели
+USER_COLUMNS = tuple(User.__table__.columns.keys())
+
+
+def _user_join_on(user, tg_id_column):
+    """
+    Условие JOIN users по Telegram ID: tg_id в users не уникален, поэтому присоединяется
+    одна строка — с наименьшим id (коррелированный подзапрос идёт по индексу tg_id),
+    и строки основной таблицы не размножаются.
+    """
+    first = aliased(User)
+    return user.id == select(func.min(first.id)).where(first.tg_id == tg_id_column).scalar_subquery()
+
+
 @connection
 async def set_user(session, tg_id: int) -> None:
     """
@@ -50,19 +156,29 @@ async def set_user(session, tg_id: int) -> None:
     existing_user = await session.scalar(select(User).where(User.tg_id == tg_id))
     if not existing_user:
         session.add(User(tg_id=tg_id))
+        await session.flush()
+        await session.execute(REFRESH_USER_SEARCH_BY_TG_ID, {"tg_id": tg_id})
         await session.commit()
+        _invalidate_user_cache(tg_id)
 
 
 @connection
 async def add_user(session, data: Dict[str, Any]) -> None:
     user_obj = User(**data)
     session.add(user_obj)
+    await session.flush()
+    await session.execute(REFRESH_USER_SEARCH_BY_IDS, {"uids": [user_obj.id]})
     await session.commit()
+    _invalidate_user_cache(user_obj.tg_id)
 
 
 @connection
 async def get_user_role(session, user_id: int) -> Optional[str]:
-    result = await session.execute(select(User.role).where(User.tg_id == user_id))
+    if Config.DB_FAST_LOOKUP:
+        # Сессия не используется и не берёт соединение из пула
+        row = await fast_lookup.role_and_name(user_id)
+        return row[0] if row else None
+    result = await _execute_prepared(session, _USER_ROLE_STMT, {"tg_id": user_id})
     return result.scalar()
 
 
@@ -83,10 +199,139 @@ async def update_user_by_id(session, uid: int, **kwargs) -> bool:
             setattr(user, key, value)
         else:
             db_logger.warning(f"Попытка обновить несуществующее поле '{key}' у пользователя {uid}")
+    if SEARCH_SOURCE_COLUMNS.intersection(kwargs):
+        await session.flush()
+        await session.execute(REFRESH_USER_SEARCH_BY_IDS, {"uids": [uid]})
     await session.commit()
+    _invalidate_user_cache(user.tg_id)
     return True
 
 
+@connection
+async def bulk_update_users(
+        session,
+        uids: List[int],
+        values: Dict[str, Any],
+        from_roles: Optional[Tuple[str, ...]] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Массовое обновление пользователей по внутренним ID одним запросом
+    `UPDATE users SET ... WHERE id IN (...)` в одной транзакции.
+
+    :param uids: Внутренние ID пользователей (users.id).
+    :param values: Новые значения полей, например {"role": "blocked"}.
+    :param from_roles: Обновлять только пользователей с этими ролями (например, разблокировать — только 'blocked').
+                       Администраторы не затрагиваются никогда.
+    :return: Список (id, tg_id) фактически обновлённых пользователей.
+    """
+    unknown = [key for key in values if key not in USER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля пользователя: {', '.join(unknown)}")
+    if not uids:
+        return []
+
+    stmt = (
+        update(User)
+        .where(User.id.in_(uids), User.role != "admin")
+        .values(**values)
+        .returning(User.id, User.tg_id)
+    )
+    if from_roles is not None:
+        stmt = stmt.where(User.role.in_(from_roles))
+
+    updated = [(row.id, row.tg_id) for row in await session.execute(stmt)]
+    if updated and SEARCH_SOURCE_COLUMNS.intersection(values):
+        await session.execute(REFRESH_USER_SEARCH_BY_IDS, {"uids": [uid for uid, _ in updated]})
+    await session.commit()
+    if updated:
+        # Кэш профилей апдейта сбрасывается целиком — один вызов вместо поштучного
+        _invalidate_user_cache()
+    return updated
+
+
+# Таблица FTS5 с гос. номерами и VIN (rowid = users.id), см. database/search.py
+_user_search_fts = table("user_search_fts", column("rowid"))
+
+
+def _user_search_subqueries(query: str) -> list:
+    """
+    Подзапросы uid для строки поиска администратора — по каждой подходящей стратегии:
+    префикс имени, начало/окончание телефона, фрагмент гос. номера или VIN.
+    Каждый подзапрос идёт по своему индексу; результат — их объединение.
+    """
+    subqueries = []
+    stripped = query.strip()
+
+    name = normalize_name(stripped)
+    if name and any(ch.isalpha() for ch in name):
+        subqueries.append(
+            select(UserSearch.uid).where(UserSearch.name >= name, UserSearch.name < name + "\U0010ffff")
+        )
+
+    digits = stripped.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+    # Код страны +7 в начале частичного номера не хранится
+    digits = digits[2:] if digits.startswith("+7") else digits.lstrip("+")
+    if digits.isdigit() and len(digits) >= MIN_FRAGMENT_LENGTH:
+        phone = normalize_phone(digits)
+        tail = digits[::-1]
+        subqueries.append(
+            select(UserSearch.uid).where(UserSearch.phone >= phone, UserSearch.phone < phone + "~")
+        )
+        subqueries.append(
+            select(UserSearch.uid).where(UserSearch.phone_rev >= tail, UserSearch.phone_rev < tail + "~")
+        )
+
+    # Фрагмент номера/VIN — только если в запросе нет «чужих» букв (иначе это имя)
+    plate = normalize_plate(stripped)
+    if plate and len(plate) >= MIN_FRAGMENT_LENGTH and len(plate) == sum(ch.isalnum() for ch in stripped):
+        subqueries.append(
+            select(_user_search_fts.c.rowid)
+            .where(text("user_search_fts MATCH :fragment").bindparams(fragment=f'"{plate}"'))
+        )
+
+    return subqueries
+
+
+@connection
+async def search_users(
+        session,
+        query: str,
+        after_uid: int = 0,
+        limit: int = 10
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Поиск пользователей администратором по префиксу имени, телефону (начало или последние цифры),
+    фрагменту гос. номера или VIN. Страницы — по ключу: следующая начинается после последнего UID.
+
+    :param query: Строка поиска в свободной форме ("Иван", "+7 999", "4567", "А123", "WBA3").
+    :param after_uid: UID последней строки предыдущей страницы (0 — первая страница).
+    :param limit: Размер страницы.
+    :return: (строки страницы: id, tg_id, user_name, contact, gos_num, vin_number, role; есть ли следующая страница)
+    """
+    subqueries = _user_search_subqueries(query)
+    if not subqueries:
+        return [], False
+
+    stmt = (
+        select(User.id, User.tg_id, User.user_name, User.contact, User.gos_num, User.vin_number, User.role)
+        .where(User.id.in_(union(*subqueries)), User.id > after_uid)
+        .order_by(User.id)
+        .limit(limit + 1)
+    )
+    rows = [dict(row._mapping) for row in await session.execute(stmt)]
+    return rows[:limit], len(rows) > limit
+
+
+@connection
+async def search_user_ids(session, query: str, limit: int) -> List[int]:
+    """UID всех найденных пользователей (не больше `limit`) — для массовых действий над результатом поиска."""
+    subqueries = _user_search_subqueries(query)
+    if not subqueries:
+        return []
+    stmt = select(User.id).where(User.id.in_(union(*subqueries))).order_by(User.id).limit(limit)
+    return list((await session.scalars(stmt)).all())
+
+
 @connection
 async def get_all_masters(session, exclude_tg_id: int | None = None) -> list[dict]:
     """
@@ -116,32 +361,15 @@ async def get_all_masters(session, exclude_tg_id: int | None = None) -> list[dic
 
 
 @connection
-async def get_user_dict_by_id(session, uid: int) -> Optional[Dict[str, Any]]:
+async def get_user_dict_by_id(session, uid: int) -> Optional[UserRow]:
     """
-    Возвращает словарь с данными пользователя по его внутреннему ID (users.id).
+    Возвращает данные пользователя (UserRow) по его внутреннему ID (users.id).
     Если пользователь не найден — возвращает None.
     """
-    result = await session.execute(select(User).where(User.id == uid))
-    user = result.scalar_one_or_none()
-    if user is None:
-        return None
-    return {
-        "id": user.id,
-        "tg_id": user.tg_id,
-        "user_name": user.user_name,
-        "status": user.status,
-        "rating": user.rating,
-        "contact": user.contact,
-        "brand_auto": user.brand_auto,
-        "model_auto": user.model_auto,
-        "year_auto": user.year_auto,
-        "gos_num": user.gos_num,
-        "vin_number": user.vin_number,
-        "total_km": user.total_km,
-        "role": user.role,
-        "can_messages": user.can_messages,
-        "date": user.date,
-    }
+    row = (await session.execute(
+        select(*[getattr(User, name) for name in UserRow.__slots__]).where(User.id == uid)
+    )).first()
+    return UserRow.from_row(row) if row else None
 
 
 @connection
@@ -171,7 +399,7 @@ async def get_user_by_tg_id(session, tg_id: int, fields: Optional[List[str]] = N
             return None
         columns_to_select = [User.__table__.c[field] for field in valid_fields]
     else:
-        columns_to_select = list(User.__table__.columns.keys)
+        columns_to_select = list(User.__table__.columns)
 
     stmt = select(*columns_to_select).where(User.tg_id == tg_id)
     result = await session.execute(stmt)
@@ -180,15 +408,21 @@ async def get_user_by_tg_id(session, tg_id: int, fields: Optional[List[str]] = N
     if row is None:
         return None
 
-    user_dict = dict(row)
+    user_dict = dict(row._mapping)
     if 'date' in user_dict and user_dict['date'] is not None:
         user_dict['date'] = user_dict['date'].isoformat()
 
     return user_dict
 
 
-@connection
-async def get_user_dict(session, tg_id: int, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+def _invalidate_user_cache(tg_id: Optional[int] = None) -> None:
+    """Сбрасывает профиль (или все профили) в загрузчике текущего апдейта после записи в users."""
+    loader = current_user_loader.get()
+    if loader is not None:
+        loader.clear(tg_id)
+
+
+async def get_user_dict(tg_id: int, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
     """
     Получает данные пользователя из базы по его Telegram ID.
 
@@ -196,6 +430,10 @@ async def get_user_dict(session, tg_id: int, fields: Optional[List[str]] = None)
     Все имена полей проверяются на существование в модели User —
     опечатки или несуществующие поля игнорируются.
 
+    Во время обработки апдейта запрос идёт через UserLoader (database/loaders.py):
+    вызовы из одного тика цикла событий объединяются в один запрос `tg_id IN (...)`,
+    а результат запоминается до конца апдейта.
+
     Примеры:
         # Получить все поля пользователя
         user = await get_user_dict(123456789)
@@ -203,25 +441,38 @@ async def get_user_dict(session, tg_id: int, fields: Optional[List[str]] = None)
         # Получить только нужные поля
         user = await get_user_dict(123456789, ["user_name", "contact", "brand_auto"])
 
-    :param session: Асинхронная сессия SQLAlchemy.
     :param tg_id: Telegram ID пользователя (уникальный идентификатор).
     :param fields: Список имён колонок для выборки (например: ["user_name", "contact"]).
                    Если None — возвращаются все поля модели User.
     :return: Словарь вида {"поле": значение, ...} или None, если пользователь не найден.
     """
-    allowed_columns = set(User.__table__.columns.keys())
+    loader = current_user_loader.get()
+    if loader is None:
+        return await _fetch_user_dict(tg_id, fields)
 
     if fields is not None:
-        valid_fields = [f for f in fields if f in allowed_columns]
+        valid_fields = [f for f in fields if f in USER_COLUMNS]
         if not valid_fields:
             return None
-        columns = [getattr(User, field) for field in valid_fields]
     else:
-        columns = [getattr(User, col) for col in allowed_columns]
+        valid_fields = list(USER_COLUMNS)
+    return await loader.load(tg_id, valid_fields)
 
-    column_names = [col.key for col in columns]
-    stmt = select(*columns).where(User.tg_id == tg_id)
-    result = await session.execute(stmt)
+
+@connection
+async def _fetch_user_dict(session, tg_id: int, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Прямой запрос профиля пользователя в БД (без загрузчика апдейта)."""
+    if fields is not None:
+        column_names = tuple(f for f in fields if f in USER_COLUMNS)
+        if not column_names:
+            return None
+    else:
+        column_names = USER_COLUMNS
+
+    if Config.DB_FAST_LOOKUP and _FAST_USER_FIELDS.issuperset(column_names):
+        return await _fast_user_fields(tg_id, column_names)
+
+    result = await _execute_prepared(session, _user_fields_stmt(column_names), {"tg_id": tg_id})
     row = result.fetchone()
 
     if row is None:
@@ -230,6 +481,45 @@ async def get_user_dict(session, tg_id: int, fields: Optional[List[str]] = None)
     return dict(zip(column_names, row))
 
 
+@connection
+async def get_users_dict_batch(
+        session,
+        tg_ids: List[int],
+        fields: Optional[List[str]] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Пакетная выборка профилей одним запросом `WHERE tg_id IN (...)`.
+    Используется UserLoader; несуществующие поля игнорируются, tg_id добавляется всегда.
+
+    :param session: Асинхронная сессия SQLAlchemy.
+    :param tg_ids: Список Telegram ID.
+    :param fields: Список имён колонок или None — все поля.
+    :return: {tg_id: {"поле": значение, ...}} только для найденных пользователей.
+    """
+    if not tg_ids:
+        return {}
+
+    column_names = tuple(f for f in (fields or USER_COLUMNS) if f in USER_COLUMNS)
+    tg_id_set = set(tg_ids)
+    # Один пользователь и только роль/имя (типичный апдейт) — быстрый путь
+    if Config.DB_FAST_LOOKUP and len(tg_id_set) == 1 and _FAST_USER_FIELDS.issuperset(column_names):
+        tg_id = tg_id_set.pop()
+        data = await _fast_user_fields(tg_id, column_names)
+        return {} if data is None else {tg_id: data}
+
+    select_names = column_names if "tg_id" in column_names else column_names + ("tg_id",)
+    result = await _execute_prepared(
+        session, _user_fields_stmt(select_names, batch=True), {"tg_ids": list(tg_id_set)}
+    )
+
+    users = {}
+    for row in result.all():
+        data = dict(zip(select_names, row))
+        # При дублях tg_id берём первую строку — как fetchone() в get_user_dict
+        users.setdefault(data["tg_id"], {name: data[name] for name in column_names})
+    return users
+
+
 @connection
 async def update_user(session, tg_id: int, column: str, value: Any) -> bool:
     """
@@ -246,7 +536,10 @@ async def update_user(session, tg_id: int, column: str, value: Any) -> bool:
 
     stmt = update(User).where(User.tg_id == tg_id).values({column: value})
     result = await session.execute(stmt)
+    if column in SEARCH_SOURCE_COLUMNS:
+        await session.execute(REFRESH_USER_SEARCH_BY_TG_ID, {"tg_id": tg_id})
     await session.commit()
+    _invalidate_user_cache(tg_id)
     return result.rowcount > 0
 
 
@@ -264,18 +557,90 @@ async def can_mess_true(session) -> List[int]:
 
 
 # РЕЙТИНГ
+async def _record_grade(session, order_id: int, tg_id_master: int, tg_id_user: int, grade: int) -> bool:
+    """
+    Записывает оценку в журнал grades и обновляет агрегаты master_ratings (в текущей транзакции).
+    Повторная оценка того же заказа игнорируется. :return: True, если оценка учтена.
+    """
+    now = current_time()
+    inserted = await session.execute(
+        sqlite_insert(Grade)
+        .values(order_id=order_id, tg_id_master=tg_id_master, tg_id_user=tg_id_user, grade=grade, created_at=now)
+        .on_conflict_do_nothing(index_elements=[Grade.order_id])
+    )
+    if inserted.rowcount == 0:
+        return False
+
+    previous = await session.scalar(
+        select(MasterRating.last_grades).where(MasterRating.tg_id_master == tg_id_master)
+    )
+    last_grades = ",".join(([str(grade)] + (previous.split(",") if previous else []))[:Config.RATING_LAST_GRADES])
+    stmt = sqlite_insert(MasterRating).values(
+        tg_id_master=tg_id_master, grades_count=1, grades_sum=grade, last_grades=last_grades, updated_at=now
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[MasterRating.tg_id_master],
+        set_={
+            "grades_count": MasterRating.grades_count + 1,
+            "grades_sum": MasterRating.grades_sum + grade,
+            "last_grades": last_grades,
+            "updated_at": now,
+        }
+    ))
+    return True
+
+
 @connection
-async def add_grade(session, user_id: int, rate: int) -> None:
+async def close_order_with_grade(session, order_id: int, grade: int) -> Optional[bool]:
     """
-    Увеличивает рейтинг пользователя (мастера) на указанное значение.
+    Закрывает заказ по подтверждению клиента и ставит оценку мастеру — одной транзакцией:
+    статус заказа, запись в журнале оценок и агрегаты мастера меняются вместе или не меняются вовсе.
+    Мастер и клиент берутся из самого заказа.
 
-    :param session: Асинхронная сессия SQLAlchemy.
-    :param user_id: Telegram ID мастера.
-    :param rate: Число, на которое увеличивается рейтинг.
+    :param order_id: ID заказа (архивный заказ возвращается в orders, как в update_order).
+    :param grade: Оценка 1–5.
+    :return: True — заказ закрыт и оценка учтена; False — заказ закрыт, но уже был оценён
+             (повторное нажатие); None — заказ не найден ни в orders, ни в архиве.
     """
-    stmt = update(User).where(User.tg_id == user_id).values(rating=User.rating + rate)
-    await session.execute(stmt)
+    stmt = (
+        update(Orders)
+        .where(Orders.id == order_id)
+        .values(repair_status="close")
+        .returning(Orders.tg_id_master, Orders.tg_id_user)
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None and await _restore_archived_order(session, order_id):
+        row = (await session.execute(stmt)).first()
+    if row is None:
+        await session.rollback()
+        return None
+
+    recorded = await _record_grade(session, order_id, row.tg_id_master, row.tg_id_user, grade)
     await session.commit()
+    return recorded
+
+
+def _master_rating_dict(count: Optional[int], total: Optional[int], last_grades: Optional[str]) -> Dict[str, Any]:
+    count = count or 0
+    return {
+        "count": count,
+        "avg": round(total / count, 2) if count else None,
+        "last": [int(value) for value in last_grades.split(",")] if last_grades else [],
+    }
+
+
+@connection
+async def get_master_rating(session, tg_id_master: int) -> Dict[str, Any]:
+    """
+    Оценки мастера из агрегатов master_ratings (одна строка по первичному ключу).
+
+    :return: {"count": число оценок, "avg": средняя (None — оценок нет), "last": последние оценки, новые первыми}
+    """
+    row = (await session.execute(
+        select(MasterRating.grades_count, MasterRating.grades_sum, MasterRating.last_grades)
+        .where(MasterRating.tg_id_master == tg_id_master)
+    )).first()
+    return _master_rating_dict(*row) if row else _master_rating_dict(0, 0, None)
 
 
 @connection
@@ -309,9 +674,11 @@ async def delete_user(session, tg_id: int) -> bool:
     if appointments:
         return False
 
-    # Удаляем пользователя
+    # Удаляем пользователя (строку поискового индекса — пока его users.id ещё известен)
+    await session.execute(DELETE_USER_SEARCH_BY_TG_ID, {"tg_id": tg_id})
     result = await session.execute(delete(User).where(User.tg_id == tg_id))
     await session.commit()
+    _invalidate_user_cache(tg_id)
     return result.rowcount > 0
 
 
@@ -326,6 +693,29 @@ async def get_all_active_user_ids(session) -> list[int]:
     return [int(tg_id) for tg_id in tg_ids if tg_id is not None]
 
 
+@streaming
+async def stream_active_user_ids(session, chunk_size: int = Config.STREAM_CHUNK_ROWS) -> AsyncIterator[int]:
+    """
+    Потоковый вариант get_all_active_user_ids (для рассылки): tg_id клиентов пачками по ключу users.id.
+    Каждая пачка — отдельный короткий запрос, поэтому долгий обход (отправка сообщений)
+    не удерживает снимок базы; пользователи, добавленные во время обхода, тоже попадут в выборку.
+    """
+    last_id = 0
+    while True:
+        rows = (await session.execute(
+            select(User.id, User.tg_id)
+            .where(User.role == "user", User.id > last_id)
+            .order_by(User.id)
+            .limit(chunk_size)
+        )).all()
+        for _, tg_id in rows:
+            if tg_id is not None:
+                yield int(tg_id)
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1].id
+
+
 # ==============================
 # COMMENTS
 # ==============================
@@ -356,35 +746,39 @@ async def get_visible_comments(session, mode: str = "user") -> List[Dict[str, An
         - "all"  → все отзывы без фильтрации (для модератора/админа).
     :return: Список словарей с данными отзывов.
     """
-    if mode == "all":
-        # Модератор: все отзывы
-        stmt = select(Comments).order_by(Comments.date.desc())
-    elif mode == "user":
-        # Пользователь: только разрешённые
-        stmt = select(Comments).where(Comments.is_visible.is_(True)).order_by(Comments.date.desc())
-    else:
-        raise ValueError(f"Неизвестный режим: {mode}. Ожидались 'user' или 'all'.")
-
-    result = await session.execute(stmt)
-    comments = result.scalars().all()
+    result = await session.execute(_visible_comments_select(mode))
 
     comment_list = []
-    for c in comments:
-        item = {
-            "id": c.id,
-            "tg_id": c.tg_id,
-            "user_name": c.user_name,
-            "text": c.text,
-            "date": c.date.isoformat() if c.date else "не указана"
-        }
-        # Для модератора добавляем служебное поле
-        if mode == "all":
-            item["is_visible"] = c.is_visible
+    for row in result.all():
+        item = dict(row._mapping)
+        item["date"] = item["date"].isoformat() if item["date"] else "не указана"
         comment_list.append(item)
 
     return comment_list
 
 
+def _visible_comments_select(mode: str):
+    columns = [Comments.id, Comments.tg_id, Comments.user_name, Comments.text, Comments.date]
+    if mode == "all":
+        # Модератор: все отзывы и служебное поле is_visible
+        return select(*columns, Comments.is_visible).order_by(Comments.date.desc())
+    if mode == "user":
+        # Пользователь: только разрешённые
+        return select(*columns).where(Comments.is_visible.is_(True)).order_by(Comments.date.desc())
+    raise ValueError(f"Неизвестный режим: {mode}. Ожидались 'user' или 'all'.")
+
+
+@streaming
+async def stream_visible_comments(session, mode: str = "user", chunk_size: int = Config.STREAM_CHUNK_ROWS):
+    """
+    Потоковый вариант get_visible_comments: строки (id, tg_id, user_name, text, date[, is_visible]),
+    новые первыми; date — datetime. Читаются курсором пачками по `chunk_size`.
+    """
+    result = await session.stream(_visible_comments_select(mode).execution_options(yield_per=chunk_size))
+    async for row in result:
+        yield row
+
+
 # ==============================
 # ORDERS
 # ==============================
@@ -451,12 +845,9 @@ async def get_active_order_id(session, tg_id_user: int, tg_id_master: int) -> Op
     Возвращает ID заказа со статусом 'in_work' между клиентом и мастером.
     Если такого заказа нет — возвращает None.
     """
-    stmt = select(Orders.id).where(
-        Orders.tg_id_user == tg_id_user,
-        Orders.tg_id_master == tg_id_master,
-        Orders.repair_status == "in_work"
+    result = await _execute_prepared(
+        session, _ACTIVE_ORDER_ID_STMT, {"tg_id_user": tg_id_user, "tg_id_master": tg_id_master}
     )
-    result = await session.execute(stmt)
     return result.scalar()  # Возвращает int или None
 
 
@@ -466,8 +857,11 @@ async def get_orders_by_user(
     tg_id_user: Optional[int] = None,
     tg_id_master: Optional[int] = None,
     order_id: Optional[int] = None,
-    active: bool = True
-) -> List[Dict[str, Any]]:
+    active: bool = True,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    count_only: bool = False
+) -> Union[List[OrderRow], List[Dict[str, Any]], int]:
     """
     Возвращает список заказов:
     - Если указан order_id → возвращает список из одного заказа (или пустой).
@@ -477,58 +871,113 @@ async def get_orders_by_user(
 
     При поиске по order_id параметры tg_id_user, tg_id_master, active игнорируются.
 
+    Как и в get_user_dict, можно выбрать только нужные колонки — запрос читает лишь их:
+
+        # Кнопки выбора заказа
+        orders = await get_orders_by_user(tg_id_master=123, fields=["id", "brand_auto", "model_auto", "year_auto"])
+
+        # Есть ли активный заказ
+        has_orders = await get_orders_by_user(tg_id_user=123, limit=1, count_only=True) > 0
+
     :param session: Асинхронная сессия SQLAlchemy.
     :param tg_id_user: Telegram ID клиента (опционально).
     :param tg_id_master: Telegram ID мастера (опционально).
     :param active:
         - True → заказы со статусом in_work/wait (активные)
-        - False → только закрытые (close)
-    :param order_id: ID конкретного заказа (опционально).
-    :return: Список словарей с данными заказов.
+        - False → только закрытые (close), включая архив (orders_archive);
+          для длинной истории — постраничная get_closed_orders_page
+    :param order_id: ID конкретного заказа (опционально, ищется и в архиве).
+    :param fields: Имена полей заказа (ORDER_FIELDS); несуществующие игнорируются.
+                   Если None — все поля.
+    :param limit: Не больше `limit` заказов (порядок не задан; по дате — get_closed_orders_page).
+    :param count_only: Вернуть только количество заказов (с учётом `limit`), без чтения строк.
+    :return: Список OrderRow; при `fields` — список словарей {поле: значение};
+             при `count_only` — число. Если среди `fields` нет ни одного допустимого — пустой список.
     :raises ValueError: если не указан ни один из фильтров.
     """
-    conditions = []
+    if fields is not None:
+        fields = [f for f in fields if f in ORDER_FIELDS]
+        if not fields and not count_only:
+            return []
+    columns = fields or ORDER_FIELDS
 
     if order_id is not None:
-        conditions.append(Orders.id == order_id)
-    else:
-        if tg_id_user is None and tg_id_master is None:
-            raise ValueError("Укажите хотя бы один из параметров: tg_id_user, tg_id_master или order_id")
+        # Заказ мог уйти в архив — тогда он ищется там
+        for model in (Orders, OrdersArchive):
+            stmt = _order_select(model, ("id",) if count_only else columns).where(model.id == order_id)
+            rows = (await session.execute(stmt)).all()
+            if rows:
+                return len(rows) if count_only else _order_rows(rows, fields)
+        return 0 if count_only else []
+
+    stmt = _orders_by_user_select(tg_id_user, tg_id_master, active, ("id",) if count_only else columns)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if count_only:
+        return await session.scalar(select(func.count()).select_from(stmt.subquery()))
+    return _order_rows((await session.execute(stmt)).all(), fields)
+
+
+def _orders_by_user_select(
+        tg_id_user: Optional[int],
+        tg_id_master: Optional[int],
+        active: bool,
+        fields: Optional[Sequence[str]] = None
+):
+    if tg_id_user is None and tg_id_master is None:
+        raise ValueError("Укажите хотя бы один из параметров: tg_id_user, tg_id_master или order_id")
+
+    def filtered(model):
+        stmt = _order_select(model, fields or ORDER_FIELDS)
         if tg_id_user is not None:
-            conditions.append(Orders.tg_id_user == tg_id_user)
+            stmt = stmt.where(model.tg_id_user == tg_id_user)
         if tg_id_master is not None:
-            conditions.append(Orders.tg_id_master == tg_id_master)
-        if active:
-            conditions.append(Orders.repair_status != "close")
-        else:
-            conditions.append(Orders.repair_status == "close")
+            stmt = stmt.where(model.tg_id_master == tg_id_master)
+        return stmt
 
-    stmt = select(Orders).where(*conditions)
-    result = await session.execute(stmt)
-    orders = result.scalars().all()
-
-    orders_list = []
-    for order in orders:
-        orders_list.append({
-            "id": order.id,
-            "tg_id_user": order.tg_id_user,
-            "tg_id_master": order.tg_id_master,
-            "user_name": order.user_name,
-            "user_contact": order.user_contact,
-            "master_name": order.master_name,
-            "master_contact": order.master_contact,
-            "repair_status": order.repair_status,
-            "complied": order.complied,
-            "description": order.description,
-            "brand_auto": order.brand_auto,
-            "model_auto": order.model_auto,
-            "total_km": order.total_km,
-            "year_auto": order.year_auto,
-            "gos_num": order.gos_num,
-            "vin_number": order.vin_number,
-            "date": order.date.isoformat() if order.date else "не указана",
-        })
-    return orders_list
+    if active:
+        return filtered(Orders).where(Orders.repair_status != "close")
+    # Закрытые — из обеих частей: действующей таблицы и архива
+    return union_all(filtered(Orders).where(Orders.repair_status == "close"), filtered(OrdersArchive))
+
+
+@streaming
+async def stream_orders_by_user(
+        session,
+        tg_id_user: Optional[int] = None,
+        tg_id_master: Optional[int] = None,
+        active: bool = True,
+        fields: Optional[List[str]] = None,
+        chunk_size: int = Config.STREAM_CHUNK_ROWS
+) -> AsyncIterator[Union[OrderRow, Dict[str, Any]]]:
+    """
+    Потоковый вариант get_orders_by_user (без order_id): заказы OrderRow
+    (или словари при `fields`), читаются курсором пачками по `chunk_size`.
+    """
+    if fields is not None:
+        fields = [f for f in fields if f in ORDER_FIELDS]
+        if not fields:
+            return
+    stmt = _orders_by_user_select(tg_id_user, tg_id_master, active, fields)
+    result = await session.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions():
+        for order in _order_rows(partition, fields):
+            yield order
+
+
+# Поля заказа (OrderRow) в порядке колонок запроса: get_orders_by_user, get_closed_orders_page
+ORDER_FIELDS = OrderRow.__slots__
+
+
+def _order_select(model, fields: Sequence[str] = ORDER_FIELDS):
+    return select(*[getattr(model, name) for name in fields])
+
+
+def _order_rows(rows, fields: Optional[Sequence[str]]) -> Union[List[OrderRow], List[Dict[str, Any]]]:
+    """Полные строки → OrderRow, проекция `fields` → словари."""
+    if fields is None:
+        return [OrderRow.from_row(row) for row in rows]
+    return [dict(zip(fields, row)) for row in rows]
 
 
 @connection
@@ -555,6 +1004,9 @@ async def update_order(session, order_id: int, **kwargs) -> bool:
 
     stmt = update(Orders).where(Orders.id == order_id).values(**update_data)
     result = await session.execute(stmt)
+    if result.rowcount == 0 and await _restore_archived_order(session, order_id):
+        # Архив не изменяется: заказ возвращается в orders и обновляется там
+        result = await session.execute(stmt)
     await session.commit()
     return result.rowcount > 0
 
@@ -568,12 +1020,107 @@ async def delete_order(session, order_id: int) -> bool:
     :param order_id: int
     :return: True, если заказ был найден и удалён.
     """
-    stmt = delete(Orders).where(Orders.id == order_id)
-    result = await session.execute(stmt)
+    result = await session.execute(delete(Orders).where(Orders.id == order_id))
+    if result.rowcount == 0:
+        result = await session.execute(delete(OrdersArchive).where(OrdersArchive.id == order_id))
     await session.commit()
     return result.rowcount > 0
 
 
+# ==============================
+# ORDERS: АРХИВ И ИСТОРИЯ
+# ==============================
+# Колонки, переносимые между orders и orders_archive (id сохраняется)
+ORDER_COLUMNS = tuple(Orders.__table__.columns.keys())
+
+
+async def _restore_archived_order(session, order_id: int) -> bool:
+    """Переносит заказ из архива обратно в orders (в текущей транзакции). False — в архиве его нет."""
+    moved = await session.execute(
+        insert(Orders).from_select(
+            ORDER_COLUMNS,
+            select(*[getattr(OrdersArchive, name) for name in ORDER_COLUMNS]).where(OrdersArchive.id == order_id)
+        )
+    )
+    if moved.rowcount == 0:
+        return False
+    await session.execute(delete(OrdersArchive).where(OrdersArchive.id == order_id))
+    db_logger.info(f"Заказ {order_id} возвращён из архива")
+    return True
+
+
+@connection
+async def archive_closed_orders(session, older_than_days: int, batch_size: int = 5000) -> int:
+    """
+    Переносит одну пачку закрытых заказов старше `older_than_days` дней в orders_archive
+    (INSERT ... SELECT и DELETE в одной транзакции). Вызывается повторно, пока не вернёт 0.
+
+    :return: Число перенесённых заказов.
+    """
+    # Orders.date хранится в UTC (current_time) — порог и отметка архивации тоже в UTC
+    now = current_time()
+    cutoff = now - timedelta(days=older_than_days)
+    ids = list((await session.scalars(
+        select(Orders.id)
+        .where(Orders.repair_status == "close", Orders.date < cutoff)
+        .order_by(Orders.id)
+        .limit(batch_size)
+    )).all())
+    if not ids:
+        return 0
+
+    await session.execute(
+        insert(OrdersArchive).from_select(
+            ORDER_COLUMNS + ("archived_at",),
+            select(*[getattr(Orders, name) for name in ORDER_COLUMNS], literal(now, OrdersArchive.archived_at.type))
+            .where(Orders.id.in_(ids))
+        )
+    )
+    await session.execute(delete(Orders).where(Orders.id.in_(ids)))
+    await session.commit()
+    return len(ids)
+
+
+@connection
+async def get_closed_orders_page(
+        session,
+        tg_id_master: Optional[int] = None,
+        tg_id_user: Optional[int] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+        limit: int = 10
+) -> Tuple[List[OrderRow], Optional[Tuple[datetime, int]]]:
+    """
+    Страница закрытых заказов (новые первыми) из orders и orders_archive.
+    Постраничность по ключу (date, id): каждая часть читает по индексу не больше `limit + 1` строк,
+    объединение сортируется и обрезается — стоимость страницы не зависит от длины истории.
+
+    :param before: Ключ (date, id) последнего заказа предыдущей страницы; None — первая страница.
+    :return: (заказы страницы в формате get_orders_by_user; ключ для следующей страницы или None)
+    """
+    if tg_id_user is None and tg_id_master is None:
+        raise ValueError("Укажите хотя бы один из параметров: tg_id_user или tg_id_master")
+
+    def tier(model, *conditions):
+        stmt = _order_select(model).where(*conditions)
+        if tg_id_master is not None:
+            stmt = stmt.where(model.tg_id_master == tg_id_master)
+        if tg_id_user is not None:
+            stmt = stmt.where(model.tg_id_user == tg_id_user)
+        if before is not None:
+            stmt = stmt.where(tuple_(model.date, model.id) < tuple_(*before))
+        return select(
+            stmt.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).subquery()
+        )
+
+    merged = union_all(tier(Orders, Orders.repair_status == "close"), tier(OrdersArchive)).subquery()
+    stmt = select(merged).order_by(merged.c.date.desc(), merged.c.id.desc()).limit(limit + 1)
+    rows = (await session.execute(stmt)).all()
+
+    page = [OrderRow.from_row(row) for row in rows[:limit]]
+    next_before = (page[-1].date, page[-1].id) if len(rows) > limit else None
+    return page, next_before
+
+
 # ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ
 async def count_and_name_gen(orders_list: List[Dict[str, Any]]) -> Tuple[int, List[Tuple[str, int, int]]]:
     """
@@ -730,17 +1277,51 @@ async def get_filter_appointments(
         session,
         tg_id_master: Optional[int] = None,
         tg_id_user: Optional[int] = None,
-        date_filter: Optional[str] = None  # "today", "month", or None (all)
-) -> List[Dict[str, Any]]:
+        date_filter: Optional[str] = None,  # "today", "month", or None (all)
+        counterpart: Optional[str] = None  # "user", "master" or None (без JOIN)
+) -> List[AppointmentRow]:
     """
     Получает записи с опциональной фильтрацией по дате.
 
+    Если указан `counterpart`, к записям одним запросом (LEFT JOIN users) добавляются
+    имя и телефон второй стороны — это избавляет от вызова get_user_dict на каждую запись:
+        - "user"   → данные клиента (JOIN по tg_id_user), для списка записей мастера;
+        - "master" → данные мастера (JOIN по tg_id_master), для записи клиента.
+
     :param session: Асинхронная сессия SQLAlchemy.
     :param tg_id_master: Фильтр по мастеру (опционально).
     :param tg_id_user: Фильтр по клиенту (опционально).
     :param date_filter: "today", "month" или None.
-    """
-    stmt = select(Appointment)
+    :param counterpart: "user", "master" или None.
+    :return: Список записей (AppointmentRow); при JOIN заполнены user_name и contact
+             (None, если пользователь не найден).
+    """
+    result = await session.execute(_filter_appointments_select(tg_id_master, tg_id_user, date_filter, counterpart))
+    return [AppointmentRow.from_row(row) for row in result.all()]
+
+
+# Поля записи из appointments (первые поля AppointmentRow, далее — данные второй стороны)
+APPOINTMENT_FIELDS = AppointmentRow.__slots__[:6]
+
+
+def _filter_appointments_select(
+        tg_id_master: Optional[int],
+        tg_id_user: Optional[int],
+        date_filter: Optional[str],
+        counterpart: Optional[str]
+):
+    if counterpart == "user":
+        join_column = Appointment.tg_id_user
+    elif counterpart == "master":
+        join_column = Appointment.tg_id_master
+    elif counterpart is None:
+        join_column = None
+    else:
+        raise ValueError(f"Неизвестная сторона записи: {counterpart!r}")
+
+    stmt = select(*[getattr(Appointment, name) for name in APPOINTMENT_FIELDS])
+    if join_column is not None:
+        stmt = stmt.add_columns(User.user_name, User.contact).outerjoin(User, _user_join_on(User, join_column))
 
     if tg_id_master is not None:
         stmt = stmt.where(Appointment.tg_id_master == tg_id_master)
@@ -749,7 +1330,8 @@ async def get_filter_appointments(
 
     today = datetime.utcnow().date()
     if date_filter == "today":
-        stmt = stmt.where(func.date(Appointment.appointment_date) == today)
+        # Сравнение колонки без func.date(), чтобы работал индекс по (мастер, дата)
+        stmt = stmt.where(Appointment.appointment_date == today)
     elif date_filter == "month":
         first_day = today.replace(day=1)
         if today.month == 12:
@@ -763,21 +1345,27 @@ async def get_filter_appointments(
             )
         )
 
-    stmt = stmt.order_by(Appointment.appointment_date, Appointment.appointment_time)
-    result = await session.execute(stmt)
-    appointments = result.scalars().all()
+    return stmt.order_by(Appointment.appointment_date, Appointment.appointment_time)
 
-    return [
-        {
-            "id": appt.id,
-            "tg_id_user": appt.tg_id_user,
-            "tg_id_master": appt.tg_id_master,
-            "appointment_date": appt.appointment_date,
-            "appointment_time": appt.appointment_time,
-            "end_time": appt.end_time,
-        }
-        for appt in appointments
-    ]
+
+@streaming
+async def stream_filter_appointments(
+        session,
+        tg_id_master: Optional[int] = None,
+        tg_id_user: Optional[int] = None,
+        date_filter: Optional[str] = None,
+        counterpart: Optional[str] = None,
+        chunk_size: int = Config.STREAM_CHUNK_ROWS
+) -> AsyncIterator[AppointmentRow]:
+    """
+    Потоковый вариант get_filter_appointments: записи AppointmentRow,
+    читаются курсором пачками по `chunk_size`.
+    """
+    stmt = _filter_appointments_select(tg_id_master, tg_id_user, date_filter, counterpart)
+    result = await session.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.partitions():
+        for row in partition:
+            yield AppointmentRow.from_row(row)
 
 
 @connection
@@ -786,9 +1374,7 @@ async def has_active_appointment(session, tg_id: int) -> bool:
     Проверяет, есть ли у пользователя (по tg_id) хотя бы одна запись в таблице appointments.
     Возвращает True, если запись существует, иначе False.
     """
-    result = await session.execute(
-        select(Appointment.id).where(Appointment.tg_id_user == tg_id).limit(1)
-    )
+    result = await _execute_prepared(session, _HAS_APPOINTMENT_STMT, {"tg_id": tg_id})
     return result.scalar() is not None
 
 
@@ -893,39 +1479,52 @@ async def get_diagnostics_by_filter(session, filter_type: str) -> list[dict]:
 
 
 @connection
-async def get_api_dtc_history(session) -> list[dict]:
+async def get_api_dtc_history(session) -> List[DtcRow]:
     """
     Возвращает все записи с entry_type='api_dtc' из таблицы diagnostics,
     отсортированные по дате создания (от старых к новым).
-    Каждый элемент — словарь с ключами: code, definition, causes, created_at.
+    Каждый элемент — DtcRow: code, definition, causes, created_at.
 
     :param session: Асинхронная сессия SQLAlchemy.
     """
-    stmt = select(
-        Diagnostics.issue_and_causes,
-        Diagnostics.created_at
-    ).where(
-        Diagnostics.entry_type == "api_dtc"
-    ).order_by(Diagnostics.created_at.asc())
-    result = await session.execute(stmt)
-    rows = result.fetchall()
-
+    result = await session.execute(_API_DTC_HISTORY_SELECT)
     history_list = []
-    for row in rows:
-        try:
-            data = json.loads(row.issue_and_causes)
-            if isinstance(data, dict):
-                history_list.append({
-                    "code": data.get("code", "—"),
-                    "definition": data.get("definition", "—"),
-                    "causes": data.get("causes", []),
-                    "created_at": row.created_at
-                })
-        except (json.JSONDecodeError, TypeError):
-            continue
+    for row in result.all():
+        item = _api_dtc_item(row)
+        if item is not None:
+            history_list.append(item)
     return history_list
 
 
+_API_DTC_HISTORY_SELECT = select(
+    Diagnostics.issue_and_causes,
+    Diagnostics.created_at
+).where(
+    Diagnostics.entry_type == "api_dtc"
+).order_by(Diagnostics.created_at.asc())
+
+
+def _api_dtc_item(row) -> Optional[DtcRow]:
+    # Запись с повреждённым JSON пропускается
+    try:
+        data = json.loads(row.issue_and_causes)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    return DtcRow(data.get("code", "—"), data.get("definition", "—"), data.get("causes", []), row.created_at)
+
+
+@streaming
+async def stream_api_dtc_history(session, chunk_size: int = Config.STREAM_CHUNK_ROWS) -> AsyncIterator[DtcRow]:
+    """Потоковый вариант get_api_dtc_history: записи по одной, читаются курсором пачками по `chunk_size`."""
+    result = await session.stream(_API_DTC_HISTORY_SELECT.execution_options(yield_per=chunk_size))
+    async for row in result:
+        item = _api_dtc_item(row)
+        if item is not None:
+            yield item
+
+
 @connection
 async def save_api_dtc_record(
     session,
@@ -1005,11 +1604,11 @@ async def get_user_statistics(session) -> dict:
         "master": master or 0,
     }
 
-# Статистика по записям (Appointment)
+# Статистика по записям (суточные итоги daily_stats)
 @connection
 async def get_appointment_statistics(session) -> dict:
     """
-    Возвращает статистику по записям:
+    Возвращает статистику по записям (включая уже удалённые — превращённые в заказы или отменённые):
     - total: за всё время
     - year: за текущий год
     - month: за текущий месяц
@@ -1020,36 +1619,89 @@ async def get_appointment_statistics(session) -> dict:
     year_start = date(today.year, 1, 1)
     month_start = date(today.year, today.month, 1)
 
-    total = await session.scalar(select(func.count(Appointment.id)))
-    year = await session.scalar(
-        select(func.count(Appointment.id)).where(Appointment.appointment_date >= year_start)
-    )
-    month = await session.scalar(
-        select(func.count(Appointment.id)).where(Appointment.appointment_date >= month_start)
-    )
-    today_count = await session.scalar(
-        select(func.count(Appointment.id)).where(Appointment.appointment_date == today)
-    )
+    appointments = func.coalesce(func.sum(DailyStat.appointments), 0)
+    total, year, month, today_count = (await session.execute(
+        select(
+            appointments,
+            func.coalesce(func.sum(DailyStat.appointments).filter(DailyStat.day >= year_start), 0),
+            func.coalesce(func.sum(DailyStat.appointments).filter(DailyStat.day >= month_start), 0),
+            func.coalesce(func.sum(DailyStat.appointments).filter(DailyStat.day == today), 0),
+        )
+    )).one()
 
     # Топ-3 самых загруженных дней
     top_days = await session.execute(
-        select(Appointment.appointment_date, func.count(Appointment.id))
-        .group_by(Appointment.appointment_date)
-        .order_by(func.count(Appointment.id).desc())
+        select(DailyStat.day, appointments)
+        .group_by(DailyStat.day)
+        .having(appointments > 0)
+        .order_by(appointments.desc())
         .limit(3)
     )
     top_days_list = [(d, cnt) for d, cnt in top_days.fetchall()]
 
     return {
-        "total": total or 0,
-        "year": year or 0,
-        "month": month or 0,
-        "today": today_count or 0,
+        "total": total,
+        "year": year,
+        "month": month,
+        "today": today_count,
         "top_days": top_days_list,
     }
 
 
-# Статистика по заказам (Orders)
+# Динамика по дням за период (суточные итоги daily_stats)
+@connection
+async def get_trend_statistics(session, start: date, end: date) -> dict:
+    """
+    Итоги за период [start, end] по суточной таблице daily_stats: одна строка на день и мастера,
+    поэтому даже год — сумма нескольких сотен строк.
+
+    :return: {
+        "days": [(день, создано заказов, закрыто заказов, записей), ...] — только дни с событиями, по возрастанию,
+        "totals": {"created": int, "closed": int, "appointments": int},
+        "weekdays": [(день недели 0=Пн..6=Вс, заказов создано, записей), ...] — самые загруженные первыми,
+    }
+    """
+    created = func.sum(DailyStat.orders_created)
+    closed = func.sum(DailyStat.orders_closed)
+    appointments = func.sum(DailyStat.appointments)
+    rows = (await session.execute(
+        select(DailyStat.day, created, closed, appointments)
+        .where(DailyStat.day.between(start, end))
+        .group_by(DailyStat.day)
+        .order_by(DailyStat.day)
+    )).all()
+
+    days = [tuple(row) for row in rows]
+    weekdays = {}
+    for day, day_created, _, day_appointments in days:
+        load = weekdays.setdefault(day.weekday(), [0, 0])
+        load[0] += day_created
+        load[1] += day_appointments
+
+    return {
+        "days": days,
+        "totals": {
+            "created": sum(row[1] for row in days),
+            "closed": sum(row[2] for row in days),
+            "appointments": sum(row[3] for row in days),
+        },
+        "weekdays": sorted(
+            ((weekday, load[0], load[1]) for weekday, load in weekdays.items()),
+            key=lambda item: (item[1] + item[2], -item[0]),
+            reverse=True,
+        ),
+    }
+
+
+def _closed_orders(*names: str):
+    """Подзапрос закрытых заказов обеих частей (orders + orders_archive) с указанными колонками."""
+    return union_all(
+        select(*[getattr(Orders, name) for name in names]).where(Orders.repair_status == "close"),
+        select(*[getattr(OrdersArchive, name) for name in names]),
+    ).subquery()
+
+
+# Статистика по заказам (Orders и архив)
 @connection
 async def get_order_statistics(session) -> dict:
     """
@@ -1066,49 +1718,41 @@ async def get_order_statistics(session) -> dict:
     month_start = datetime(today.year, today.month, 1)
     today_start = datetime(today.year, today.month, today.day)
 
-    # Активные: НЕ закрытые И не выполнены (complied=False)
+    # Активные: НЕ закрытые И не выполнены (complied=False); в архиве — только закрытые
     active = await session.scalar(
         select(func.count(Orders.id)).where(
             (Orders.repair_status != "close") | (Orders.complied == False)
         )
+    ) + await session.scalar(
+        select(func.count(OrdersArchive.id)).where(OrdersArchive.complied == False)
     )
 
+    # Закрытые заказы — из orders и архива
+    closed = _closed_orders("id", "date")
+
     # Закрытые за всё время
-    closed_total = await session.scalar(
-        select(func.count(Orders.id)).where(Orders.repair_status == "close")
-    )
+    closed_total = await session.scalar(select(func.count(closed.c.id)))
 
     # Закрытые за год
     closed_year = await session.scalar(
-        select(func.count(Orders.id)).where(
-            (Orders.repair_status == "close") &
-            (Orders.date >= year_start)
-        )
+        select(func.count(closed.c.id)).where(closed.c.date >= year_start)
     )
 
     # Закрытые за месяц
     closed_month = await session.scalar(
-        select(func.count(Orders.id)).where(
-            (Orders.repair_status == "close") &
-            (Orders.date >= month_start)
-        )
+        select(func.count(closed.c.id)).where(closed.c.date >= month_start)
     )
 
     # Закрытые за день
     closed_today = await session.scalar(
-        select(func.count(Orders.id)).where(
-            (Orders.repair_status == "close") &
-            (Orders.date >= today_start)
-        )
+        select(func.count(closed.c.id)).where(closed.c.date >= today_start)
     )
 
     # Среднее в день (если есть хотя бы 1 закрытый заказ)
     avg_per_day = 0.0
     if closed_total and closed_total > 0:
         # Находим самую раннюю дату закрытого заказа
-        earliest = await session.scalar(
-            select(func.min(Orders.date)).where(Orders.repair_status == "close")
-        )
+        earliest = await session.scalar(select(func.min(closed.c.date)))
         if earliest:
             days_span = (datetime.utcnow().date() - earliest.date()).days or 1
             avg_per_day = round(closed_total / days_span, 2)
@@ -1150,6 +1794,7 @@ async def get_top_clients_statistics(session) -> dict:
             ]
         }
     """
+    # Счётчики user_order_counters: индексный проход по closed_as_client до 10 строк
     stmt = (
         select(
             User.user_name,
@@ -1157,20 +1802,12 @@ async def get_top_clients_statistics(session) -> dict:
             User.brand_auto,
             User.model_auto,
             User.year_auto,
-            func.count(Orders.id).label("closed_count")
+            UserOrderCounter.closed_as_client.label("closed_count")
         )
-        .select_from(User)
-        .join(Orders, User.tg_id == Orders.tg_id_user)
-        .where(Orders.repair_status == "close")
-        .group_by(
-            User.tg_id,
-            User.user_name,
-            User.rating,
-            User.brand_auto,
-            User.model_auto,
-            User.year_auto
-        )
-        .order_by(func.count(Orders.id).desc())
+        .select_from(UserOrderCounter)
+        .join(User, _user_join_on(User, UserOrderCounter.tg_id))
+        .where(UserOrderCounter.closed_as_client > 0)
+        .order_by(UserOrderCounter.closed_as_client.desc())
         .limit(10)
     )
     result = await session.execute(stmt)
@@ -1198,7 +1835,7 @@ async def get_top_masters_statistics(session) -> dict:
 
     Для каждого мастера включает:
         - user_name: имя мастера
-        - rating: рейтинг (по умолчанию 0, если None)
+        - rating: оценки клиентов из master_ratings ({"count", "avg", "last"}, см. get_master_rating)
         - closed_orders: количество закрытых заказов
 
     Возвращаемый формат:
@@ -1206,7 +1843,7 @@ async def get_top_masters_statistics(session) -> dict:
             "masters": [
                 {
                     "user_name": str,
-                    "rating": int,
+                    "rating": dict,
                     "closed_orders": int
                 },
                 ...
@@ -1216,19 +1853,16 @@ async def get_top_masters_statistics(session) -> dict:
     stmt = (
         select(
             User.user_name,
-            User.rating,
-            func.count(Orders.id).label("closed_count")
-        )
-        .select_from(User)
-        .join(Orders, User.tg_id == Orders.tg_id_master)
-        .where(
-            and_(
-                User.role == "master",
-                Orders.repair_status == "close"
-            )
+            MasterRating.grades_count,
+            MasterRating.grades_sum,
+            MasterRating.last_grades,
+            UserOrderCounter.closed_as_master.label("closed_count")
         )
-        .group_by(User.tg_id, User.user_name, User.rating)
-        .order_by(func.count(Orders.id).desc())
+        .select_from(UserOrderCounter)
+        .join(User, _user_join_on(User, UserOrderCounter.tg_id))
+        .outerjoin(MasterRating, MasterRating.tg_id_master == User.tg_id)
+        .where(UserOrderCounter.closed_as_master > 0, User.role == "master")
+        .order_by(UserOrderCounter.closed_as_master.desc())
     )
     result = await session.execute(stmt)
     rows = result.fetchall()
@@ -1237,8 +1871,110 @@ async def get_top_masters_statistics(session) -> dict:
     for row in rows:
         masters.append({
             "user_name": row.user_name,
-            "rating": row.rating or 0,
+            "rating": _master_rating_dict(row.grades_count, row.grades_sum, row.last_grades),
             "closed_orders": row.closed_count
         })
 
     return {"masters": masters}
+
+
+# Сверка и пересчёт счётчиков закрытых заказов
+@connection
+async def verify_order_counters(session, rebuild: bool = False) -> dict:
+    """
+    Сверяет user_order_counters с заказами (orders + orders_archive) и при rebuild=True
+    пересчитывает таблицу целиком (одной транзакцией).
+
+    :return: {"mismatches": расхождения до пересчёта (см. check_order_counters),
+              "rebuilt": число пользователей после пересчёта или None}
+    """
+    conn = await session.connection()
+    mismatches = await conn.run_sync(check_order_counters)
+    rebuilt = None
+    if rebuild:
+        rebuilt = await conn.run_sync(rebuild_order_counters)
+        await session.commit()
+    return {"mismatches": mismatches, "rebuilt": rebuilt}
+
+
+# ==============================
+# ЭКСПОРТ
+# ==============================
+EXPORT_KINDS = ("orders", "appointments", "diagnostics")
+
+
+def _column_headers(columns) -> List[str]:
+    # Заголовок CSV — комментарий колонки модели (по-русски), иначе её имя
+    return [getattr(col, "comment", None) or col.name for col in columns]
+
+
+def _export_selects(kind: str, start: date, end: date) -> Tuple[List[str], list]:
+    """
+    Заголовки CSV и запросы выгрузки за период [start, end] (включительно).
+    Запросы читаются по очереди, каждый — в порядке первичного ключа, без общей сортировки.
+    """
+    start_dt = datetime.combine(start, time.min)
+    end_dt = datetime.combine(end + timedelta(days=1), time.min)
+
+    if kind == "orders":
+        # Сначала архив (старые заказы), затем рабочая таблица
+        stmts = [
+            select(*[getattr(model, name) for name in ORDER_COLUMNS])
+            .where(model.date >= start_dt, model.date < end_dt)
+            .order_by(model.id)
+            for model in (OrdersArchive, Orders)
+        ]
+        return _column_headers(Orders.__table__.columns), stmts
+
+    if kind == "appointments":
+        client, master = aliased(User), aliased(User)
+        columns = (
+            Appointment.id, Appointment.appointment_date, Appointment.appointment_time, Appointment.end_time,
+            Appointment.tg_id_user, Appointment.tg_id_master,
+        )
+        stmt = (
+            select(*columns, client.user_name, client.contact, master.user_name)
+            .select_from(Appointment)
+            .outerjoin(client, _user_join_on(client, Appointment.tg_id_user))
+            .outerjoin(master, _user_join_on(master, Appointment.tg_id_master))
+            .where(Appointment.appointment_date.between(start, end))
+            .order_by(Appointment.id)
+        )
+        headers = _column_headers(col.property.columns[0] for col in columns)
+        return headers + ["Имя клиента", "Телефон клиента", "Имя мастера"], [stmt]
+
+    if kind == "diagnostics":
+        columns = Diagnostics.__table__.columns
+        stmt = (
+            select(*columns)
+            .where(Diagnostics.created_at >= start_dt, Diagnostics.created_at < end_dt)
+            .order_by(Diagnostics.id)
+        )
+        return _column_headers(columns), [stmt]
+
+    raise ValueError(f"Неизвестный тип выгрузки: {kind}")
+
+
+@streaming
+async def stream_export_rows(
+        session,
+        kind: str,
+        start: date,
+        end: date,
+        chunk_size: int = Config.EXPORT_CHUNK_ROWS
+) -> AsyncIterator[List[Any]]:
+    """
+    Выгрузка за период для экспорта: асинхронный итератор, первым элементом отдаёт список
+    заголовков, затем — пачки строк по `chunk_size`.
+
+    Строки читаются курсором (session.stream + yield_per), в памяти одна пачка. Только чтение:
+    транзакция записи не открывается, а в режиме WAL чтение не блокирует запись других обработчиков.
+
+    :param kind: "orders" (вместе с архивом), "appointments" или "diagnostics".
+    """
+    headers, stmts = _export_selects(kind, start, end)
+    yield headers
+    for stmt in stmts:
+        result = await session.stream(stmt.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield partition
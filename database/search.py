@@ -0,0 +1,150 @@
+"""
+Поисковый индекс пользователей для администратора: имя, телефон, гос. номер, VIN.
+
+Нормализация выполняется функцией Python `search_norm(kind, value)`, которая есть только
+в соединениях этого процесса. Поэтому триггеров на users нет (запись в users из sqlite3
+или другого приложения падала бы с "no such function"): строки user_search обновляют
+функции записи database.requests в той же транзакции (REFRESH_USER_SEARCH_*),
+а ensure_user_search при запуске исправляет расхождения после внешних изменений.
+Таблицу user_search_fts поддерживают триггеры на user_search — они на чистом SQL.
+
+- имя: нижний регистр, ё -> е, поиск по префиксу (индекс);
+- телефон: только цифры без кода страны, поиск по началу (phone) и по последним цифрам (phone_rev);
+- гос. номер и VIN: латиница (кириллические двойники заменяются), только буквы и цифры,
+  поиск по любому фрагменту от 3 символов через FTS5 с токенайзером trigram.
+"""
+
+import logging
+import re
+from typing import Optional
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.engine import Engine
+
+db_logger = logging.getLogger("database")
+
+# Минимальная длина фрагмента гос. номера / VIN (ограничение токенайзера trigram)
+MIN_FRAGMENT_LENGTH = 3
+
+# Кириллические буквы, используемые в гос. номерах, и их латинские двойники
+_PLATE_TRANSLATION = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+_SPACES = re.compile(r"\s+")
+
+
+# ==============================
+# НОРМАЛИЗАЦИЯ
+# ==============================
+def normalize_name(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return _SPACES.sub(" ", value.strip().casefold().replace("ё", "е")) or None
+
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    digits = "".join(ch for ch in value or "" if ch.isdigit())
+    # +7 / 8 в начале российского номера не участвуют в поиске
+    if len(digits) == 11 and digits[0] in "78":
+        digits = digits[1:]
+    return digits or None
+
+
+def normalize_plate(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return _NON_ALNUM.sub("", value.upper().translate(_PLATE_TRANSLATION)) or None
+
+
+def _search_norm(kind: str, value: Optional[str]) -> Optional[str]:
+    if kind == "name":
+        return normalize_name(value)
+    if kind == "phone":
+        return normalize_phone(value)
+    if kind == "phone_rev":
+        phone = normalize_phone(value)
+        return phone[::-1] if phone else None
+    return normalize_plate(value)
+
+
+@event.listens_for(Engine, "connect")
+def _register_search_function(dbapi_connection, connection_record):
+    # Функция нужна запросам обновления user_search — регистрируем во всех соединениях процесса
+    if hasattr(dbapi_connection, "create_function"):
+        dbapi_connection.create_function("search_norm", 2, _search_norm, deterministic=True)
+
+
+# ==============================
+# СХЕМА: FTS И ОБНОВЛЕНИЕ ИНДЕКСА
+# ==============================
+# Поля users, от которых зависит строка user_search
+SEARCH_SOURCE_COLUMNS = frozenset({"user_name", "contact", "gos_num", "vin_number"})
+
+_USER_SEARCH_VALUES = (
+    "search_norm('name', {row}.user_name), search_norm('phone', {row}.contact), "
+    "search_norm('phone_rev', {row}.contact), search_norm('plate', {row}.gos_num), "
+    "search_norm('plate', {row}.vin_number)"
+)
+_USER_SEARCH_FIELDS = ("name", "phone", "phone_rev", "plate", "vin")
+
+
+def _upsert_sql(where: str, changed_only: bool = False) -> str:
+    # WHERE у SELECT обязателен: без него SQLite не отличает ON CONFLICT от условия JOIN
+    sql = (
+        "INSERT INTO user_search (uid, name, phone, phone_rev, plate, vin) "
+        f"SELECT id, {_USER_SEARCH_VALUES.format(row='users')} FROM users WHERE {where} "
+        "ON CONFLICT(uid) DO UPDATE SET "
+        + ", ".join(f"{name} = excluded.{name}" for name in _USER_SEARCH_FIELDS)
+    )
+    if changed_only:
+        sql += " WHERE " + " OR ".join(f"{name} IS NOT excluded.{name}" for name in _USER_SEARCH_FIELDS)
+    return sql
+
+
+# Обновление строк индекса после записи в users (выполняются в транзакции записи)
+REFRESH_USER_SEARCH_BY_TG_ID = text(_upsert_sql("tg_id = :tg_id"))
+REFRESH_USER_SEARCH_BY_IDS = text(_upsert_sql("id IN :uids")).bindparams(bindparam("uids", expanding=True))
+# Перед удалением пользователя (после удаления его users.id уже не найти по tg_id)
+DELETE_USER_SEARCH_BY_TG_ID = text("DELETE FROM user_search WHERE uid IN (SELECT id FROM users WHERE tg_id = :tg_id)")
+
+_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS user_search_fts USING fts5(plate, vin, tokenize='trigram')",
+    # Прежние триггеры users -> user_search вызывали search_norm и ломали запись в users вне бота
+    "DROP TRIGGER IF EXISTS trg_users_search_insert",
+    "DROP TRIGGER IF EXISTS trg_users_search_update",
+    "DROP TRIGGER IF EXISTS trg_users_search_delete",
+    # user_search -> user_search_fts (rowid = uid)
+    "CREATE TRIGGER IF NOT EXISTS trg_user_search_fts_insert AFTER INSERT ON user_search BEGIN "
+    "INSERT INTO user_search_fts (rowid, plate, vin) VALUES (new.uid, new.plate, new.vin); END",
+    "CREATE TRIGGER IF NOT EXISTS trg_user_search_fts_update AFTER UPDATE OF plate, vin ON user_search BEGIN "
+    "UPDATE user_search_fts SET plate = new.plate, vin = new.vin WHERE rowid = new.uid; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_user_search_fts_delete AFTER DELETE ON user_search BEGIN "
+    "DELETE FROM user_search_fts WHERE rowid = old.uid; END",
+)
+
+
+def ensure_user_search(sync_conn) -> None:
+    """
+    Создаёт FTS-таблицу и её триггеры и приводит индекс в соответствие с users:
+    удаляет строки удалённых пользователей, добавляет и пересчитывает строки, которые
+    разошлись с users (новая база, загрузка данных или правки users вне бота), и при
+    расхождении числа строк перестраивает FTS-таблицу.
+    Вызывается из init_db после create_all.
+    """
+    for statement in _SEARCH_DDL:
+        sync_conn.execute(text(statement))
+
+    removed = sync_conn.execute(text(
+        "DELETE FROM user_search WHERE uid NOT IN (SELECT id FROM users)"
+    )).rowcount
+    repaired = sync_conn.execute(text(_upsert_sql("1", changed_only=True))).rowcount
+    if removed or repaired:
+        db_logger.info(f"Поисковый индекс пользователей исправлен: удалено {removed}, обновлено {repaired}")
+
+    indexed = sync_conn.execute(text("SELECT count(*) FROM user_search")).scalar()
+    fts_indexed = sync_conn.execute(text("SELECT count(*) FROM user_search_fts")).scalar()
+    if indexed != fts_indexed:
+        db_logger.info(f"Перестройка FTS-индекса пользователей: индекс={indexed}, fts={fts_indexed}")
+        sync_conn.execute(text("DELETE FROM user_search_fts"))
+        sync_conn.execute(text(
+            "INSERT INTO user_search_fts (rowid, plate, vin) SELECT uid, plate, vin FROM user_search"
+        ))
@@ -14,17 +14,21 @@
 
 from aiogram import Router, types, F
 import asyncio
+from contextlib import aclosing
 from bot import bot
 from aiogram.filters.command import Command
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from keybords import keybords as kb
-from database.requests import (get_user_role, add_user, add_comment, add_grade, get_user_dict, update_user,
-                               can_mess_true, get_orders_by_user, update_order, get_visible_comments,
+from keybords.callbacks import QuickMessCb, AcceptWorkCb, AnswerAppCb, SendRepairReqCb, SendAnswerCb
+from database.requests import (get_user_role, add_user, add_comment, close_order_with_grade, get_user_dict, update_user,
+                               can_mess_true, get_orders_by_user, stream_visible_comments,
                                get_filter_appointments)
+from database.dto import order_date_str
 from utils.time_bot import get_greeting
 from utils.utils_bot import message_deleter
+from utils.content import answer_photo_cached, read_info_text
 from config import Config
 from aiogram.exceptions import TelegramAPIError
 import logging
@@ -35,7 +39,7 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
-titul_img = FSInputFile("img/titul.png")
+TITUL_IMG = "img/titul.png"
 
 
 # ==============================
@@ -230,7 +234,7 @@ async def confirm_registration(call: CallbackQuery, state: FSMContext) -> None:
     }
 
     # Отправляем финальные сообщения
-    await call.message.answer_photo(photo=titul_img)
+    await answer_photo_cached(call.message, TITUL_IMG)
     await call.message.answer("📁 <b>ГЛАВНОЕ МЕНЮ</b>\n\n"
                               f"<b>Поздравляем, {user_name}! Вы зарегистрированы.</b>\n"
                               "Здесь вы найдёте всё необходимое для взаимодействия с данным сервисом: "
@@ -293,7 +297,7 @@ async def cmd_start(message: types.Message) -> None:
 
     logger.info(f"Пользователь {user_id} ({name}) вошёл в систему с ролью: {role}")
 
-    await message.answer_photo(photo=titul_img)
+    await answer_photo_cached(message, TITUL_IMG)
 
     greeting = await get_greeting()
     user_data = await get_user_dict(tg_id=user_id, fields=["user_name"])
@@ -405,7 +409,12 @@ REPAIR_STATUS_DISPLAY = {
 @router.callback_query(F.data == "info_rem")
 async def info_rem(call: CallbackQuery, state: FSMContext):
     user_id = call.from_user.id
-    orders = await get_orders_by_user(tg_id_user=user_id, active=True)
+    orders = await get_orders_by_user(
+        tg_id_user=user_id,
+        active=True,
+        fields=["id", "tg_id_master", "master_name", "repair_status", "complied", "description",
+                "brand_auto", "model_auto", "total_km", "year_auto", "gos_num", "date"]
+    )
 
     if not orders:
         await call.answer("❌ У вас нет активных заказов.", show_alert=True)
@@ -415,9 +424,7 @@ async def info_rem(call: CallbackQuery, state: FSMContext):
 
     # Отправляем каждый заказ как НОВОЕ сообщение
     for order in orders:
-        date_str = order.get("date", "не указана")
-        if isinstance(date_str, str) and "T" in date_str:
-            date_str = date_str.split("T")[0]
+        date_str = order_date_str(order["date"])
 
         status_raw = order['repair_status']
         status_display = REPAIR_STATUS_DISPLAY.get(status_raw, status_raw)
@@ -504,19 +511,10 @@ QUICK_MESSAGE_TEMPLATES = {
 }
 
 
-@router.callback_query(F.data.startswith("quick_mess:"))
-async def quick_mess(call: CallbackQuery):
-    parts = call.data.split(":", 3)
-    if len(parts) != 3:
-        await call.answer("❌ Некорректный формат быстрого сообщения.", show_alert=True)
-        return
-
-    action = parts[1]
-    try:
-        tg_id = int(parts[2])
-    except ValueError:
-        await call.answer("❌ Некорректный ID получателя.", show_alert=True)
-        return
+@router.callback_query(QuickMessCb.filter())
+async def quick_mess(call: CallbackQuery, callback_data: QuickMessCb):
+    action = callback_data.action
+    tg_id = callback_data.tg_id
 
     user_tg_id = call.from_user.id
     user_data = await get_user_dict(tg_id=user_tg_id, fields=["user_name"])
@@ -545,20 +543,10 @@ async def quick_mess(call: CallbackQuery):
 # ==============================
 # ПРИНЯТЬ РАБОТУ
 # ==============================
-@router.callback_query(F.data.startswith("accept_work:"))
-async def handle_accept_work(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) < 3:
-        await call.answer("❌ Неверный формат", show_alert=True)
-        return
-
-    try:
-        order_id = int(parts[1])
-        master_tg_id = int(parts[2])
-    except (ValueError, IndexError) as e:
-        logger.error(f"Ошибка данных в callback: {e}")
-        await call.answer("❌ Ошибка данных", show_alert=True)
-        return
+@router.callback_query(AcceptWorkCb.filter())
+async def handle_accept_work(call: CallbackQuery, state: FSMContext, callback_data: AcceptWorkCb):
+    order_id = callback_data.order_id
+    master_tg_id = callback_data.master_tg_id
 
     data = await state.get_data()
     sent_order_messages = data.get("sent_order_messages", [])
@@ -592,7 +580,6 @@ async def handle_accept_work(call: CallbackQuery, state: FSMContext):
 
 @router.callback_query(AcceptWork.waiting_for_grade, F.data.startswith("grade:"))
 async def process_grade(call: CallbackQuery, state: FSMContext):
-    user_id = call.from_user.id
     try:
         grade = int(call.data.split(":", 1)[1])
         if grade not in (1, 2, 3, 4, 5):
@@ -612,14 +599,18 @@ async def process_grade(call: CallbackQuery, state: FSMContext):
         await state.clear()
         return
 
-    # Обновляем заказ и ставим оценку
-    success = await update_order(order_id=order_id, repair_status="close")
-    if success:
-        await add_grade(master_tg_id, grade)
-        await add_grade(user_id, 5)  # Клиент тоже поднимает свой рейтинг на 5 принимая заказ
+    # Закрываем заказ и ставим оценку мастеру (одна транзакция)
+    graded = await close_order_with_grade(order_id=order_id, grade=grade)
 
     # Показываем ТОЛЬКО alert
-    await call.answer("Спасибо, что выбрали наше СТО! 🙏", show_alert=True)
+    if graded:
+        await call.answer("Спасибо, что выбрали наше СТО! 🙏", show_alert=True)
+    elif graded is False:
+        logger.warning(f"Повторная оценка заказа {order_id} от {call.from_user.id} не учтена")
+        await call.answer("ℹ️ Этот заказ уже оценён. Спасибо!", show_alert=True)
+    else:
+        logger.warning(f"Оценка не поставлена: заказ {order_id} не найден (клиент {call.from_user.id})")
+        await call.answer("❌ Заказ не найден — возможно, он удалён мастером.", show_alert=True)
 
     # УДАЛЯЕМ сообщение с оценкой
     if grade_msg_id:
@@ -638,16 +629,15 @@ async def start_booking(call: CallbackQuery):
     user_id = call.from_user.id
 
     # Проверяем, есть ли у пользователя активная запись
-    appointments = await get_filter_appointments(tg_id_user=user_id)
+    appointments = await get_filter_appointments(tg_id_user=user_id, counterpart="master")
     if appointments:
         # Берём первую
         appt = appointments[0]
         master_tg_id = appt["tg_id_master"]
 
-        # Получаем данные мастера
-        master_data = await get_user_dict(tg_id=master_tg_id, fields=["user_name", "contact"])
-        master_name = master_data["user_name"] if master_data else "—"
-        master_contact = master_data["contact"] if master_data else "—"
+        # Данные мастера приходят вместе с записью (JOIN users)
+        master_name = appt["user_name"] or "—"
+        master_contact = appt["contact"] or "—"
 
         # Форматируем дату и время
         date_str = appt["appointment_date"].strftime("%d.%m.%Y")
@@ -835,25 +825,14 @@ async def confirm_booking(call: CallbackQuery, state: FSMContext):
 # ОТВЕТ ТЕКСТОМ КЛИЕНТА НА СООБЩЕНИЕ (НАПОМИНАНИЕ)
 # ==============================
 
-@router.callback_query(F.data.startswith("answer_app:"))
-async def handle_client_text_response_only(call: CallbackQuery, state: FSMContext):
+@router.callback_query(AnswerAppCb.filter())
+async def handle_client_text_response_only(call: CallbackQuery, state: FSMContext, callback_data: AnswerAppCb):
     """
     Обрабатывает нажатие кнопки «✏️ ВВЕСТИ ТЕКСТОМ» из формы напоминания о встрече.
-    Формат: answer_app:<master_tg_id>
+    Данные: AnswerAppCb(tg_id=<master_tg_id>)
     Переводит клиента в состояние ввода текста.
     """
-    parts = call.data.split(":", 1)  # ['answer_app', '123456789']
-    if len(parts) != 2:
-        await call.answer("❌ Некорректный формат данных.", show_alert=True)
-        return
-
-    print(int(parts[1]))
-
-    try:
-        master_tg_id = int(parts[1])
-    except (ValueError, TypeError):
-        await call.answer("❌ Некорректный ID мастера.", show_alert=True)
-        return
+    master_tg_id = callback_data.tg_id
 
     # Сохраняем данные для последующей отправки
     await state.update_data(
@@ -1284,7 +1263,6 @@ async def save_edited_field(message: Message, state: FSMContext) -> None:
 @router.callback_query(F.data == "o_nas")
 async def about_service(call: CallbackQuery) -> None:
     """Отправляет информацию об автомастерской."""
-    info_img = FSInputFile("img/info.jpg")
     caption = (
         "▫️Спасибо, что выбрали нашу автомастерскую.\n"
         "▫️Мы работаем уже более 20 лет и предоставляем качественный ремонт "
@@ -1292,25 +1270,26 @@ async def about_service(call: CallbackQuery) -> None:
         "▫️Специализация: диагностика и устранение неисправностей любой сложности.\n"
         "▫️Гарантируем качественный и оперативный ремонт."
     )
-    await call.message.answer_photo(photo=info_img, caption=caption, reply_markup=kb.user_info_menu())
+    await answer_photo_cached(call.message, "img/info.jpg", caption=caption, reply_markup=kb.user_info_menu())
 
 
 # ПОКАЗАТЬ ОТЗЫВЫ КЛИЕНТОВ
 @router.callback_query(F.data == "comment")
 async def show_comments(call: CallbackQuery):
-    comments = await get_visible_comments(mode="user")
-
-    if not comments:
-        text = "Отзывов пока нет."
-    else:
-        # Собираем все отзывы в один текст
-        parts = []
-        for c in comments:
-            date_str = c['date'].split('T')[0] if 'T' in c['date'] else c['date']
-            parts.append(
-                f"⭐ <b>{c['user_name']}</b>:\n{c['text']}\n\n📅 {date_str}"
-            )
-        text = "\n\n".join(parts)
+    # Новые отзывы первыми, пока помещаются в одно сообщение: остальные не читаются из базы
+    parts = []
+    length = 0
+    async with aclosing(stream_visible_comments(mode="user")) as comments:
+        async for c in comments:
+            date_str = c.date.date().isoformat() if c.date else "не указана"
+            part = f"⭐ <b>{c.user_name}</b>:\n{c.text}\n\n📅 {date_str}"
+            length += len(part) + 2
+            if length > Config.MESSAGE_TEXT_LIMIT:
+                break
+            parts.append(part)
+
+    # Собираем отзывы в один текст
+    text = "\n\n".join(parts) if parts else "Отзывов пока нет."
 
     # Отправляем одним сообщением с кнопкой "Назад"
     await call.message.answer(
@@ -1325,8 +1304,7 @@ async def show_comments(call: CallbackQuery):
 @router.callback_query(F.data == "price")
 async def show_price_list(call: CallbackQuery) -> None:
     """Отправляет ориентировочный прайс из файла."""
-    with open("info/price.txt", "r", encoding="utf-8") as f:
-        text = f.read()
+    text = read_info_text("info/price.txt")
     await call.message.answer(text, reply_markup=kb.common_menu([6]))
     await call.answer()
 
@@ -1334,8 +1312,7 @@ async def show_price_list(call: CallbackQuery) -> None:
 # FAQ
 @router.callback_query(F.data == "faq")
 async def faq_service(call: CallbackQuery) -> None:
-    with open("info/FAQ.txt", "r", encoding="utf-8") as f:
-        text = f.read()
+    text = read_info_text("info/FAQ.txt")
 
     await call.message.answer(text, reply_markup=kb.common_menu([6]))
     await call.answer()
@@ -1345,32 +1322,20 @@ async def faq_service(call: CallbackQuery) -> None:
 @router.callback_query(F.data == "get_person")
 async def show_contacts(call: CallbackQuery) -> None:
     """Отправляет контактную информацию и карту."""
-    maps_img = FSInputFile("img/maps.jpg")
     caption = (
         f"🏢 <b>СТО ЗАО Рассвет:</b> {Config.OFFICE_ADDRESS}\n\n"
         f"📞 <b>Телефон:</b> {Config.SUPPORT_PHONE}\n\n"
         f"📧 <b>Email:</b> {Config.SUPPORT_EMAIL}"
     )
 
-    await call.message.answer_photo(photo=maps_img, caption=caption, reply_markup=kb.location_menu())
+    await answer_photo_cached(call.message, "img/maps.jpg", caption=caption, reply_markup=kb.location_menu())
 
 
 # ЗАЯВКА НА РЕМОНТ ОТ КЛИЕНТА (ДЛЯ БЫСТРОГО ВЗАИМОДЕЙСТВИЯ С МАСТЕРОМ)
-@router.callback_query(F.data.startswith("send_repair_req:"))
-async def handle_send_repair_request(call: CallbackQuery):
-    parts = call.data.split(":")
-    if len(parts) != 2:
-        await call.answer("❌ Ошибка запроса", show_alert=True)
-        return
-
+@router.callback_query(SendRepairReqCb.filter())
+async def handle_send_repair_request(call: CallbackQuery, callback_data: SendRepairReqCb):
     user_tg_id = call.from_user.id
-
-    try:
-        master_tg_id = int(parts[1])
-    except ValueError as e:
-        logger.error(f"Некорректные данные {user_tg_id} мастеру: {e}")
-        await call.answer("❌ Некорректные данные", show_alert=True)
-        return
+    master_tg_id = callback_data.tg_id
 
     # Проверяем, что клиент существует
     user_data = await get_user_dict(tg_id=user_tg_id)
@@ -1400,15 +1365,9 @@ async def handle_send_repair_request(call: CallbackQuery):
 
 
 # СООБЩЕНИЕ МАСТЕРУ
-@router.callback_query(F.data.startswith("send_answer:"))
-async def handle_send_answer_button(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-
-    if len(parts) != 2:
-        await call.answer("❌ Неверный формат данных", show_alert=True)
-        return
-
-    master_tg_id = int(parts[1])
+@router.callback_query(SendAnswerCb.filter())
+async def handle_send_answer_button(call: CallbackQuery, state: FSMContext, callback_data: SendAnswerCb):
+    master_tg_id = callback_data.tg_id
 
     # Сохраняем master_tg_id
     await state.update_data(
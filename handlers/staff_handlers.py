@@ -1,5 +1,6 @@
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, FSInputFile
 from aiogram import F, Router
+from aiogram.filters.command import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from database.requests import (get_user_dict, get_available_hours, create_appointment, get_active_order_id, add_order,
@@ -8,18 +9,34 @@ from database.requests import (get_user_dict, get_available_hours, create_appoin
                                update_user, save_manual_diagnostic_record, get_diagnostics_by_filter, delete_user,
                                get_api_dtc_history, get_user_dict_by_id, update_user_by_id, has_active_appointment,
                                get_user_statistics, get_appointment_statistics, get_order_statistics,
-                               get_all_active_user_ids, get_top_clients_statistics, get_top_masters_statistics)
-from utils.profile_render import render_master_profile
+                               stream_active_user_ids, get_top_clients_statistics, get_top_masters_statistics,
+                               get_user_role, bulk_update_users, search_users, search_user_ids,
+                               get_closed_orders_page, get_master_rating,
+                               verify_order_counters, get_trend_statistics,
+                               EXPORT_KINDS)
+from database.dto import order_date_str
+from database.query_stats import format_db_stats
+from utils.profile_render import render_master_profile, format_master_rating
+from services.export import export_csv_gz
 from bot import bot
+from config import Config
 import asyncio
+import html
+import re
 from aiogram.exceptions import TelegramAPIError
 from keybords import keybords as kb
-from datetime import date, timedelta
+from keybords.callbacks import (AdminUserActionCb, BulkUserActionCb, AdminSearchCb, AdminUserCardCb, ManageMasterCb, MasterActionCb, ConfirmDeleteMasterCb, SendMessCb,
+                                RemindMessCb, TransferAppCb, DelAppCb, OrderActionCb, SelectMasterCb, ClientActionCb,
+                                WorkHistoryCb,
+                                RepairTypeCb, CalendarNavCb, CalendarDayCb, AppointHourCb, DurationCb, SelectOrderCb,
+                                is_stored_payload)
+from datetime import date, datetime, timedelta
 import logging
 from utils.time_bot import get_greeting
-from utils.utils_bot import message_deleter
+from utils.utils_bot import message_deleter, parse_uid_list
 from api.car_api import decode_obd2_code
 import json
+import os
 
 
 # Создаём отдельный роутер для обработки действий персонала (админов и мастеров)
@@ -91,6 +108,7 @@ class MasterManagement(StatesGroup):
 class UserManagement(StatesGroup):
     entering_uid = State()
     viewing_user = State()
+    bulk_action = State()
 
 
 REPAIR_STATUS_DISPLAY = {
@@ -139,32 +157,19 @@ async def handle_manage_masters(call: CallbackQuery):
     await call.answer()
 
 
-@router.callback_query(F.data.startswith("manage_master:"))
-async def handle_manage_single_master(call: CallbackQuery):
-    try:
-        tg_id = int(call.data.split(":")[1])
-    except (ValueError, IndexError):
-        await call.answer("Некорректный ID мастера", show_alert=True)
-        return
+@router.callback_query(ManageMasterCb.filter())
+async def handle_manage_single_master(call: CallbackQuery, callback_data: ManageMasterCb):
+    tg_id = callback_data.tg_id
 
     text, keyboard = await render_master_profile(tg_id)
     await call.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
     await call.answer()
 
 
-@router.callback_query(F.data.startswith("master_action:"))
-async def handle_master_action(call: CallbackQuery, state: FSMContext):
-    data_parts = call.data.split(":")
-    if len(data_parts) != 3:
-        await call.answer("Некорректный формат действия", show_alert=True)
-        return
-
-    try:
-        tg_id = int(data_parts[2])
-        action = data_parts[1]
-    except (ValueError, IndexError):
-        await call.answer("Ошибка данных действия", show_alert=True)
-        return
+@router.callback_query(MasterActionCb.filter())
+async def handle_master_action(call: CallbackQuery, state: FSMContext, callback_data: MasterActionCb):
+    tg_id = callback_data.tg_id
+    action = callback_data.action
 
     user_data = await get_user_dict(tg_id=tg_id, fields=["user_name", "role"])
     if not user_data or user_data.get("role") != "master":
@@ -332,13 +337,9 @@ async def process_edit_rating(message: Message, state: FSMContext):
     await state.clear()
 
 
-@router.callback_query(F.data.startswith("confirm_delete_master:"))
-async def confirm_delete_master(call: CallbackQuery, state: FSMContext):
-    try:
-        tg_id = int(call.data.split(":")[1])
-    except (ValueError, IndexError):
-        await call.answer("Ошибка ID", show_alert=True)
-        return
+@router.callback_query(ConfirmDeleteMasterCb.filter())
+async def confirm_delete_master(call: CallbackQuery, state: FSMContext, callback_data: ConfirmDeleteMasterCb):
+    tg_id = callback_data.tg_id
 
     success = await delete_user(tg_id)
 
@@ -400,7 +401,9 @@ async def handle_manage_users(call: CallbackQuery, state: FSMContext):
 
     prompt_msg = await call.message.answer(
         "📁 <b>УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ</b>\n\n"
-        "📝 Введите <b>UID</b> пользователя (целое число из его профиля):",
+        "📝 Введите <b>UID</b> пользователя (целое число из его профиля).\n"
+        "Для массовых действий — список и диапазоны: <code>12, 15-20, 31</code>\n"
+        "🔎 Или имя, телефон, гос. номер, фрагмент VIN — для поиска (также /find)",
         reply_markup=kb.admin_action_menu([4]),
         parse_mode="HTML"
     )
@@ -409,6 +412,10 @@ async def handle_manage_users(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 
+# Ввод из цифр, пробелов, запятых и дефисов считается списком UID, остальное — строкой поиска
+_UID_LIST_RE = re.compile(r"[\d\s,;-]+")
+
+
 @router.message(UserManagement.entering_uid)
 async def process_user_uid_input(message: Message, state: FSMContext):
     user_input = message.text.strip()
@@ -423,42 +430,51 @@ async def process_user_uid_input(message: Message, state: FSMContext):
     data = await state.get_data()
     prompt_msg_id = data.get("prompt_message_id")
 
-    # Валидация UID
+    if prompt_msg_id:
+        try:
+            await message.bot.delete_message(message.chat.id, prompt_msg_id)
+        except TelegramAPIError:
+            pass
+
+    # UID, список UID с диапазонами или — если это не UID — строка поиска
     try:
-        uid = int(user_input)
-        if uid <= 0:
-            raise ValueError
-    except ValueError:
-        # Удаляем старый запрос
-        if prompt_msg_id:
-            try:
-                await message.bot.delete_message(message.chat.id, prompt_msg_id)
-            except TelegramAPIError:
-                pass
-        # Отправляем новый запрос
-        new_prompt = await message.answer("❌ Некорректный UID. Введите положительное целое число:")
+        uids = parse_uid_list(user_input)
+    except ValueError as e:
+        if not _UID_LIST_RE.fullmatch(user_input):
+            await state.clear()
+            await _send_search_page(message, user_input)
+            return
+        # Похоже на список UID, но с ошибкой (например, превышен лимит) — просим ввести заново
+        new_prompt = await message.answer(f"❌ {e}. Введите UID или список UID:")
         await state.update_data(prompt_message_id=new_prompt.message_id)
         return
 
+    if len(uids) > 1:
+        await _start_bulk_action(message, state, uids)
+        return
+    uid = uids[0]
+
     # Ищем пользователя по внутреннему ID (не tg_id!)
     user_data = await get_user_dict_by_id(uid)
+    await state.clear()
     if not user_data:
-        if prompt_msg_id:
-            try:
-                await message.bot.delete_message(message.chat.id, prompt_msg_id)
-            except TelegramAPIError:
-                pass
+        # Число могло быть частью телефона, номера или VIN — пробуем поиск
+        if await _send_search_page(message, user_input, not_found_text=None):
+            return
         error_msg = await message.answer("❌ Пользователь с таким UID не найден.")
         await asyncio.sleep(2)
         try:
             await error_msg.delete()
         except TelegramAPIError:
             pass
-        await state.clear()
         return
 
-    # Формируем карточку пользователя
-    text = (
+    await message.answer(_user_card_text(user_data), reply_markup=kb.admin_user_manage(uid), parse_mode="HTML")
+
+
+def _user_card_text(user_data: dict) -> str:
+    """Карточка пользователя для администратора."""
+    return (
         f"📌 UID: {user_data['id']}\n"
         f"🆔 Telegram ID: <code>{user_data['tg_id']}</code>\n"
         f"👤 Имя: {user_data['user_name']}\n"
@@ -472,36 +488,99 @@ async def process_user_uid_input(message: Message, state: FSMContext):
         f"📅 Дата регистрации: {user_data['date'].strftime('%d.%m.%Y %H:%M') if user_data['date'] else '—'}"
     )
 
-    await message.answer(text, reply_markup=kb.admin_user_manage(uid), parse_mode="HTML")
 
-    # Очищаем состояние и удаляем запрос
-    if prompt_msg_id:
-        try:
-            await message.bot.delete_message(message.chat.id, prompt_msg_id)
-        except TelegramAPIError:
-            pass
-    await state.clear()
+async def _start_bulk_action(message: Message, state: FSMContext, uids: list) -> None:
+    """Сохраняет выбранные UID в FSM и предлагает массовое действие."""
+    await state.set_state(UserManagement.bulk_action)
+    await state.set_data({"bulk_uids": uids})
+    await message.answer(
+        f"📁 <b>МАССОВОЕ ДЕЙСТВИЕ</b>\n\n"
+        f"Выбрано UID: <b>{len(uids)}</b> ({_format_uid_ranges(uids)})\n"
+        f"Администраторы не затрагиваются. Выберите действие:",
+        reply_markup=kb.admin_bulk_user_manage(),
+        parse_mode="HTML"
+    )
+
+
+# АДМИН. ПОИСК ПОЛЬЗОВАТЕЛЕЙ
+async def _send_search_page(
+        message: Message,
+        query: str,
+        after_uid: int = 0,
+        edit: bool = False,
+        not_found_text: str | None = "🔎 Никого не найдено."
+) -> bool:
+    """
+    Отправляет (или, при edit=True, подменяет) страницу результатов поиска.
+    Возвращает False, если ничего не найдено (при not_found_text=None сообщение не отправляется).
+    """
+    users, has_more = await search_users(query, after_uid=after_uid, limit=Config.SEARCH_PAGE_SIZE)
+    if not users and after_uid == 0:
+        if not_found_text:
+            await message.answer(not_found_text)
+        return False
+
+    text = (
+        f"🔎 <b>ПОИСК:</b> «{html.escape(query.strip())}»\n\n"
+        f"Имя, телефон, гос. номер или фрагмент VIN. Выберите пользователя:"
+    )
+    markup = kb.admin_search_results(users, query, has_more, first_page=after_uid == 0)
+    if edit:
+        await message.edit_text(text, reply_markup=markup, parse_mode="HTML")
+    else:
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
+    return True
+
+
+@router.message(Command("find"))
+async def handle_find_command(message: Message, command: CommandObject):
+    """/find <имя | телефон | гос. номер | VIN> — поиск пользователей администратором."""
+    if await get_user_role(message.from_user.id) != "admin":
+        return
+    if not command.args:
+        await message.answer("🔎 Использование: /find <имя, телефон, гос. номер или фрагмент VIN>")
+        return
+    await _send_search_page(message, command.args)
+
+
+@router.callback_query(AdminSearchCb.filter(F.action == "page"))
+async def handle_search_page(call: CallbackQuery, callback_data: AdminSearchCb):
+    await _send_search_page(call.message, callback_data.query, after_uid=callback_data.after, edit=True)
+    await call.answer()
+
+
+@router.callback_query(AdminSearchCb.filter(F.action == "bulk"))
+async def handle_search_bulk(call: CallbackQuery, state: FSMContext, callback_data: AdminSearchCb):
+    """Массовое действие над всеми найденными (не больше Config.BULK_USERS_MAX)."""
+    uids = await search_user_ids(callback_data.query, Config.BULK_USERS_MAX)
+    if not uids:
+        await call.answer("🔎 Никого не найдено", show_alert=True)
+        return
+    await _start_bulk_action(call.message, state, uids)
+    await call.answer()
+
+
+@router.callback_query(AdminUserCardCb.filter())
+async def handle_search_user_card(call: CallbackQuery, callback_data: AdminUserCardCb):
+    user_data = await get_user_dict_by_id(callback_data.uid)
+    if not user_data:
+        await call.answer("❌ Пользователь не найден", show_alert=True)
+        return
+    await call.message.answer(
+        _user_card_text(user_data), reply_markup=kb.admin_user_manage(callback_data.uid), parse_mode="HTML"
+    )
+    await call.answer()
 
 
 # АДМИН. НАЗНАЧИТЬ МАСТЕРОМ ИЛИ ЗАБЛОКИРОВАТЬ
-@router.callback_query(F.data.startswith("admin_user_action:"))
-async def handle_admin_user_action(call: CallbackQuery):
+@router.callback_query(AdminUserActionCb.filter())
+async def handle_admin_user_action(call: CallbackQuery, callback_data: AdminUserActionCb):
     """
     Обрабатывает действия администратора над пользователем:
     - promote → назначить мастером
     - block → заблокировать (меняет роль на 'blocked')
     """
-    parts = call.data.split(":", 2)
-    if len(parts) != 3:
-        await call.answer("❌ Неверный формат действия", show_alert=True)
-        return
-
-    action, uid_str = parts[1], parts[2]
-    try:
-        uid = int(uid_str)
-    except ValueError:
-        await call.answer("❌ Некорректный UID", show_alert=True)
-        return
+    action, uid = callback_data.action, callback_data.uid
 
     success = False
 
@@ -545,6 +624,71 @@ async def handle_admin_user_action(call: CallbackQuery):
         pass
 
 
+# АДМИН. МАССОВЫЕ ДЕЙСТВИЯ НАД ПОЛЬЗОВАТЕЛЯМИ
+# действие -> (итог для сводки, новые значения, допустимые текущие роли)
+BULK_USER_ACTIONS = {
+    "block": ("заблокированы", {"role": "blocked"}, ("user", "master")),
+    "unblock": ("разблокированы", {"role": "user"}, ("blocked",)),
+    "promote": ("назначены мастерами",
+                {"role": "master", "status": "Новый рабочий", "brand_auto": "-", "can_messages": True}, ("user",)),
+    "demote": ("сняты с мастеров", {"role": "user"}, ("master",)),
+}
+
+
+def _format_uid_ranges(uids, limit: int = 10) -> str:
+    """Сворачивает UID в диапазоны для сводки: [1, 2, 3, 7] -> "1-3, 7" (не больше `limit` фрагментов)."""
+    parts = []
+    ordered = sorted(uids)
+    start = prev = ordered[0]
+    for uid in ordered[1:] + [None]:
+        if uid is not None and uid == prev + 1:
+            prev = uid
+            continue
+        parts.append(str(start) if start == prev else f"{start}-{prev}")
+        if uid is not None:
+            start = prev = uid
+    if len(parts) > limit:
+        return ", ".join(parts[:limit]) + f" … (+{len(parts) - limit})"
+    return ", ".join(parts)
+
+
+@router.callback_query(UserManagement.bulk_action, BulkUserActionCb.filter())
+async def handle_bulk_user_action(call: CallbackQuery, state: FSMContext, callback_data: BulkUserActionCb):
+    """
+    Применяет действие ко всем выбранным UID одним запросом UPDATE ... WHERE id IN (...)
+    и отправляет одну сводку. Пользователи с неподходящей ролью (например, разблокировка
+    незаблокированного) и администраторы пропускаются.
+    """
+    if callback_data.action not in BULK_USER_ACTIONS:
+        await call.answer("❌ Неизвестное действие", show_alert=True)
+        return
+
+    uids = (await state.get_data()).get("bulk_uids") or []
+    await state.clear()
+    if not uids:
+        await call.answer("❌ Список UID устарел, введите его заново", show_alert=True)
+        return
+
+    outcome, values, from_roles = BULK_USER_ACTIONS[callback_data.action]
+    updated = await bulk_update_users(uids, values, from_roles=from_roles)
+    updated_uids = [uid for uid, _ in updated]
+    skipped = len(uids) - len(updated_uids)
+
+    logger.info(
+        f"Администратор {call.from_user.id}: массовое действие {callback_data.action}, "
+        f"выбрано {len(uids)}, изменено {len(updated_uids)}"
+    )
+
+    text = f"✅ <b>{outcome.capitalize()}: {len(updated_uids)}</b> из {len(uids)}"
+    if updated_uids:
+        text += f"\nUID: {_format_uid_ranges(updated_uids)}"
+    if skipped:
+        text += f"\n\n⏭ Пропущено: {skipped} (не найдены, администраторы или роль не подходит)"
+
+    await call.message.edit_text(text, reply_markup=kb.admin_action_menu([5]), parse_mode="HTML")
+    await call.answer()
+
+
 # ==============================
 # СТАТИСТИКА
 # ==============================
@@ -553,12 +697,107 @@ async def handle_admin_stats(call: CallbackQuery):
     await call.message.edit_text(
         "📊 <b>ВЫБЕРИТЕ РАЗДЕЛ СТАТИСТИКИ</b>\n\n"
         "Здесь вы можете получить оперативную сводку по пользователям, записям и заказам в системе.",
-        reply_markup=kb.admin_action_menu([14, 15, 16, 18, 19, 3]),
+        reply_markup=kb.admin_action_menu([14, 15, 16, 18, 19, 20, 3]),
         parse_mode="HTML"
     )
     await call.answer()
 
 
+# АДМИН. СТАТИСТИКА ФУНКЦИЙ БД (/db_stats)
+@router.message(Command("db_stats"))
+async def handle_db_stats(message: Message):
+    """Скользящая статистика функций database.requests: вызовы, суммарное/среднее/макс. время."""
+    if await get_user_role(message.from_user.id) != "admin":
+        return
+
+    await message.answer(format_db_stats(), parse_mode="HTML")
+
+
+# АДМИН. СВЕРКА СЧЁТЧИКОВ ЗАКРЫТЫХ ЗАКАЗОВ (/counters [rebuild])
+@router.message(Command("counters"))
+async def handle_order_counters(message: Message, command: CommandObject):
+    """Сверяет счётчики топа клиентов/мастеров с заказами; `/counters rebuild` — пересчитывает их."""
+    if await get_user_role(message.from_user.id) != "admin":
+        return
+
+    rebuild = (command.args or "").strip().lower() == "rebuild"
+    result = await verify_order_counters(rebuild=rebuild)
+    mismatches = result["mismatches"]
+
+    if not mismatches:
+        text = "✅ Счётчики закрытых заказов совпадают с заказами."
+    else:
+        text = f"⚠️ Расхождений: {len(mismatches)}\n"
+        for tg_id, (have_client, have_master), (client, master) in mismatches[:10]:
+            text += f"\n{tg_id}: клиент {have_client} → {client}, мастер {have_master} → {master}"
+        if len(mismatches) > 10:
+            text += f"\n… и ещё {len(mismatches) - 10}"
+    if result["rebuilt"] is not None:
+        text += f"\n\n🔄 Счётчики пересчитаны: {result['rebuilt']} пользователей."
+    elif mismatches:
+        text += "\n\nДля пересчёта: /counters rebuild"
+
+    await message.answer(text)
+
+
+# АДМИН. ЭКСПОРТ В CSV (/export <orders|appointments|diagnostics> [с дд.мм.гггг] [по дд.мм.гггг])
+@router.message(Command("export"))
+async def handle_export(message: Message, command: CommandObject):
+    """
+    Выгрузка заказов (с архивом), записей или диагностик за период в .csv.gz документом.
+    Без дат — с начала текущего месяца по сегодня; с одной датой — с неё по сегодня.
+    """
+    if await get_user_role(message.from_user.id) != "admin":
+        return
+
+    usage = (
+        "📤 Использование: /export <orders | appointments | diagnostics> [с дд.мм.гггг] [по дд.мм.гггг]\n"
+        "Например: /export orders 01.09.2025 30.09.2025"
+    )
+    args = (command.args or "").split()
+    if not args or args[0] not in EXPORT_KINDS or len(args) > 3:
+        await message.answer(usage)
+        return
+    kind = args[0]
+    today = date.today()
+    try:
+        dates = [datetime.strptime(value, "%d.%m.%Y").date() for value in args[1:]]
+    except ValueError:
+        await message.answer(f"❌ Неверная дата.\n\n{usage}")
+        return
+    start = dates[0] if dates else today.replace(day=1)
+    end = dates[1] if len(dates) > 1 else today
+    if start > end:
+        await message.answer("❌ Начало периода позже конца.")
+        return
+
+    period = f"{start.strftime('%d.%m.%Y')}–{end.strftime('%d.%m.%Y')}"
+    progress = await message.answer(f"⏳ Готовлю выгрузку {kind} за {period}…")
+    try:
+        # При ошибке export_csv_gz сам удаляет недописанный файл
+        path, rows = await export_csv_gz(kind, start, end)
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки {kind} за {period}: {e}", exc_info=True)
+        await progress.edit_text(f"❌ Не удалось подготовить выгрузку {kind} за {period}. Подробности — в логе.")
+        return
+    try:
+        if not rows:
+            await progress.edit_text(f"📭 Нет данных {kind} за {period}.")
+        elif os.path.getsize(path) > Config.EXPORT_MAX_BYTES:
+            await progress.edit_text(
+                f"❌ Файл выгрузки больше {Config.EXPORT_MAX_BYTES // (1024 * 1024)} МБ ({rows} строк) — "
+                f"Telegram не примет его. Уменьшите период."
+            )
+        else:
+            await message.answer_document(
+                FSInputFile(path, filename=f"{kind}_{start:%Y%m%d}_{end:%Y%m%d}.csv.gz"),
+                caption=f"📤 {kind} за {period}: {rows} строк"
+            )
+            await progress.delete()
+    finally:
+        os.remove(path)
+
+
 # Обработчик: конкретный тип статистики
 @router.callback_query(F.data.startswith("stat:"))
 async def handle_stat_detail(call: CallbackQuery):
@@ -622,6 +861,16 @@ async def handle_stat_detail(call: CallbackQuery):
                     f"   📦 Закрыто заказов: {c['closed_orders']}"
                 )
 
+    elif stat_type == "trends":
+        await call.message.edit_text(
+            "📈 <b>ДИНАМИКА</b>\n\n"
+            "Созданные и закрытые заказы, записи на приём и самые загруженные дни недели за период.",
+            reply_markup=kb.admin_action_menu([21, 22, 23, 24]),
+            parse_mode="HTML"
+        )
+        await call.answer()
+        return
+
     elif stat_type == "masters":
         stats = await get_top_masters_statistics()
         masters = stats["masters"]
@@ -630,19 +879,76 @@ async def handle_stat_detail(call: CallbackQuery):
         else:
             text += "👨‍🔧 <b>МАСТЕРА</b> (по убыванию закрытых заказов):\n"
             for i, m in enumerate(masters, 1):
-                text += f"\n{i}. {m['user_name']} ⭐{m['rating']} — {m['closed_orders']} заказов"
+                text += f"\n{i}. {m['user_name']} ⭐{format_master_rating(m['rating'])} — {m['closed_orders']} заказов"
 
     else:
         text = "❌ Неизвестный тип статистики"
 
     await call.message.edit_text(
         text,
-        reply_markup=kb.admin_action_menu([14, 15, 16, 18, 19, 3]),
+        reply_markup=kb.admin_action_menu([14, 15, 16, 18, 19, 20, 3]),
         parse_mode="HTML"
     )
     await call.answer()
 
 
+# Динамика за период: (название, число дней, группировка строк)
+_TREND_PERIODS = {
+    "week": ("неделю", 7, "day"),
+    "month": ("месяц", 30, "week"),
+    "year": ("год", 365, "month"),
+}
+_WEEKDAY_NAMES = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+
+def _trend_bucket(day: date, grouping: str) -> str:
+    if grouping == "day":
+        return f"{_WEEKDAY_NAMES[day.weekday()]} {day.strftime('%d.%m')}"
+    if grouping == "week":
+        return f"с {(day - timedelta(days=day.weekday())).strftime('%d.%m')}"
+    return day.strftime("%m.%Y")
+
+
+@router.callback_query(F.data.startswith("trend:"))
+async def handle_trend_stats(call: CallbackQuery):
+    period = _TREND_PERIODS.get(call.data.split(":", 1)[1])
+    if period is None:
+        await call.answer("❌ Неизвестный период", show_alert=True)
+        return
+    title, days_count, grouping = period
+
+    end = date.today()
+    stats = await get_trend_statistics(start=end - timedelta(days=days_count - 1), end=end)
+    totals = stats["totals"]
+    text = (
+        f"📈 <b>ДИНАМИКА ЗА {title.upper()}</b>\n"
+        f"{(end - timedelta(days=days_count - 1)).strftime('%d.%m.%Y')} — {end.strftime('%d.%m.%Y')}\n\n"
+        f"📥 Создано заказов: {totals['created']}\n"
+        f"✅ Закрыто заказов: {totals['closed']}\n"
+        f"🗓️ Записей: {totals['appointments']}\n"
+    )
+
+    if not stats["days"]:
+        text += "\nНет данных за период."
+    else:
+        buckets = {}
+        for day, created, closed, appointments in stats["days"]:
+            bucket = buckets.setdefault(_trend_bucket(day, grouping), [0, 0, 0])
+            bucket[0] += created
+            bucket[1] += closed
+            bucket[2] += appointments
+        text += "\n📥 / ✅ / 🗓️:\n"
+        for label, (created, closed, appointments) in buckets.items():
+            text += f" {label}: {created} / {closed} / {appointments}\n"
+
+        text += "\nЗагруженные дни недели (заказы + записи):\n"
+        for weekday, created, appointments in stats["weekdays"][:3]:
+            text += f" {_WEEKDAY_NAMES[weekday]} — {created + appointments}\n"
+
+    await call.message.edit_text(text, reply_markup=kb.admin_action_menu([21, 22, 23, 24]), parse_mode="HTML")
+    await call.answer()
+
+
 # ==============================
 # АДМИН. РАССЫЛКА
 # ==============================
@@ -719,16 +1025,14 @@ async def confirm_broadcast(call: CallbackQuery, state: FSMContext):
     # Получаем ID сообщений для удаления (предпросмотр и исходное сообщение)
     mess_ids = data.get("broadcast_message_ids", [])
 
-    # Получаем всех активных пользователей
-    user_ids = await get_all_active_user_ids()
-
     status_msg = await call.message.edit_text("📤 Рассылка запущена... Это может занять время.")
 
     # Добавляем в общий список с id сообщений для удаления
     mess_ids.append(status_msg.message_id)
 
     success, failed = 0, 0
-    for user_id in user_ids:
+    # Получатели читаются пачками по ходу рассылки, а не одним списком
+    async for user_id in stream_active_user_ids():
         try:
             if content["type"] == "text":
                 await call.bot.send_message(user_id, content["text"], parse_mode="HTML")
@@ -741,8 +1045,10 @@ async def confirm_broadcast(call: CallbackQuery, state: FSMContext):
             success += 1
         except Exception as e:
             failed += 1
-            # Логируй ошибку
-            logging.warning(f"Failed to send to {user_id}: {e}")
+            # Частота этого предупреждения ограничивается фильтром логирования (LoggingConfig.WARNING_*)
+            logger.warning(f"Failed to send to {user_id}: {e}")
+
+    logger.info(f"Рассылка завершена: успешно {success}, ошибок {failed}")
 
     await call.answer(
         f"✅ Рассылка завершена!\n"
@@ -814,23 +1120,24 @@ async def show_master_data(call: CallbackQuery) -> None:
     user_tg_id = call.from_user.id
     user_data = await get_user_dict(
         tg_id=user_tg_id,
-        fields=["user_name", "rating", "contact", "role", "status", "can_messages"]
+        fields=["user_name", "contact", "role", "status", "can_messages"]
     )
 
     user_role = user_data["role"]
 
     if user_role == "master":
 
+        grades = await get_master_rating(user_tg_id)
         can_mess = "ВКЛ" if user_data['can_messages'] else "ВЫКЛ"
 
         text = (
-            "Здесь отображены ваши актуальные регистрационные данные, рейтинг который увеличивается "
-            "и зависит от оценок клиентов. Если сообщения: Включены - вы всегда получаете рассылку новых "
+            "Здесь отображены ваши актуальные регистрационные данные и средняя оценка, которую ставят "
+            "клиенты при приёмке работы. Если сообщения: Включены - вы всегда получаете рассылку новых "
             "клиентов, Выключены - получаете только адресованные вам.\n\n"
             f"👤 Имя: {user_data['user_name']}\n"
             f"📱 Телеграм: {user_tg_id}\n"
             f"📞 Контактный номер: {user_data['contact']}\n"
-            f"⭐ Рейтинг: {user_data['rating']}\n"
+            f"⭐ Оценки клиентов: {format_master_rating(grades, with_last=True)}\n"
             f"🔸 Должность: {user_data['status']}\n"
             f"✉️ Сообщения: {can_mess}\n"
         )
@@ -1009,7 +1316,7 @@ async def handle_appointment_period(call: CallbackQuery):
         await call.answer("❌ Неверный выбор.", show_alert=True)
         return
 
-    appointments = await get_filter_appointments(tg_id_master=master_id, date_filter=date_filter)
+    appointments = await get_filter_appointments(tg_id_master=master_id, date_filter=date_filter, counterpart="user")
 
     if not appointments:
         await call.answer(f"❌ Нет записей.", show_alert=True)
@@ -1024,9 +1331,8 @@ async def handle_appointment_period(call: CallbackQuery):
         start_time = appt["appointment_time"].strftime("%H:%M")
         end_time = appt["end_time"].strftime("%H:%M")
 
-        user_data = await get_user_dict(tg_id=appt["tg_id_user"], fields=["user_name", "contact"])
-        user_name = user_data["user_name"] if user_data else "—"
-        user_contact = user_data["contact"] if user_data else "—"
+        user_name = appt["user_name"] or "—"
+        user_contact = appt["contact"] or "—"
 
         text = (
             f"🆔 <b>Запись №{appt['id']}</b>\n"
@@ -1046,11 +1352,10 @@ async def handle_appointment_period(call: CallbackQuery):
 
 
 # НАПОМНИТЬ О ВСТРЕЧЕ
-@router.callback_query(F.data.startswith("remind_mess:"))
-async def handle_remind_mess(call: CallbackQuery):
-    parts = call.data.split(":")
-    appointment_id = int(parts[1])
-    client_tg_id = int(parts[2])
+@router.callback_query(RemindMessCb.filter())
+async def handle_remind_mess(call: CallbackQuery, callback_data: RemindMessCb):
+    appointment_id = callback_data.appointment_id
+    client_tg_id = callback_data.tg_id
     master_tg_id = call.from_user.id
 
     # Получаем имя мастера
@@ -1084,17 +1389,13 @@ async def handle_remind_mess(call: CallbackQuery):
 
 
 # ПЕРЕНЕСТИ ВСТРЕЧУ
-@router.callback_query(F.data.startswith("transfer_app:"))
-async def handle_transfer_mess(call: CallbackQuery, state: FSMContext):
+@router.callback_query(TransferAppCb.filter())
+async def handle_transfer_mess(call: CallbackQuery, state: FSMContext, callback_data: TransferAppCb):
     """
     Обрабатывает нажатие кнопки 'Перенести встречу'.
     Перенаправляет в уже существующий FSM-поток записи (как при set_time).
     """
-    try:
-        user_tg_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID клиента.", show_alert=True)
-        return
+    user_tg_id = callback_data.tg_id
 
     # Сохраняем целевого пользователя
     user_data = await get_user_dict(tg_id=user_tg_id, fields=["user_name"])
@@ -1113,13 +1414,9 @@ async def handle_transfer_mess(call: CallbackQuery, state: FSMContext):
 
 
 # УДАЛИТЬ ЗАПИСЬ
-@router.callback_query(F.data.startswith("del_app:"))
-async def delete_appointment_handler(call: CallbackQuery):
-    try:
-        appointment_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID записи.", show_alert=True)
-        return
+@router.callback_query(DelAppCb.filter())
+async def delete_appointment_handler(call: CallbackQuery, callback_data: DelAppCb):
+    appointment_id = callback_data.appointment_id
 
     # Удаляем запись
     success = await delete_appointment(appointment_id)
@@ -1137,15 +1434,18 @@ async def delete_appointment_handler(call: CallbackQuery):
 async def master_current_orders(call: CallbackQuery):
     master_id = call.from_user.id
     # Получаем активные заказы, между пользователем и мастером
-    orders = await get_orders_by_user(tg_id_master=master_id, active=True)
+    orders = await get_orders_by_user(
+        tg_id_master=master_id,
+        active=True,
+        fields=["id", "tg_id_user", "user_name", "user_contact", "repair_status", "description", "brand_auto",
+                "model_auto", "total_km", "year_auto", "gos_num", "vin_number", "date"]
+    )
 
     if not orders:
         await call.answer("❌ У вас нет активных заказов.", show_alert=True)
     else:
         for order in orders:
-            date_str = order.get("date", "не указана")
-            if isinstance(date_str, str) and "T" in date_str:
-                date_str = date_str.split("T")[0]
+            date_str = order_date_str(order["date"])
 
             status_raw = order['repair_status']
             status_display = REPAIR_STATUS_DISPLAY.get(status_raw, status_raw)
@@ -1179,21 +1479,15 @@ async def master_current_orders(call: CallbackQuery):
 
 
 # ВЫБОР ВЫПОЛНЕНО
-# Роутер: обрабатывает complied_order:order_id:client_tg_id
-@router.callback_query(F.data.startswith("comp_odr:"))
-async def handle_complied_order(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) != 3:
+# Роутер: обрабатывает OrderActionCb(action="complied", order_id, tg_id клиента)
+@router.callback_query(OrderActionCb.filter(F.action == "complied"))
+async def handle_complied_order(call: CallbackQuery, state: FSMContext, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
+    client_tg_id = callback_data.tg_id
+    if client_tg_id is None:
         await call.answer("❌ Неверный формат", show_alert=True)
         return
 
-    try:
-        order_id = int(parts[1])
-        client_tg_id = int(parts[2])
-    except ValueError:
-        await call.answer("❌ Некорректные ID", show_alert=True)
-        return
-
     master_tg_id = call.from_user.id
 
     # Сохраняем данные в состоянии
@@ -1250,17 +1544,13 @@ async def send_quick_pickup(call: CallbackQuery, state: FSMContext):
 
 
 # ВЫБОР "ОТПРАВИТЬ СООБЩЕНИЕ"
-@router.callback_query(F.data.startswith("send_mess:"))
-async def request_custom_message(call: CallbackQuery, state: FSMContext):
+@router.callback_query(SendMessCb.filter())
+async def request_custom_message(call: CallbackQuery, state: FSMContext, callback_data: SendMessCb):
     """
     Обрабатывает нажатие кнопки 'Отправить сообщение' из меню заказа.
     Запрашивает текст сообщения у мастера.
     """
-    try:
-        client_tg_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID клиента.", show_alert=True)
-        return
+    client_tg_id = callback_data.tg_id
 
     master_tg_id = call.from_user.id
 
@@ -1322,13 +1612,9 @@ async def send_custom_message_to_client(message: Message, state: FSMContext):
 
 
 # === ОБНОВИТЬ ПРОБЕГ КМ ===
-@router.callback_query(F.data.startswith("up_km:"))
-async def edit_status(call: CallbackQuery, state: FSMContext):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "km"))
+async def edit_status(call: CallbackQuery, state: FSMContext, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     await state.update_data(order_id=order_id)
 
@@ -1398,13 +1684,9 @@ async def process_new_total_km(message: Message, state: FSMContext):
 
 
 # === ИЗМЕНИТЬ СТАТУС ===
-@router.callback_query(F.data.startswith("ed_st:"))
-async def edit_status(call: CallbackQuery):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "wait"))
+async def edit_status(call: CallbackQuery, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     # Обновляем статус заказа
     await update_order(
@@ -1416,13 +1698,9 @@ async def edit_status(call: CallbackQuery):
 
 
 # === ИЗМЕНИТЬ ОПИСАНИЕ ===
-@router.callback_query(F.data.startswith("ed_des:"))
-async def edit_description(call: CallbackQuery, state: FSMContext):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "desc"))
+async def edit_description(call: CallbackQuery, state: FSMContext, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     await state.update_data(order_id=order_id)
 
@@ -1493,13 +1771,9 @@ async def process_new_description(message: Message, state: FSMContext):
 
 
 # === ЗАКРЫТЬ ЗАКАЗ ===
-@router.callback_query(F.data.startswith("cl_odr:"))
-async def close_order(call: CallbackQuery):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "close"))
+async def close_order(call: CallbackQuery, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     # Обновляем статус заказа на "close"
     success = await update_order(order_id=order_id, repair_status="close", complied=True)
@@ -1511,13 +1785,9 @@ async def close_order(call: CallbackQuery):
 
 
 # === ПЕРЕДАТЬ ЗАКАЗ ===
-@router.callback_query(F.data.startswith("tr_odr:"))
-async def start_transfer_order(call: CallbackQuery, state: FSMContext):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "transfer"))
+async def start_transfer_order(call: CallbackQuery, state: FSMContext, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     current_master_id = call.from_user.id
 
@@ -1546,13 +1816,9 @@ async def start_transfer_order(call: CallbackQuery, state: FSMContext):
 
 
 # УДАЛИТЬ ЗАКАЗ
-@router.callback_query(F.data.startswith("del_odr:"))
-async def handle_delete_order(call: CallbackQuery):
-    try:
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "delete"))
+async def handle_delete_order(call: CallbackQuery, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     # Удаляем заказ из БД
     success = await delete_order(order_id)
@@ -1572,14 +1838,9 @@ async def handle_delete_order(call: CallbackQuery):
 
 
 # ВОЗВРАТ В ТЕКУЩИЙ resume_order
-@router.callback_query(F.data.startswith("res_odr:"))
-async def handle_resume_order(call: CallbackQuery):
-    try:
-        # Извлекаем order_id из callback_data
-        order_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID заказа.", show_alert=True)
-        return
+@router.callback_query(OrderActionCb.filter(F.action == "resume"))
+async def handle_resume_order(call: CallbackQuery, callback_data: OrderActionCb):
+    order_id = callback_data.order_id
 
     # Обновляем заказ: возвращаем в работу
     success = await update_order(
@@ -1596,13 +1857,9 @@ async def handle_resume_order(call: CallbackQuery):
     await call.answer("✅ Заказ возвращён в работу.", show_alert=True)
 
 
-@router.callback_query(MasterTransfer.choosing_recipient, F.data.startswith("select_master:"))
-async def select_recipient_master(call: CallbackQuery, state: FSMContext):
-    try:
-        new_master_tg_id = int(call.data.split(":", 1)[1])
-    except (ValueError, IndexError):
-        await call.answer("❌ Некорректный ID мастера.", show_alert=True)
-        return
+@router.callback_query(MasterTransfer.choosing_recipient, SelectMasterCb.filter())
+async def select_recipient_master(call: CallbackQuery, state: FSMContext, callback_data: SelectMasterCb):
+    new_master_tg_id = callback_data.tg_id
 
     data = await state.get_data()
     order_id = data.get("order_id")
@@ -1640,47 +1897,78 @@ async def select_recipient_master(call: CallbackQuery, state: FSMContext):
     await state.clear()
 
 
+_EPOCH = datetime(1970, 1, 1)
+
+
 @router.callback_query(F.data == "work_history")
 async def master_closed_orders(call: CallbackQuery):
+    await _send_work_history_page(call)
+
+
+@router.callback_query(WorkHistoryCb.filter())
+async def master_closed_orders_more(call: CallbackQuery, callback_data: WorkHistoryCb):
+    before = (_EPOCH + timedelta(microseconds=callback_data.before_us), callback_data.before_id)
+    # Кнопка «Показать ещё» больше не нужна — следующая придёт после новой страницы
+    try:
+        await call.message.delete()
+    except TelegramAPIError:
+        pass
+    await _send_work_history_page(call, before)
+
+
+async def _send_work_history_page(call: CallbackQuery, before=None):
+    """
+    Страница закрытых заказов мастера (новые первыми), включая архив.
+    Следующая страница выбирается по ключу (date, id) последнего показанного заказа.
+    """
     master_id = call.from_user.id
-    # Получаем ЗАКРЫТЫЕ заказы (active=False)
-    orders = await get_orders_by_user(tg_id_master=master_id, active=False)
+    orders, next_before = await get_closed_orders_page(
+        tg_id_master=master_id, before=before, limit=Config.WORK_HISTORY_PAGE_SIZE
+    )
 
     if not orders:
         await call.answer("❌ У вас нет закрытых заказов.", show_alert=True)
-    else:
-        for order in orders:
-            date_str = order.get("date", "не указана")
-            if isinstance(date_str, str) and "T" in date_str:
-                date_str = date_str.split("T")[0]
+        return
 
-            status_raw = order['repair_status']
-            status_display = REPAIR_STATUS_DISPLAY.get(status_raw, status_raw)
-            order_id = order['id']
-            user_contact = order['user_contact']
-            tg_id_user = order['tg_id_user']
+    for order in orders:
+        date_str = order.date_str
 
-            text = (
-                f"🆔 ID заказа: {order_id}\n\n"
-                f"👤 Клиент: {order['user_name']}\n"
-                f'📱 Телеграм ID: <a href="tg://user?id={tg_id_user}">{tg_id_user}</a>\n'
-                f'📞 Сот.тел: <a href="tel:{user_contact}">{user_contact}</a>\n'
-                f"🚗 Марка авто: {order['brand_auto']}\n"
-                f"⚙️ Модель авто: {order['model_auto']}\n"
-                f"📆 Год выпуска: {order['year_auto']}\n"
-                f"🛞 Пробег авто: {order['total_km']} km\n"
-                f"ℹ️ VIN: {order['vin_number']}\n"
-                f"🔢 Гос. номер: {order['gos_num']}\n"
-                f"🔧 Статус: {status_display}\n"
-                f"📝 Описание:\n{order['description']}\n\n"
-                f"📅 Дата создания: {date_str}"
-            )
+        status_raw = order['repair_status']
+        status_display = REPAIR_STATUS_DISPLAY.get(status_raw, status_raw)
+        order_id = order['id']
+        user_contact = order['user_contact']
+        tg_id_user = order['tg_id_user']
 
-            await call.message.answer(
-                text,
-                parse_mode="HTML",
-                reply_markup=kb.master_order_action_menu([7, 8], order_id, tg_id_user)
+        text = (
+            f"🆔 ID заказа: {order_id}\n\n"
+            f"👤 Клиент: {order['user_name']}\n"
+            f'📱 Телеграм ID: <a href="tg://user?id={tg_id_user}">{tg_id_user}</a>\n'
+            f'📞 Сот.тел: <a href="tel:{user_contact}">{user_contact}</a>\n'
+            f"🚗 Марка авто: {order['brand_auto']}\n"
+            f"⚙️ Модель авто: {order['model_auto']}\n"
+            f"📆 Год выпуска: {order['year_auto']}\n"
+            f"🛞 Пробег авто: {order['total_km']} km\n"
+            f"ℹ️ VIN: {order['vin_number']}\n"
+            f"🔢 Гос. номер: {order['gos_num']}\n"
+            f"🔧 Статус: {status_display}\n"
+            f"📝 Описание:\n{order['description']}\n\n"
+            f"📅 Дата создания: {date_str}"
+        )
+
+        await call.message.answer(
+            text,
+            parse_mode="HTML",
+            reply_markup=kb.master_order_action_menu([7, 8], order_id, tg_id_user)
+        )
+
+    if next_before is not None:
+        before_date, before_id = next_before
+        await call.message.answer(
+            "📜 Показаны более новые заказы. Дальше — более ранние:",
+            reply_markup=kb.work_history_more(
+                (before_date - _EPOCH) // timedelta(microseconds=1), before_id
             )
+        )
 
     await call.answer()
 
@@ -1691,10 +1979,9 @@ async def master_closed_orders(call: CallbackQuery):
 
 
 # === ОЖИДАНИЕ ===
-@router.callback_query(F.data.startswith("await:"))
-async def handle_await_action(call: CallbackQuery):
-    parts = call.data.split(":", 1)
-    user_id = int(parts[1])
+@router.callback_query(ClientActionCb.filter(F.action == "await"))
+async def handle_await_action(call: CallbackQuery, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
 
     response_text = "⌚️ В данный момент занят. Отвечу, как только освобожусь!"
     await bot.send_message(chat_id=user_id, text=response_text, reply_markup=kb.common_menu([4]))
@@ -1702,20 +1989,18 @@ async def handle_await_action(call: CallbackQuery):
 
 
 # === ОТКАЗ ===
-@router.callback_query(F.data.startswith("refuse:"))
-async def handle_refuse_action(call: CallbackQuery):
-    parts = call.data.split(":", 1)
-    user_id = int(parts[1])
+@router.callback_query(ClientActionCb.filter(F.action == "refuse"))
+async def handle_refuse_action(call: CallbackQuery, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
     response_text = f"😔 Извините, но к сожалению не сможем помочь с этой проблемой."
     await bot.send_message(chat_id=user_id, text=response_text, reply_markup=kb.common_menu([4]))
     await call.answer("✅ Ответ «Отказ» отправлен пользователю.", show_alert=True)
 
 
 # === ЗВОНИТЕ ===
-@router.callback_query(F.data.startswith("call:"))
-async def handle_call_action(call: CallbackQuery):
-    parts = call.data.split(":", 1)
-    user_id = int(parts[1])
+@router.callback_query(ClientActionCb.filter(F.action == "call"))
+async def handle_call_action(call: CallbackQuery, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
     master_tg_id = call.from_user.id
 
     user_data = await get_user_dict(tg_id=master_tg_id, fields=["user_name", "contact"])
@@ -1731,11 +2016,11 @@ async def handle_call_action(call: CallbackQuery):
 
 
 # === УТОЧНИТЬ УДОБНОЕ ВРЕМЯ ===
-@router.callback_query(F.data.startswith("check_time:"))
-async def handle_check_time_action(call: CallbackQuery):
+@router.callback_query(ClientActionCb.filter(F.action == "check_time"))
+async def handle_check_time_action(call: CallbackQuery, callback_data: ClientActionCb):
 
     # Извлекаем tg_id клиента
-    client_tg_id = int(call.data.split(":", 1)[1])
+    client_tg_id = callback_data.user_id
     master_tg_id = call.from_user.id
 
     user_data = await get_user_dict(tg_id=master_tg_id, fields=["user_name"])
@@ -1757,18 +2042,9 @@ async def handle_check_time_action(call: CallbackQuery):
 
 
 # === НАЗНАЧИТЬ ВРЕМЯ — вход в FSM ===
-@router.callback_query(F.data.startswith("set_time:"))
-async def handle_set_time_action(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":", 1)
-    if len(parts) != 2:
-        await call.answer("Неверный формат", show_alert=True)
-        return
-
-    try:
-        user_id = int(parts[1])
-    except ValueError:
-        await call.answer("Некорректный ID", show_alert=True)
-        return
+@router.callback_query(ClientActionCb.filter(F.action == "set_time"))
+async def handle_set_time_action(call: CallbackQuery, state: FSMContext, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
 
     if await has_active_appointment(user_id):
         await call.answer("❌ Клиент уже записан на приём.", show_alert=True)
@@ -1787,18 +2063,9 @@ async def handle_set_time_action(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 
-@router.callback_query(AppointmentStates.choosing_option, F.data.startswith("today:"))
-async def handle_today_selection(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":", 1)
-    if len(parts) != 2:
-        await call.answer("Неверный формат", show_alert=True)
-        return
-
-    try:
-        user_id = int(parts[1])
-    except ValueError:
-        await call.answer("Некорректный ID", show_alert=True)
-        return
+@router.callback_query(AppointmentStates.choosing_option, ClientActionCb.filter(F.action == "today"))
+async def handle_today_selection(call: CallbackQuery, state: FSMContext, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
 
     today = date.today()
     free_hours = await get_available_hours(today)  # ВОЗВРАЩАЕТ СВОБОДНЫЕ часы
@@ -1828,18 +2095,9 @@ async def handle_today_selection(call: CallbackQuery, state: FSMContext):
 
 
 # === "ВЫБРАТЬ ДЕНЬ" ===
-@router.callback_query(AppointmentStates.choosing_option, F.data.startswith("next_days:"))
-async def handle_next_days_selection(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":", 1)
-    if len(parts) != 2:
-        await call.answer("❌ Неверный формат", show_alert=True)
-        return
-
-    try:
-        user_id = int(parts[1])
-    except ValueError:
-        await call.answer("❌ Некорректный ID", show_alert=True)
-        return
+@router.callback_query(AppointmentStates.choosing_option, ClientActionCb.filter(F.action == "next_days"))
+async def handle_next_days_selection(call: CallbackQuery, state: FSMContext, callback_data: ClientActionCb):
+    user_id = callback_data.user_id
 
     today = date.today()
     year, month = today.year, today.month
@@ -1873,21 +2131,10 @@ async def handle_next_days_selection(call: CallbackQuery, state: FSMContext):
 
 
 # === ВЫБОР ДНЯ В КАЛЕНДАРЕ ===
-@router.callback_query(AppointmentStates.choosing_day, F.data.startswith("calendar_day:"))
-async def handle_calendar_day(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) != 5:  # calendar_day:year:month:day:user_id
-        await call.answer("❌ Ошибка формата", show_alert=True)
-        return
-
-    try:
-        year = int(parts[1])
-        month = int(parts[2])
-        day = int(parts[3])
-        user_id = int(parts[4])
-    except ValueError:
-        await call.answer("❌ Некорректные данные", show_alert=True)
-        return
+@router.callback_query(AppointmentStates.choosing_day, CalendarDayCb.filter())
+async def handle_calendar_day(call: CallbackQuery, state: FSMContext, callback_data: CalendarDayCb):
+    year, month, day = callback_data.year, callback_data.month, callback_data.day
+    user_id = callback_data.user_id
 
     try:
         selected_date = date(year, month, day)
@@ -1924,20 +2171,10 @@ async def handle_calendar_day(call: CallbackQuery, state: FSMContext):
 
 
 # === НАВИГАЦИЯ ПО МЕСЯЦАМ ===
-@router.callback_query(AppointmentStates.choosing_day, F.data.startswith("calendar_nav:"))
-async def handle_calendar_navigation(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) != 4:
-        await call.answer("❌ Ошибка навигации", show_alert=True)
-        return
-
-    try:
-        year = int(parts[1])
-        month = int(parts[2])
-        user_id = int(parts[3])
-    except ValueError:
-        await call.answer("❌ Некорректные данные", show_alert=True)
-        return
+@router.callback_query(AppointmentStates.choosing_day, CalendarNavCb.filter())
+async def handle_calendar_navigation(call: CallbackQuery, state: FSMContext, callback_data: CalendarNavCb):
+    year, month = callback_data.year, callback_data.month
+    user_id = callback_data.user_id
 
     # Проверим, не ушли ли слишком далеко в прошлое/будущее
     today = date.today()
@@ -1975,21 +2212,10 @@ async def handle_calendar_navigation(call: CallbackQuery, state: FSMContext):
 
 
 # === ВЫБОР ВРЕМЕНИ И ПЕРЕХОД К ВЫБОРУ ДЛИТЕЛЬНОСТИ ===
-@router.callback_query(AppointmentStates.choosing_time, F.data.startswith("appoint:"))
-async def handle_appointment_time(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) != 3:
-        await call.answer("Ошибка формата", show_alert=True)
-        await state.clear()
-        return
-
-    try:
-        start_hour = int(parts[1])
-        user_id = int(parts[2])
-    except ValueError:
-        await call.answer("Некорректные данные", show_alert=True)
-        await state.clear()
-        return
+@router.callback_query(AppointmentStates.choosing_time, AppointHourCb.filter())
+async def handle_appointment_time(call: CallbackQuery, state: FSMContext, callback_data: AppointHourCb):
+    start_hour = callback_data.hour
+    user_id = callback_data.user_id
 
     data = await state.get_data()
     selected_date = data.get("selected_date")
@@ -2013,22 +2239,10 @@ async def handle_appointment_time(call: CallbackQuery, state: FSMContext):
 
 
 # === ВЫБОР ДЛИТЕЛЬНОСТИ ===
-@router.callback_query(AppointmentStates.choosing_duration, F.data.startswith("duration:"))
-async def handle_duration_selection(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-
-    if len(parts) != 3:
-        await call.answer("Ошибка формата", show_alert=True)
-        await state.clear()
-        return
-
-    try:
-        duration_hours = float(parts[1])
-        user_id = int(parts[2])
-    except ValueError:
-        await call.answer("Некорректные данные", show_alert=True)
-        await state.clear()
-        return
+@router.callback_query(AppointmentStates.choosing_duration, DurationCb.filter())
+async def handle_duration_selection(call: CallbackQuery, state: FSMContext, callback_data: DurationCb):
+    duration_hours = callback_data.hours
+    user_id = callback_data.user_id
 
     data = await state.get_data()
     selected_date = data.get("selected_date")
@@ -2088,20 +2302,15 @@ TYPE_DESCRIPTIONS = {
 }
 
 
-@router.callback_query(F.data.startswith("repair_type:"))
-async def start_repair_order_process(call: CallbackQuery, state: FSMContext):
+@router.callback_query(RepairTypeCb.filter())
+async def start_repair_order_process(call: CallbackQuery, state: FSMContext, callback_data: RepairTypeCb):
     """
     Запускает FSM создания заказа после выбора типа работ.
     Если выбран "ВВЕСТИ ТЕКСТОМ" — переходит к вводу описания.
     Иначе — подставляет быстрое описание и показывает кнопку создания заказа.
     """
-    parts = call.data.split(":")
-    if len(parts) != 3:
-        await call.answer("❌ Некорректный формат данных", show_alert=True)
-        return
-
-    action = parts[1]
-    client_tg_id = int(parts[2])
+    action = callback_data.kind
+    client_tg_id = callback_data.user_id
     master_tg_id = call.from_user.id
 
     # Инициализируем список временных сообщений
@@ -2165,16 +2374,9 @@ async def handle_custom_description(message: Message, state: FSMContext):
     await state.set_state(RepairOrderStates.confirming)
 
 
-@router.callback_query(RepairOrderStates.confirming, F.data.startswith("create_order:"))
-async def create_repair_order(call: CallbackQuery, state: FSMContext):
-    parts = call.data.split(":")
-    if len(parts) != 2:
-        return
-
-    try:
-        client_tg_id = int(parts[1])
-    except ValueError:
-        return
+@router.callback_query(RepairOrderStates.confirming, ClientActionCb.filter(F.action == "create_order"))
+async def create_repair_order(call: CallbackQuery, state: FSMContext, callback_data: ClientActionCb):
+    client_tg_id = callback_data.user_id
 
     master_tg_id = call.from_user.id
     data = await state.get_data()
@@ -2183,8 +2385,11 @@ async def create_repair_order(call: CallbackQuery, state: FSMContext):
     client_fields = ["user_name", "contact", "brand_auto", "model_auto", "gos_num", "year_auto", "vin_number"]
     master_fields = ["user_name", "contact"]
 
-    client_data = await get_user_dict(tg_id=client_tg_id, fields=client_fields)
-    master_data = await get_user_dict(tg_id=master_tg_id, fields=master_fields)
+    # Оба профиля запрашиваются в одном тике — загрузчик апдейта выполнит один запрос
+    client_data, master_data = await asyncio.gather(
+        get_user_dict(tg_id=client_tg_id, fields=client_fields),
+        get_user_dict(tg_id=master_tg_id, fields=master_fields),
+    )
 
     if not client_data or not master_data:
         await call.answer("❌ Пользователь не найден", show_alert=True)
@@ -2372,7 +2577,9 @@ async def in_dtc_text(message: Message, state: FSMContext) -> None:
 async def cmd_manual_dtc(call: CallbackQuery, state: FSMContext):
     """Начало: выбор активного заказа для ручного ввода DTC."""
     master_tg_id = call.from_user.id
-    orders = await get_orders_by_user(tg_id_master=master_tg_id, active=True)
+    orders = await get_orders_by_user(
+        tg_id_master=master_tg_id, active=True, fields=["id", "brand_auto", "model_auto", "year_auto"]
+    )
     if not orders:
         await call.answer("❌ У вас нет активных заказов.", show_alert=True)
         return
@@ -2386,15 +2593,11 @@ async def cmd_manual_dtc(call: CallbackQuery, state: FSMContext):
     await call.answer()
 
 
-@router.callback_query(MasterDtcMode.manual_select_order, F.data.startswith("select_order:"))
-async def select_order_for_manual_dtc(call: CallbackQuery, state: FSMContext):
+@router.callback_query(MasterDtcMode.manual_select_order, SelectOrderCb.filter())
+async def select_order_for_manual_dtc(call: CallbackQuery, state: FSMContext, callback_data: SelectOrderCb):
     """Выбор заказа → сразу запрашиваем ввод DTC-кода."""
-    parts = call.data.split(":")
-    if len(parts) != 5:
-        await call.answer("❌ Ошибка данных", show_alert=True)
-        return
-    order_id = int(parts[1])
-    brand, model, year = parts[2], parts[3], parts[4]
+    order_id = callback_data.order_id
+    brand, model, year = callback_data.brand_auto, callback_data.model_auto, callback_data.year_auto
 
     await state.update_data(
         order_id=order_id,
@@ -2584,3 +2787,13 @@ async def show_api_history(call: CallbackQuery):
     await call.answer()
 
 
+# ==============================
+# УСТАРЕВШИЕ КНОПКИ
+# ==============================
+@router.callback_query(F.data.func(is_stored_payload))
+async def handle_stale_callback(call: CallbackQuery):
+    """
+    Кнопка ссылается на данные из серверного хранилища, которые уже истекли
+    (или бот был перезапущен) — ни один фильтр выше их не разобрал.
+    """
+    await call.answer("⌛️ Кнопка устарела, откройте меню заново.", show_alert=True)
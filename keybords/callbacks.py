@@ -0,0 +1,317 @@
+"""
+Типизированные callback-данные inline-кнопок.
+
+Каждый тип кнопки описан фабрикой `CallbackData` aiogram с коротким префиксом:
+- упаковка (`.pack()`) даёт компактную строку, целые числа кодируются в base36;
+- разбор выполняется фильтром `Cb.filter()` — обработчик получает уже
+  провалидированный объект `callback_data` вместо ручного `split(':')`.
+
+Если данные не укладываются в лимит Telegram (64 байта) или содержат разделитель
+(например, двоеточие в марке авто, введённой пользователем), они сохраняются
+в серверном хранилище с коротким TTL, а в кнопку попадает только токен.
+"""
+
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Annotated, Any, Dict, Optional, Tuple
+
+from aiogram.filters.callback_data import CallbackData, MAX_CALLBACK_LENGTH
+from pydantic import BeforeValidator, PlainSerializer
+
+from config import Config
+
+
+# ==============================
+# КОМПАКТНОЕ КОДИРОВАНИЕ ЦЕЛЫХ
+# ==============================
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _to_base36(value: int) -> str:
+    """Кодирует целое число в base36 (Telegram ID из 10 цифр → 7 символов)."""
+    if value < 0:
+        return "-" + _to_base36(-value)
+    if value == 0:
+        return "0"
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(_BASE36_DIGITS[rem])
+    return "".join(reversed(digits))
+
+
+# True только внутри CompactCallback.unpack: строку base36 декодируем лишь при разборе
+# callback_data из Telegram, а не при создании объекта в коде (SendMessCb(tg_id="12") → 12)
+_unpacking: ContextVar[bool] = ContextVar("callback_unpacking", default=False)
+
+
+def _from_base36(value: Any) -> Any:
+    """При разборе callback_data декодирует base36; вне разбора — обычная проверка int."""
+    if isinstance(value, str) and _unpacking.get():
+        return int(value, 36)
+    return value
+
+
+Int36 = Annotated[int, BeforeValidator(_from_base36), PlainSerializer(_to_base36, return_type=str)]
+
+
+# ==============================
+# ХРАНИЛИЩЕ ДЛИННЫХ ДАННЫХ
+# ==============================
+class CallbackPayloadStore:
+    """
+    Хранилище callback-данных, которые не помещаются в кнопку.
+    Живёт в памяти процесса; записи удаляются по истечении TTL.
+    """
+
+    def __init__(self, ttl_sec: int):
+        self.ttl_sec = ttl_sec
+        self._items: Dict[str, Tuple[float, Any]] = {}
+
+    def put(self, payload: Any) -> str:
+        """Сохраняет данные и возвращает короткий токен (8 символов, без разделителя ':')."""
+        self._purge()
+        token = secrets.token_urlsafe(6)
+        self._items[token] = (time.monotonic() + self.ttl_sec, payload)
+        return token
+
+    def get(self, token: str) -> Optional[Any]:
+        """Возвращает данные по токену или None, если токен неизвестен или истёк."""
+        item = self._items.get(token)
+        if item is None:
+            return None
+        expires_at, payload = item
+        if expires_at < time.monotonic():
+            self._items.pop(token, None)
+            return None
+        return payload
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [token for token, (expires_at, _) in self._items.items() if expires_at < now]
+        for token in expired:
+            del self._items[token]
+
+
+payload_store = CallbackPayloadStore(ttl_sec=Config.CALLBACK_PAYLOAD_TTL_SEC)
+
+# Маркер токена хранилища: "<префикс>:~<токен>"
+STORED_PAYLOAD_MARK = "~"
+
+
+class CompactCallback(CallbackData, prefix="cb"):
+    """
+    Базовый класс callback-данных бота.
+    Если упакованная строка длиннее 64 байт или в значениях встречается разделитель —
+    данные уходят в `payload_store`, а в кнопку записывается "<префикс>:~<токен>".
+    """
+
+    def pack(self) -> str:
+        try:
+            return super().pack()
+        except ValueError:
+            token = payload_store.put(self)
+            packed = f"{self.__prefix__}{self.__separator__}{STORED_PAYLOAD_MARK}{token}"
+            if len(packed.encode()) > MAX_CALLBACK_LENGTH:
+                raise
+            return packed
+
+    @classmethod
+    def unpack(cls, value: str):
+        prefix, _, rest = value.partition(cls.__separator__)
+        if prefix == cls.__prefix__ and rest.startswith(STORED_PAYLOAD_MARK):
+            payload = payload_store.get(rest[len(STORED_PAYLOAD_MARK):])
+            if not isinstance(payload, cls):
+                raise ValueError(f"Данные кнопки {value!r} устарели или не найдены")
+            return payload
+        token = _unpacking.set(True)
+        try:
+            return super().unpack(value)
+        finally:
+            _unpacking.reset(token)
+
+
+def is_stored_payload(data: Optional[str]) -> bool:
+    """Проверяет, что callback_data ссылается на хранилище (используется для ответа на устаревшие кнопки)."""
+    if not data:
+        return False
+    _, sep, rest = data.partition(":")
+    return bool(sep) and rest.startswith(STORED_PAYLOAD_MARK)
+
+
+# ==============================
+# КЛИЕНТ
+# ==============================
+class AcceptWorkCb(CompactCallback, prefix="aw"):
+    """Принять выполненную работу: accept_work."""
+    order_id: Int36
+    master_tg_id: Int36
+
+
+class QuickMessCb(CompactCallback, prefix="qm"):
+    """Быстрое сообщение мастеру по шаблону (action — ключ QUICK_MESSAGE_TEMPLATES)."""
+    action: str
+    tg_id: Int36
+
+
+class SendAnswerCb(CompactCallback, prefix="sa"):
+    """Написать сообщение мастеру."""
+    tg_id: Int36
+
+
+class AnswerAppCb(CompactCallback, prefix="aa"):
+    """Ответ текстом на напоминание о записи."""
+    tg_id: Int36
+
+
+class SendRepairReqCb(CompactCallback, prefix="rr"):
+    """Отправить мастеру заявку на ремонт."""
+    tg_id: Int36
+
+
+# ==============================
+# АДМИН
+# ==============================
+class AdminUserActionCb(CompactCallback, prefix="au"):
+    """Действие администратора над пользователем: appoint_employ / unlock / block."""
+    action: str
+    uid: Int36
+
+
+class BulkUserActionCb(CompactCallback, prefix="bu"):
+    """Массовое действие администратора над выбранными UID (список — в FSM): block / unblock / promote / demote."""
+    action: str
+
+
+class AdminSearchCb(CompactCallback, prefix="as"):
+    """
+    Результаты поиска пользователей: page — следующая страница (после UID after),
+    bulk — массовое действие над всеми найденными. Длинный запрос уходит в хранилище.
+    """
+    action: str
+    query: str
+    after: Int36 = 0
+
+
+class AdminUserCardCb(CompactCallback, prefix="uc"):
+    """Открыть карточку пользователя из результатов поиска."""
+    uid: Int36
+
+
+class ManageMasterCb(CompactCallback, prefix="mm"):
+    """Открыть профиль мастера."""
+    tg_id: Int36
+
+
+class MasterActionCb(CompactCallback, prefix="ma"):
+    """Действие над мастером: edit_status / edit_rating / delete."""
+    action: str
+    tg_id: Int36
+
+
+class ConfirmDeleteMasterCb(CompactCallback, prefix="dm"):
+    """Подтверждение удаления мастера."""
+    tg_id: Int36
+
+
+# ==============================
+# МАСТЕР
+# ==============================
+class SendMessCb(CompactCallback, prefix="sm"):
+    """Написать сообщение клиенту."""
+    tg_id: Int36
+
+
+class RemindMessCb(CompactCallback, prefix="rm"):
+    """Напомнить клиенту о записи."""
+    appointment_id: Int36
+    tg_id: Int36
+
+
+class TransferAppCb(CompactCallback, prefix="ta"):
+    """Перенести запись клиента."""
+    tg_id: Int36
+
+
+class DelAppCb(CompactCallback, prefix="da"):
+    """Удалить запись."""
+    appointment_id: Int36
+
+
+class OrderActionCb(CompactCallback, prefix="oa"):
+    """
+    Действие мастера над заказом.
+    action: complied / wait / km / desc / close / transfer / delete / resume.
+    tg_id — Telegram ID клиента (нужен только для complied).
+    """
+    action: str
+    order_id: Int36
+    tg_id: Optional[Int36] = None
+
+
+class WorkHistoryCb(CompactCallback, prefix="wh"):
+    """
+    Следующая страница «Истории работ» мастера: ключ (date, id) последнего показанного заказа.
+    before_us — дата в микросекундах от 1970-01-01 (без часового пояса, как в БД).
+    """
+    before_us: Int36
+    before_id: Int36
+
+
+class SelectMasterCb(CompactCallback, prefix="sl"):
+    """Выбор мастера-получателя при передаче заказа."""
+    tg_id: Int36
+
+
+class ClientActionCb(CompactCallback, prefix="ca"):
+    """
+    Действие мастера по заявке клиента.
+    action: await / refuse / call / check_time / set_time / today / next_days / create_order.
+    """
+    action: str
+    user_id: Int36
+
+
+class RepairTypeCb(CompactCallback, prefix="rt"):
+    """Тип работ для нового заказа: diagnostic / repair / diag_repair / to / custom."""
+    kind: str
+    user_id: Int36
+
+
+class CalendarNavCb(CompactCallback, prefix="cn"):
+    """Переход календаря на другой месяц."""
+    year: int
+    month: int
+    user_id: Int36
+
+
+class CalendarDayCb(CompactCallback, prefix="cd"):
+    """Выбор дня в календаре."""
+    year: int
+    month: int
+    day: int
+    user_id: Int36
+
+
+class AppointHourCb(CompactCallback, prefix="ah"):
+    """Выбор часа начала приёма."""
+    hour: int
+    user_id: Int36
+
+
+class DurationCb(CompactCallback, prefix="du"):
+    """Выбор длительности приёма (в часах)."""
+    hours: float
+    user_id: Int36
+
+
+class SelectOrderCb(CompactCallback, prefix="so"):
+    """
+    Выбор заказа для ручного ввода DTC.
+    Марка/модель/год — свободный текст, поэтому длинные значения уходят в хранилище.
+    """
+    order_id: Int36
+    brand_auto: str
+    model_auto: str
+    year_auto: str
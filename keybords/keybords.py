@@ -1,13 +1,76 @@
 # This Python file uses the following encoding: utf-8
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from typing import List, Dict
-from datetime import date, datetime
+from datetime import date
+from functools import lru_cache, wraps
 from config import Config
+from keybords.callbacks import (
+    AcceptWorkCb, QuickMessCb, SendAnswerCb, AnswerAppCb, SendRepairReqCb,
+    AdminUserActionCb, BulkUserActionCb, AdminSearchCb, AdminUserCardCb, ManageMasterCb, MasterActionCb, ConfirmDeleteMasterCb,
+    SendMessCb, RemindMessCb, TransferAppCb, DelAppCb, OrderActionCb, SelectMasterCb, WorkHistoryCb,
+    ClientActionCb, RepairTypeCb, CalendarNavCb, CalendarDayCb, AppointHourCb, DurationCb, SelectOrderCb,
+)
+
+
+# ==============================
+# КЭШИРОВАНИЕ КЛАВИАТУР
+# ==============================
+def _prebuilt(builder):
+    """
+    Статическая клавиатура: собирается один раз при импорте модуля,
+    все последующие вызовы возвращают один и тот же экземпляр.
+    Модели aiogram изменяемы (frozen=False, inline_keyboard — список списков), поэтому
+    полученную клавиатуру нельзя менять на месте: изменение попадёт во все следующие ответы.
+    Нужен вариант клавиатуры — `.model_copy(deep=True)` или отдельный сборщик.
+    Исходный сборщик доступен как `.uncached` (для бенчмарков).
+    """
+    markup = builder()
+
+    @wraps(builder)
+    def wrapper():
+        return markup
+
+    wrapper.uncached = builder
+    return wrapper
+
+
+def _cached_keyboard(builder):
+    """
+    Параметризованная клавиатура: результат кэшируется в LRU по аргументам.
+    Список `index` приводится к кортежу, чтобы его можно было использовать как ключ.
+    Клавиатура из кэша — общий экземпляр, как у `_prebuilt`: менять её на месте нельзя.
+    Исходный сборщик доступен как `.uncached` (для бенчмарков).
+    """
+    cached = lru_cache(maxsize=Config.KEYBOARD_CACHE_SIZE)(builder)
+
+    @wraps(builder)
+    def wrapper(index, *args, **kwargs):
+        return cached(tuple(index), *args, **kwargs)
+
+    wrapper.uncached = builder
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+def _indexed_menu(buttons_dict: dict, index) -> InlineKeyboardMarkup:
+    """
+    Собирает клавиатуру (по кнопке в строке) из таблицы {индекс: (текст, callback_data)}.
+    callback_data может быть функцией: она вызывается только для выбранных кнопок,
+    поэтому невыбранные кнопки с незаданными параметрами (None) не упаковываются.
+    """
+    inline_buttons = []
+    for idx in index:
+        if idx in buttons_dict:
+            text, data = buttons_dict[idx]
+            inline_buttons.append([InlineKeyboardButton(text=text, callback_data=data() if callable(data) else data)])
+    return InlineKeyboardMarkup(inline_keyboard=inline_buttons)
 
 
 # ==============================
 # АВТОРИЗАЦИЯ РЕГИСТРАЦИЯ
 # ==============================
+@_prebuilt
 def auth_menu():
     kb_list = [
         [InlineKeyboardButton(text='🔆 Регистрация 🔆', callback_data='registration')]
@@ -15,6 +78,7 @@ def auth_menu():
     return InlineKeyboardMarkup(inline_keyboard=kb_list)
 
 
+@_prebuilt
 def check_data():
     kb_list = [
         [InlineKeyboardButton(text="✅СОЗДАТЬ УЧЁТНУЮ ЗАПИСЬ", callback_data='correct')],
@@ -29,6 +93,7 @@ def check_data():
 
 
 # КЛИЕНТ. ГЛАВНОЕ МЕНЮ
+@_prebuilt
 def user_main_menu():
     kb_list = [
         [InlineKeyboardButton(text="🔹 ЛИЧНЫЙ КАБИНЕТ 🔹", callback_data='account')],
@@ -41,6 +106,7 @@ def user_main_menu():
 
 
 # КЛИЕНТ. ЛИЧНЫЙ КАБИНЕТ
+@_prebuilt
 def user_personal_account():
     kb_list = [
         [InlineKeyboardButton(text="🔹 ТЕКУЩИЙ РЕМОНТ 🔹", callback_data='info_rem')],
@@ -55,6 +121,7 @@ def user_personal_account():
 
 
 # КЛИЕНТ. ВОЗВРАЩАЕТСЯ В ЛИЧНЫЙ КАБ ИЗ ТЕКУЩИХ ЗАКАЗОВ
+@_prebuilt
 def user_back_personal_account() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="back_to_account")]
@@ -62,6 +129,7 @@ def user_back_personal_account() -> InlineKeyboardMarkup:
 
 
 # КЛИЕНТ. ВОЗВРАЩАЕТСЯ В ЛИЧНЫЙ КАБ ИЗ ЗАДАТЬ ВОПРОС
+@_prebuilt
 def user_return_to_profile():
     kb_list = [
         [InlineKeyboardButton(text="🔺 Отмена 🔺", callback_data='back_personal_account')]
@@ -70,6 +138,7 @@ def user_return_to_profile():
 
 
 # КЛИЕНТ. ЗАПИСАТЬСЯ НА ДИАГНОСТИКА/РЕМОНТ/ТО
+@_prebuilt
 def user_reg_repairs():
     kb_list = [
         [InlineKeyboardButton(text="🔹 ДИАГНОСТИКА 🔹", callback_data='service:diagnostics')],
@@ -82,6 +151,7 @@ def user_reg_repairs():
 
 
 # КЛИЕНТ. ИЗМЕНИТЬ ЛИЧНЫЕ ДАННЫЕ
+@_prebuilt
 def user_edit_profile():
     kb_list = [
         [InlineKeyboardButton(text="🔹 ИЗМЕНИТЬ ДАННЫЕ 🔹", callback_data='edit_menu')],
@@ -92,28 +162,29 @@ def user_edit_profile():
 
 
 # КЛИЕНТ. ПРИНЯТЬ РАБОТУ
+@_cached_keyboard
 def get_accept_work_keyboard(index: list, order_id: int = None, master_tg_id: int = None) -> InlineKeyboardMarkup:
     """
     Передаёт и ID заказа, и tg_id мастера.
     """
     buttons_dict = {
-        1: InlineKeyboardButton(text="✅ Принять работу", callback_data=f"accept_work:{order_id}:{master_tg_id}"),
-        2: InlineKeyboardButton(text="🕦 Когда будет готово?", callback_data=f"quick_mess:question_time:{master_tg_id}"),
-        3: InlineKeyboardButton(text="💰 Какая цена?", callback_data=f"quick_mess:question_price:{master_tg_id}"),
-        4: InlineKeyboardButton(text="💬 Написать свой вопрос", callback_data=f"send_answer:{master_tg_id}"),
-        5: InlineKeyboardButton(text="🔺 Cкрыть 🔺", callback_data="cancel"),
-        6: InlineKeyboardButton(text="✅ ПРИЕДУ ВОВРЕМЯ", callback_data=f"quick_mess:app_ok:{master_tg_id}"),
-        7: InlineKeyboardButton(text="❌ НЕ СМОГУ ПРИЕХАТЬ", callback_data=f"quick_mess:app_no:{master_tg_id}"),
-        8: InlineKeyboardButton(text="🔄 ХОЧУ ПЕРЕНЕСТИ ЗАПИСЬ", callback_data=f"quick_mess:app_trans:{master_tg_id}"),
-        9: InlineKeyboardButton(text="✏️ ВВЕСТИ ТЕКСТОМ", callback_data=f"answer_app:{master_tg_id}"),
+        1: ("✅ Принять работу", lambda: AcceptWorkCb(order_id=order_id, master_tg_id=master_tg_id).pack()),
+        2: ("🕦 Когда будет готово?", lambda: QuickMessCb(action="question_time", tg_id=master_tg_id).pack()),
+        3: ("💰 Какая цена?", lambda: QuickMessCb(action="question_price", tg_id=master_tg_id).pack()),
+        4: ("💬 Написать свой вопрос", lambda: SendAnswerCb(tg_id=master_tg_id).pack()),
+        5: ("🔺 Cкрыть 🔺", "cancel"),
+        6: ("✅ ПРИЕДУ ВОВРЕМЯ", lambda: QuickMessCb(action="app_ok", tg_id=master_tg_id).pack()),
+        7: ("❌ НЕ СМОГУ ПРИЕХАТЬ", lambda: QuickMessCb(action="app_no", tg_id=master_tg_id).pack()),
+        8: ("🔄 ХОЧУ ПЕРЕНЕСТИ ЗАПИСЬ", lambda: QuickMessCb(action="app_trans", tg_id=master_tg_id).pack()),
+        9: ("✏️ ВВЕСТИ ТЕКСТОМ", lambda: AnswerAppCb(tg_id=master_tg_id).pack()),
 
     }
 
-    inline_buttons = [[buttons_dict[idx]] for idx in index if idx in buttons_dict]
-    return InlineKeyboardMarkup(inline_keyboard=inline_buttons)
+    return _indexed_menu(buttons_dict, index)
 
 
 # КЛИЕНТ.
+@_cached_keyboard
 def common_menu(index: list):
     buttons_dict = {
         5: InlineKeyboardButton(text="🔹 ПРОДОЛЖИТЬ 🔹", callback_data='car_rep_next'),
@@ -135,6 +206,7 @@ def common_menu(index: list):
 
 
 # КЛИЕНТ. КОНТАКТЫ И АДРЕСА
+@_prebuilt
 def location_menu():
     kb_list = [
         [InlineKeyboardButton(
@@ -150,6 +222,7 @@ def location_menu():
 
 
 # КЛИЕНТ. ИНФОРМАЦИЯ
+@_prebuilt
 def user_info_menu():
     kb_list = [
         [InlineKeyboardButton(text='Показать отзывы наших клиентов', callback_data='comment')],
@@ -160,6 +233,7 @@ def user_info_menu():
 
 
 # КЛИЕНТ. ВЫБОР ОЦЕНКИ ДЛЯ МАСТЕРА
+@_prebuilt
 def rating_keyboard():
     """
     Возвращает inline-клавиатуру с кнопками оценки от 1 до 5.
@@ -182,6 +256,7 @@ def rating_keyboard():
 
 
 # АДМИН. ГЛАВНОЕ МЕНЮ
+@_prebuilt
 def admin_menu():
     kb_list_1 = [
         [InlineKeyboardButton(text="🔹 АДМИН-ПАНЕЛЬ 🔹", callback_data='admin_panel')],
@@ -191,45 +266,98 @@ def admin_menu():
     return InlineKeyboardMarkup(inline_keyboard=kb_list_1)
 
 
+@lru_cache(maxsize=Config.KEYBOARD_CACHE_SIZE)
 def admin_user_manage(uid: int) -> InlineKeyboardMarkup:
     kb_list_1 = [
-        [InlineKeyboardButton(text="🔹 НАЗНАЧИТЬ МАСТЕРОМ 🔹", callback_data=f"admin_user_action:appoint_employ:{uid}")],
-        [InlineKeyboardButton(text="🔹 РАЗБЛОКИРОВАТЬ 🔹", callback_data=f"admin_user_action:unlock:{uid}")],
-        [InlineKeyboardButton(text="🔹 ЗАБЛОКИРОВАТЬ 🔹", callback_data=f"admin_user_action:block:{uid}")],
+        [InlineKeyboardButton(text="🔹 НАЗНАЧИТЬ МАСТЕРОМ 🔹", callback_data=AdminUserActionCb(action="appoint_employ", uid=uid).pack())],
+        [InlineKeyboardButton(text="🔹 РАЗБЛОКИРОВАТЬ 🔹", callback_data=AdminUserActionCb(action="unlock", uid=uid).pack())],
+        [InlineKeyboardButton(text="🔹 ЗАБЛОКИРОВАТЬ 🔹", callback_data=AdminUserActionCb(action="block", uid=uid).pack())],
         [InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="admin_panel")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=kb_list_1)
 
 
+@_prebuilt
+def admin_bulk_user_manage() -> InlineKeyboardMarkup:
+    kb_list_1 = [
+        [InlineKeyboardButton(text="🔹 ЗАБЛОКИРОВАТЬ ВСЕХ 🔹", callback_data=BulkUserActionCb(action="block").pack())],
+        [InlineKeyboardButton(text="🔹 РАЗБЛОКИРОВАТЬ ВСЕХ 🔹", callback_data=BulkUserActionCb(action="unblock").pack())],
+        [InlineKeyboardButton(text="🔹 НАЗНАЧИТЬ МАСТЕРАМИ 🔹", callback_data=BulkUserActionCb(action="promote").pack())],
+        [InlineKeyboardButton(text="🔹 СНЯТЬ С МАСТЕРОВ 🔹", callback_data=BulkUserActionCb(action="demote").pack())],
+        [InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="cancel")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=kb_list_1)
+
+
+@_cached_keyboard
 def admin_action_menu(index: list, order_id: int = None, tg_id: int = None) -> InlineKeyboardMarkup:
     buttons_dict = {
-        1: InlineKeyboardButton(text="🔹 УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ 🔹", callback_data="manage_users"),
-        2: InlineKeyboardButton(text="🔹 УПРАВЛЕНИЕ МАСТЕРАМИ 🔹", callback_data='manage_masters'),
-        3: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data='admin_back_main_menu'),
-        4: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data='cancel'),
-        5: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data='admin_panel'),
+        1: ("🔹 УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ 🔹", "manage_users"),
+        2: ("🔹 УПРАВЛЕНИЕ МАСТЕРАМИ 🔹", 'manage_masters'),
+        3: ("🔺 Назад 🔺", 'admin_back_main_menu'),
+        4: ("🔺 Назад 🔺", 'cancel'),
+        5: ("🔺 Назад 🔺", 'admin_panel'),
         # УПРАВЛЕНИЕ МАСТЕРАМИ
-        6: InlineKeyboardButton(text="✏️ Изменить должность", callback_data=f"master_action:edit_status:{tg_id}"),
-        7: InlineKeyboardButton(text="⭐️ Изменить рейтинг", callback_data=f"master_action:edit_rating:{tg_id}"),
-        8: InlineKeyboardButton(text="🗑️ Удалить мастера", callback_data=f"master_action:delete:{tg_id}"),
-        9: InlineKeyboardButton(text="📅 Посмотреть записи", callback_data=f"master_app:{tg_id}"),
-        10: InlineKeyboardButton(text="✅ Активные заказы", callback_data=f"master_order_active:{tg_id}"),
-        13: InlineKeyboardButton(text="🚫 Закрытые заказы", callback_data=f"master_order_close:{tg_id}"),
-        11: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="manage_masters"),
+        6: ("✏️ Изменить должность", lambda: MasterActionCb(action="edit_status", tg_id=tg_id).pack()),
+        7: ("⭐️ Изменить рейтинг", lambda: MasterActionCb(action="edit_rating", tg_id=tg_id).pack()),
+        8: ("🗑️ Удалить мастера", lambda: MasterActionCb(action="delete", tg_id=tg_id).pack()),
+        9: ("📅 Посмотреть записи", f"master_app:{tg_id}"),
+        10: ("✅ Активные заказы", f"master_order_active:{tg_id}"),
+        13: ("🚫 Закрытые заказы", f"master_order_close:{tg_id}"),
+        11: ("🔺 Назад 🔺", "manage_masters"),
         # ПОДТВЕРЖДЕНИЕ УДАЛЕНИЯ МАСТЕРА
-        12: InlineKeyboardButton(text="❌ Да, удалить", callback_data=f"confirm_delete_master:{tg_id}"),
+        12: ("❌ Да, удалить", lambda: ConfirmDeleteMasterCb(tg_id=tg_id).pack()),
         # СТАТИСТИКА
-        14: InlineKeyboardButton(text="🔹 Пользователи 🔹", callback_data="stat:users"),
-        15: InlineKeyboardButton(text="🔹 Записи 🔹", callback_data="stat:appointments"),
-        16: InlineKeyboardButton(text="🔹 Заказы 🔹", callback_data="stat:orders"),
-        18: InlineKeyboardButton(text="🔹 Клиенты 🔹", callback_data="stat:clients"),
-        19: InlineKeyboardButton(text="🔹 Мастера 🔹", callback_data="stat:masters"),
+        14: ("🔹 Пользователи 🔹", "stat:users"),
+        15: ("🔹 Записи 🔹", "stat:appointments"),
+        16: ("🔹 Заказы 🔹", "stat:orders"),
+        18: ("🔹 Клиенты 🔹", "stat:clients"),
+        19: ("🔹 Мастера 🔹", "stat:masters"),
+        20: ("🔹 Динамика 🔹", "stat:trends"),
+        21: ("🔹 Неделя 🔹", "trend:week"),
+        22: ("🔹 Месяц 🔹", "trend:month"),
+        23: ("🔹 Год 🔹", "trend:year"),
+        24: ("🔺 Назад 🔺", "admin_stats"),
         # РАССЫЛКА
-        17: InlineKeyboardButton(text="✅ Отправить всем", callback_data="broadcast_confirm"),
+        17: ("✅ Отправить всем", "broadcast_confirm"),
     }
 
-    inline_buttons = [[buttons_dict[idx]] for idx in index if idx in buttons_dict]
-    return InlineKeyboardMarkup(inline_keyboard=inline_buttons)
+    return _indexed_menu(buttons_dict, index)
+
+
+def admin_search_results(users: List[Dict], query: str, has_more: bool, first_page: bool) -> InlineKeyboardMarkup:
+    """
+    Страница результатов поиска пользователей: по кнопке на пользователя (открывает карточку),
+    затем навигация по страницам и массовое действие над всеми найденными.
+
+    :param users: Строки search_users (id, user_name, gos_num, role)
+    :param query: Строка поиска (нужна кнопкам навигации)
+    :param has_more: Есть ли следующая страница
+    :param first_page: Текущая страница — первая (кнопка «В начало» не нужна)
+    """
+    role_marks = {"blocked": " 🚫", "master": " 🔧", "admin": " 👑"}
+    buttons = [
+        [InlineKeyboardButton(
+            text=f"UID {user['id']} · {user['user_name'] or '—'} · {user['gos_num'] or '—'}{role_marks.get(user['role'], '')}",
+            callback_data=AdminUserCardCb(uid=user["id"]).pack()
+        )]
+        for user in users
+    ]
+
+    navigation = []
+    if not first_page:
+        navigation.append(InlineKeyboardButton(
+            text="⏮ В начало", callback_data=AdminSearchCb(action="page", query=query).pack()))
+    if has_more:
+        navigation.append(InlineKeyboardButton(
+            text="Далее ▶", callback_data=AdminSearchCb(action="page", query=query, after=users[-1]["id"]).pack()))
+    if navigation:
+        buttons.append(navigation)
+    if users:
+        buttons.append([InlineKeyboardButton(
+            text="⚙️ Действие со всеми найденными", callback_data=AdminSearchCb(action="bulk", query=query).pack())])
+    buttons.append([InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="admin_panel")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
 def create_masters_management_keyboard(masters: List[Dict[str, str | int]]) -> InlineKeyboardMarkup:
@@ -248,7 +376,7 @@ def create_masters_management_keyboard(masters: List[Dict[str, str | int]]) -> I
         buttons.append([
             InlineKeyboardButton(
                 text=display_name,
-                callback_data=f"manage_master:{master['tg_id']}"
+                callback_data=ManageMasterCb(tg_id=master["tg_id"]).pack()
             )
         ])
 
@@ -265,6 +393,7 @@ def create_masters_management_keyboard(masters: List[Dict[str, str | int]]) -> I
 
 
 # МАСТЕР. ГЛАВНОЕ МЕНЮ
+@_prebuilt
 def master_menu():
     kb_list_2 = [
         [InlineKeyboardButton(text="🔹 ЛИЧНЫЙ КАБИНЕТ МАСТЕРА 🔹", callback_data='master_account')],
@@ -277,6 +406,7 @@ def master_menu():
 
 
 # МАСТЕР. ЛИЧНЫЙ КАБИНЕТ МАСТЕРА
+@_prebuilt
 def master_personal_account():
     kb_list_7 = [
         [InlineKeyboardButton(text="🔹 МОИ ДАННЫЕ 🔹", callback_data='master_login')],
@@ -286,6 +416,7 @@ def master_personal_account():
 
 
 # МАСТЕР. МОИ ДАННЫЕ
+@_prebuilt
 def master_edit_profile():
     kb_list = [
         [InlineKeyboardButton(text="🔹 ИЗМЕНИТЬ ДАННЫЕ 🔹", callback_data='master_edit_menu')],
@@ -296,6 +427,7 @@ def master_edit_profile():
 
 
 # МАСТЕР. ФИЛЬТР ОТОБРАЖЕНИЯ ТЕКУЩИХ ЗАПИСИЕЙ
+@_prebuilt
 def appointment_period_menu() -> InlineKeyboardMarkup:
     kb_list_5 = [
         [InlineKeyboardButton(text="📅 На сегодня", callback_data="appt_period:today")],
@@ -307,18 +439,20 @@ def appointment_period_menu() -> InlineKeyboardMarkup:
 
 
 # МАСТЕР. ФОРМА ТЕКУЩАЯ ЗАПИСЬ
+@lru_cache(maxsize=Config.KEYBOARD_CACHE_SIZE)
 def appointment_action_menu(appointment_id: int, user_tg_id: int) -> InlineKeyboardMarkup:
     kb_list_4 = [
-        [InlineKeyboardButton(text="✉️ НАПИСАТЬ КЛИЕНТУ", callback_data=f"send_mess:{user_tg_id}")],
-        [InlineKeyboardButton(text="🔔 НАПОМНИТЬ О ВСТРЕЧЕ", callback_data=f"remind_mess:{appointment_id}:{user_tg_id}")],
-        [InlineKeyboardButton(text="♻️ ПЕРЕНЕСТИ ВСТРЕЧУ", callback_data=f"transfer_app:{user_tg_id}")],
-        [InlineKeyboardButton(text="🗑 УДАЛИТЬ ЗАПИСЬ", callback_data=f"del_app:{appointment_id}")],
+        [InlineKeyboardButton(text="✉️ НАПИСАТЬ КЛИЕНТУ", callback_data=SendMessCb(tg_id=user_tg_id).pack())],
+        [InlineKeyboardButton(text="🔔 НАПОМНИТЬ О ВСТРЕЧЕ", callback_data=RemindMessCb(appointment_id=appointment_id, tg_id=user_tg_id).pack())],
+        [InlineKeyboardButton(text="♻️ ПЕРЕНЕСТИ ВСТРЕЧУ", callback_data=TransferAppCb(tg_id=user_tg_id).pack())],
+        [InlineKeyboardButton(text="🗑 УДАЛИТЬ ЗАПИСЬ", callback_data=DelAppCb(appointment_id=appointment_id).pack())],
         [InlineKeyboardButton(text="🔺 Назад 🔺", callback_data=f"cancel")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=kb_list_4)
 
 
 # МАСТЕР. КЛАВИАТУРА ПОД ТЕКУЩИМИ ЗАКАЗОМИ
+@_cached_keyboard
 def master_order_action_menu(index: list, order_id: int = None, tg_id: int = None) -> InlineKeyboardMarkup:
     """
     Клавиатура для действий с конкретным заказом.
@@ -329,20 +463,29 @@ def master_order_action_menu(index: list, order_id: int = None, tg_id: int = Non
     :return: InlineKeyboardMarkupg
     """
     buttons_dict = {
-        1: InlineKeyboardButton(text="🏁 ВЫПОЛНЕНО", callback_data=f"comp_odr:{order_id}:{tg_id}"),
-        2: InlineKeyboardButton(text="🕑 СТАТУС WAIT", callback_data=f"ed_st:{order_id}"),
-        9: InlineKeyboardButton(text="⚙️ УКАЗАТЬ ПРОБЕГ", callback_data=f"up_km:{order_id}"),
-        3: InlineKeyboardButton(text="✏️ ИЗМЕНИТЬ ОПИСАНИЕ", callback_data=f"ed_des:{order_id}"),
-        4: InlineKeyboardButton(text="🚫 ЗАКРЫТЬ ЗАКАЗ", callback_data=f"cl_odr:{order_id}"),
-        5: InlineKeyboardButton(text="🤝 ПЕРЕДАТЬ ЗАКАЗ", callback_data=f"tr_odr:{order_id}"),
-        6: InlineKeyboardButton(text="🗑 УДАЛИТЬ ЗАКАЗ", callback_data=f"del_odr:{order_id}"),
-        7: InlineKeyboardButton(text="♻️ ВОЗВРАТ В ТЕКУЩИЙ", callback_data=f"res_odr:{order_id}"),
-        8: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="cancel"),
-        10: InlineKeyboardButton(text="💬 Отправить сообщение", callback_data=f"send_mess:{tg_id}")
+        1: ("🏁 ВЫПОЛНЕНО", lambda: OrderActionCb(action="complied", order_id=order_id, tg_id=tg_id).pack()),
+        2: ("🕑 СТАТУС WAIT", lambda: OrderActionCb(action="wait", order_id=order_id).pack()),
+        9: ("⚙️ УКАЗАТЬ ПРОБЕГ", lambda: OrderActionCb(action="km", order_id=order_id).pack()),
+        3: ("✏️ ИЗМЕНИТЬ ОПИСАНИЕ", lambda: OrderActionCb(action="desc", order_id=order_id).pack()),
+        4: ("🚫 ЗАКРЫТЬ ЗАКАЗ", lambda: OrderActionCb(action="close", order_id=order_id).pack()),
+        5: ("🤝 ПЕРЕДАТЬ ЗАКАЗ", lambda: OrderActionCb(action="transfer", order_id=order_id).pack()),
+        6: ("🗑 УДАЛИТЬ ЗАКАЗ", lambda: OrderActionCb(action="delete", order_id=order_id).pack()),
+        7: ("♻️ ВОЗВРАТ В ТЕКУЩИЙ", lambda: OrderActionCb(action="resume", order_id=order_id).pack()),
+        8: ("🔺 Назад 🔺", "cancel"),
+        10: ("💬 Отправить сообщение", lambda: SendMessCb(tg_id=tg_id).pack())
     }
 
-    inline_buttons = [[buttons_dict[idx]] for idx in index if idx in buttons_dict]
-    return InlineKeyboardMarkup(inline_keyboard=inline_buttons)
+    return _indexed_menu(buttons_dict, index)
+
+
+# МАСТЕР. ИСТОРИЯ РАБОТ
+def work_history_more(before_us: int, before_id: int) -> InlineKeyboardMarkup:
+    """Кнопка следующей страницы «Истории работ» (ключ последнего показанного заказа)."""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text="📜 Показать ещё", callback_data=WorkHistoryCb(before_us=before_us, before_id=before_id).pack()
+        )]
+    ])
 
 
 # МАСТЕР. ПЕРЕДАТЬ ЗАКАЗ ДРУГОМУ МАСТЕРУ
@@ -358,7 +501,7 @@ def transfer_master_keyboard(masters: List[Dict[str, str | int]]) -> InlineKeybo
     for master in masters:
         btn = InlineKeyboardButton(
             text=str(master["user_name"]),
-            callback_data=f"select_master:{master['tg_id']}"
+            callback_data=SelectMasterCb(tg_id=master["tg_id"]).pack()
         )
         buttons.append([btn])
 
@@ -369,6 +512,7 @@ def transfer_master_keyboard(masters: List[Dict[str, str | int]]) -> InlineKeybo
 
 
 # МАСТЕР. ВЫПОЛНЕНО
+@_prebuilt
 def quick_action_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✅ МОЖЕТЕ ЗАБИРАТЬ", callback_data="quick:answer")],
@@ -377,6 +521,7 @@ def quick_action_menu() -> InlineKeyboardMarkup:
 
 
 # МАСТЕР (ГЕНЕРАТОР КНОПОК)
+@_cached_keyboard
 def staff_menu(index: list):
     buttons_dict = {
         1: InlineKeyboardButton(text="🔹 ИМЯ 🔹", callback_data='master_edit:user_name'),
@@ -401,50 +546,60 @@ def staff_menu(index: list):
 
 
 # МАСТЕР. USER_ID (ГЕНЕРАТОР КНОПОК)
+@_cached_keyboard
 def master_menu_app(index: list, user_id: int):
     buttons_dict = {
-        1: InlineKeyboardButton(text="🔹 ОЖИДАНИЕ 🔹", callback_data=f'await:{user_id}'),
-        2: InlineKeyboardButton(text="🔹 ОТКАЗ 🔹", callback_data=f'refuse:{user_id}'),
-        3: InlineKeyboardButton(text="🔹 ЗВОНИТЕ 🔹", callback_data=f'call:{user_id}'),
-        4: InlineKeyboardButton(text="💬 ОТВЕТИТЬ ТЕКСТОМ", callback_data=f'send_mess:{user_id}'),  # staff
-        5: InlineKeyboardButton(text="📆 НАЗНАЧИТЬ ВРЕМЯ", callback_data=f'set_time:{user_id}'),
-        6: InlineKeyboardButton(text="🔹 НА СЕГОДНЯ 🔹", callback_data=f'today:{user_id}'),
-        7: InlineKeyboardButton(text="🔹 ВЫБРАТЬ ДЕНЬ 🔹", callback_data=f'next_days:{user_id}'),
-        8: InlineKeyboardButton(text="🔺 Cкрыть 🔺", callback_data="cancel"),
-        9: InlineKeyboardButton(text="🔹 УДОБНОЕ ВРЕМЯ? 🔹", callback_data=f'check_time:{user_id}'),
-        10: InlineKeyboardButton(text="🔹 ДИАГНОСТИКА 🔹", callback_data=f"repair_type:diagnostic:{user_id}"),
-        11: InlineKeyboardButton(text="🔹 РЕМОНТ 🔹", callback_data=f"repair_type:repair:{user_id}"),
-        12: InlineKeyboardButton(text="🔹 ДИАГНОСТИКА И РЕМОНТ 🔹", callback_data=f"repair_type:diag_repair:{user_id}"),
-        13: InlineKeyboardButton(text="🔹 ТЕХ. ОБСЛУЖИВАНИЕ 🔹", callback_data=f"repair_type:to:{user_id}"),
-        14: InlineKeyboardButton(text="🔹 ВВЕСТИ ТЕКСТОМ 🔹", callback_data=f"repair_type:custom:{user_id}"),
-        15: InlineKeyboardButton(text="✅ Создать заявку на ремонт", callback_data=f"create_order:{user_id}"),
-        16: InlineKeyboardButton(text="🔸 ЗАЯВКА НА РЕМОНТ 🔸", callback_data=f"send_repair_req:{user_id}"),
-        17: InlineKeyboardButton(text="🔹 Ответить 🔹", callback_data=f"send_answer:{user_id}"),
-        18: InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="back_personal_account"),
-        19: InlineKeyboardButton(text="🔺 Закрыть 🔺", callback_data="cancel"),
-        21: InlineKeyboardButton(text="♻️ ПЕРЕНЕСТИ ЗАПИСЬ", callback_data=f"quick_mess:app_trans:{user_id}"),
-        22: InlineKeyboardButton(text="💬 НАПИСАТЬ МАСТЕРУ", callback_data=f"send_answer:{user_id}"),
+        1: ("🔹 ОЖИДАНИЕ 🔹", lambda: ClientActionCb(action="await", user_id=user_id).pack()),
+        2: ("🔹 ОТКАЗ 🔹", lambda: ClientActionCb(action="refuse", user_id=user_id).pack()),
+        3: ("🔹 ЗВОНИТЕ 🔹", lambda: ClientActionCb(action="call", user_id=user_id).pack()),
+        4: ("💬 ОТВЕТИТЬ ТЕКСТОМ", lambda: SendMessCb(tg_id=user_id).pack()),  # staff
+        5: ("📆 НАЗНАЧИТЬ ВРЕМЯ", lambda: ClientActionCb(action="set_time", user_id=user_id).pack()),
+        6: ("🔹 НА СЕГОДНЯ 🔹", lambda: ClientActionCb(action="today", user_id=user_id).pack()),
+        7: ("🔹 ВЫБРАТЬ ДЕНЬ 🔹", lambda: ClientActionCb(action="next_days", user_id=user_id).pack()),
+        8: ("🔺 Cкрыть 🔺", "cancel"),
+        9: ("🔹 УДОБНОЕ ВРЕМЯ? 🔹", lambda: ClientActionCb(action="check_time", user_id=user_id).pack()),
+        10: ("🔹 ДИАГНОСТИКА 🔹", lambda: RepairTypeCb(kind="diagnostic", user_id=user_id).pack()),
+        11: ("🔹 РЕМОНТ 🔹", lambda: RepairTypeCb(kind="repair", user_id=user_id).pack()),
+        12: ("🔹 ДИАГНОСТИКА И РЕМОНТ 🔹", lambda: RepairTypeCb(kind="diag_repair", user_id=user_id).pack()),
+        13: ("🔹 ТЕХ. ОБСЛУЖИВАНИЕ 🔹", lambda: RepairTypeCb(kind="to", user_id=user_id).pack()),
+        14: ("🔹 ВВЕСТИ ТЕКСТОМ 🔹", lambda: RepairTypeCb(kind="custom", user_id=user_id).pack()),
+        15: ("✅ Создать заявку на ремонт", lambda: ClientActionCb(action="create_order", user_id=user_id).pack()),
+        16: ("🔸 ЗАЯВКА НА РЕМОНТ 🔸", lambda: SendRepairReqCb(tg_id=user_id).pack()),
+        17: ("🔹 Ответить 🔹", lambda: SendAnswerCb(tg_id=user_id).pack()),
+        18: ("🔺 Назад 🔺", "back_personal_account"),
+        19: ("🔺 Закрыть 🔺", "cancel"),
+        21: ("♻️ ПЕРЕНЕСТИ ЗАПИСЬ", lambda: QuickMessCb(action="app_trans", tg_id=user_id).pack()),
+        22: ("💬 НАПИСАТЬ МАСТЕРУ", lambda: SendAnswerCb(tg_id=user_id).pack()),
     }
 
-    inline_buttons = [[buttons_dict[idx]] for idx in index if idx in buttons_dict]
-    return InlineKeyboardMarkup(inline_keyboard=inline_buttons)
+    return _indexed_menu(buttons_dict, index)
 
 
 # МАСТЕР. КЛАВИАТУРЫ ДАТЫ И ВРЕМЕНИ
-def generate_calendar_buttons(user_id: int, year: int, month: int, busy_days: set = None):
+CALENDAR_MONTH_NAMES = (
+    "", "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
+    "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
+)
+
+# Общие для всех календарей неактивные кнопки. Модели aiogram изменяемы, и один и тот же объект
+# кнопки стоит во всех клавиатурах календаря (строки — новые списки, кнопки — нет): менять их нельзя
+_CALENDAR_EMPTY_BUTTON = InlineKeyboardButton(text="✖️", callback_data="ignore")
+_CALENDAR_BUSY_BUTTON = InlineKeyboardButton(text="🔴", callback_data="ignore")
+_CALENDAR_WEEKDAY_ROW = tuple(
+    InlineKeyboardButton(text=day, callback_data="ignore")
+    for day in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+)
+_CALENDAR_BACK_ROW = (InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="cancel"),)
+
+
+@lru_cache(maxsize=64)
+def _calendar_skeleton(year: int, month: int) -> tuple:
     """
-    Генерирует календарь для указанного года и месяца.
+    Неизменяемый каркас месяца, не зависящий от пользователя и текущей даты.
 
-    :param user_id: ID пользователя
-    :param year: год (например, 2025)
-    :param month: месяц (1–12)
-    :param busy_days: множество дней без свободного времени
+    :return: (prev_year, prev_month, next_year, next_month, header_button, weeks),
+             где weeks — кортеж недель по 7 ячеек: номер дня или 0 для пустой ячейки.
     """
-    if busy_days is None:
-        busy_days = set()
-
-    today = date.today()
-
     # Определяем следующий и предыдущий месяц
     if month == 12:
         next_month, next_year = 1, year + 1
@@ -456,71 +611,87 @@ def generate_calendar_buttons(user_id: int, year: int, month: int, busy_days: se
     else:
         prev_month, prev_year = month - 1, year
 
-    # Заголовок: "Июнь 2025"
-    month_names = [
-        "", "Янв", "Фев", "Мар", "Апр", "Май", "Июн",
-        "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"
-    ]
-    header_text = f"{month_names[month]} {year}"
-
-    # Кнопки навигации
-    prev_button = InlineKeyboardButton(
-        text="◄",
-        callback_data=f"calendar_nav:{prev_year}:{prev_month}:{user_id}"
-    )
+    # Заголовок: "Июн 2025"
     header_button = InlineKeyboardButton(
-        text=header_text,
+        text=f"{CALENDAR_MONTH_NAMES[month]} {year}",
         callback_data="ignore"
     )
-    next_button = InlineKeyboardButton(
-        text="►",
-        callback_data=f"calendar_nav:{next_year}:{next_month}:{user_id}"
-    )
 
-    rows = [[prev_button, header_button, next_button]]
+    first_day_of_month = date(year, month, 1)
+    days_in_month = (date(next_year, next_month, 1) - first_day_of_month).days
+    first_weekday = first_day_of_month.weekday()  # 0 = понедельник
 
-    # Дни недели
-    weekday_headers = [
-        InlineKeyboardButton(text=day, callback_data="ignore")
-        for day in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-    ]
-    rows.append(weekday_headers)
+    # Пустые ячейки в начале и в конце последней недели
+    cells = [0] * first_weekday + list(range(1, days_in_month + 1))
+    cells += [0] * (-len(cells) % 7)
+    weeks = tuple(tuple(cells[i:i + 7]) for i in range(0, len(cells), 7))
 
-    # Генерация дней
-    first_day_of_month = datetime(year, month, 1)
-    first_day_next_month = datetime(next_year, next_month, 1)
-    days_in_month = (first_day_next_month - first_day_of_month).days
+    return prev_year, prev_month, next_year, next_month, header_button, weeks
 
-    first_weekday = first_day_of_month.weekday()  # 0 = понедельник
-    current_row = []
 
-    # Пустые ячейки в начале
-    for _ in range(first_weekday):
-        current_row.append(InlineKeyboardButton(text="✖️", callback_data="ignore"))
-
-    for day in range(1, days_in_month + 1):
-        current_date = date(year, month, day)
-
-        if current_date < today:
-            btn = InlineKeyboardButton(text="✖️", callback_data="ignore")
-        elif day in busy_days:
-            btn = InlineKeyboardButton(text="🔴", callback_data="ignore")
-        else:
-            btn = InlineKeyboardButton(
-                text=str(day),
-                callback_data=f"calendar_day:{year}:{month}:{day}:{user_id}"
-            )
+@lru_cache(maxsize=Config.KEYBOARD_CACHE_SIZE)
+def _calendar_user_buttons(user_id: int, year: int, month: int) -> tuple:
+    """
+    Кнопки месяца, зависящие от user_id: навигация и активные дни.
+    Собираются один раз на (user_id, год, месяц) и переиспользуются при навигации.
 
-        current_row.append(btn)
+    :return: (навигационная строка, {день: кнопка})
+    """
+    prev_year, prev_month, next_year, next_month, header_button, weeks = _calendar_skeleton(year, month)
 
-        if (first_weekday + day) % 7 == 0 or day == days_in_month:
-            while len(current_row) < 7:
-                current_row.append(InlineKeyboardButton(text="✖️", callback_data="ignore"))
-            rows.append(current_row)
-            current_row = []
+    nav_row = (
+        InlineKeyboardButton(text="◄", callback_data=CalendarNavCb(year=prev_year, month=prev_month, user_id=user_id).pack()),
+        header_button,
+        InlineKeyboardButton(text="►", callback_data=CalendarNavCb(year=next_year, month=next_month, user_id=user_id).pack()),
+    )
+    day_buttons = {
+        day: InlineKeyboardButton(text=str(day), callback_data=CalendarDayCb(year=year, month=month, day=day, user_id=user_id).pack())
+        for week in weeks for day in week if day
+    }
+    return nav_row, day_buttons
+
+
+def generate_calendar_buttons(user_id: int, year: int, month: int, busy_days: set = None):
+    """
+    Генерирует календарь для указанного года и месяца.
+
+    Каркас месяца и кнопки пользователя берутся из кэша, здесь накладываются только
+    прошедшие и занятые дни — поэтому повторная отрисовка при навигации дешёвая.
+
+    :param user_id: ID пользователя
+    :param year: год (например, 2025)
+    :param month: месяц (1–12)
+    :param busy_days: множество дней без свободного времени
+    """
+    if busy_days is None:
+        busy_days = set()
+
+    weeks = _calendar_skeleton(year, month)[5]
+    nav_row, day_buttons = _calendar_user_buttons(user_id, year, month)
+
+    # Дни до этого номера включительно — в прошлом (одно сравнение дат на весь месяц)
+    today = date.today()
+    if (year, month) < (today.year, today.month):
+        past_until = 31
+    elif (year, month) == (today.year, today.month):
+        past_until = today.day - 1
+    else:
+        past_until = 0
+
+    rows = [list(nav_row), list(_CALENDAR_WEEKDAY_ROW)]
+    for week in weeks:
+        row = []
+        for day in week:
+            if not day or day <= past_until:
+                row.append(_CALENDAR_EMPTY_BUTTON)
+            elif day in busy_days:
+                row.append(_CALENDAR_BUSY_BUTTON)
+            else:
+                row.append(day_buttons[day])
+        rows.append(row)
 
     # Кнопка "Назад"
-    rows.append([InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="cancel")])
+    rows.append(list(_CALENDAR_BACK_ROW))
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -541,7 +712,7 @@ def generate_time_buttons(hours_set: set, user_id: int):
         # В callback_data добавляем час и user_id
         button = InlineKeyboardButton(
             text=label,
-            callback_data=f"appoint:{hour}:{user_id}"
+            callback_data=AppointHourCb(hour=hour, user_id=user_id).pack()
         )
         current_row.append(button)
 
@@ -557,6 +728,7 @@ def generate_time_buttons(hours_set: set, user_id: int):
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=Config.KEYBOARD_CACHE_SIZE)
 def generate_duration_buttons(user_id: int):
     """
     Клавиатура выбора длительности приёма.
@@ -575,7 +747,7 @@ def generate_duration_buttons(user_id: int):
     for label, value in durations:
         button = InlineKeyboardButton(
             text=label,
-            callback_data=f"duration:{value}:{user_id}"
+            callback_data=DurationCb(hours=value, user_id=user_id).pack()
         )
         rows.append([button])
 
@@ -587,7 +759,7 @@ def generate_order_select_buttons(orders: list[dict]) -> InlineKeyboardMarkup:
     """
     Генерирует кнопки выбора активного заказа.
     Каждая кнопка: "Марка Модель Год"
-    Callback: select_order:<order_id>:<brand>:<model>:<year>
+    Callback: SelectOrderCb (длинные марка/модель уходят в серверное хранилище)
     """
     buttons = []
     for order in orders:
@@ -595,7 +767,9 @@ def generate_order_select_buttons(orders: list[dict]) -> InlineKeyboardMarkup:
         model = order.get("model_auto", "-") or "-"
         year = order.get("year_auto", "-") or "-"
         text = f"{brand} {model} ({year})"
-        callback = f"select_order:{order['id']}:{brand}:{model}:{year}"
+        callback = SelectOrderCb(
+            order_id=order["id"], brand_auto=str(brand), model_auto=str(model), year_auto=str(year)
+        ).pack()
         buttons.append([InlineKeyboardButton(text=text, callback_data=callback)])
     buttons.append([InlineKeyboardButton(text="🔺 Назад 🔺", callback_data="cancel")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
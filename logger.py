@@ -1,18 +1,31 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from config import LoggingConfig
+from utils.metrics import current_update_stats
 
 
-def setup_logging():
+def setup_logging() -> QueueListener:
     """Настраивает три лог-файла: bot.log, database.log, api.log.
     Все уровни (включая ERROR/CRITICAL) пишутся в соответствующий файл.
+
+    Файловые обработчики принадлежат потоку QueueListener: логгеры в цикле событий только
+    кладут запись в очередь, поэтому запись на диск и ротация файлов не блокируют бота.
+    Записи database и api попадают в свой файл и, как и раньше, дублируются в bot.log.
     """
     LoggingConfig.ensure_log_dir()
 
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if LoggingConfig.LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
 
     # Основной логгер
     root_logger = logging.getLogger()
@@ -26,9 +39,8 @@ def setup_logging():
     )
     bot_handler.setFormatter(formatter)
     bot_handler.setLevel(logging.DEBUG)
-    root_logger.addHandler(bot_handler)
 
-    # Логгер для database
+    # Обработчик для логгера database
     db_handler = RotatingFileHandler(
         LoggingConfig.LOG_DIR / LoggingConfig.DB_LOG_FILE,
         maxBytes=5_000_000,
@@ -37,10 +49,9 @@ def setup_logging():
     )
     db_handler.setFormatter(formatter)
     db_handler.setLevel(logging.DEBUG)
-    db_logger = logging.getLogger("database")
-    db_logger.addHandler(db_handler)
+    db_handler.addFilter(logging.Filter("database"))
 
-    # Логгер для api
+    # Обработчик для логгера api
     api_handler = RotatingFileHandler(
         LoggingConfig.LOG_DIR / LoggingConfig.API_LOG_FILE,
         maxBytes=5_000_000,
@@ -49,5 +60,116 @@ def setup_logging():
     )
     api_handler.setFormatter(formatter)
     api_handler.setLevel(logging.DEBUG)
-    api_logger = logging.getLogger("api")
-    api_logger.addHandler(api_handler)
+    api_handler.addFilter(logging.Filter("api"))
+
+    # Единственный обработчик в цикле событий — неблокирующая очередь
+    log_queue = queue.SimpleQueue()
+    queue_handler = _ExcTextQueueHandler(log_queue)
+    queue_handler.addFilter(UpdateContextFilter())
+    if LoggingConfig.WARNING_RATE_PER_SEC > 0:
+        queue_handler.addFilter(WarningRateLimitFilter(
+            burst=LoggingConfig.WARNING_BURST,
+            rate_per_sec=LoggingConfig.WARNING_RATE_PER_SEC,
+            sample_every=LoggingConfig.WARNING_SAMPLE_EVERY,
+        ))
+    root_logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, bot_handler, db_handler, api_handler, respect_handler_level=True)
+    listener.start()
+    # Дописываем очередь в файлы при завершении процесса
+    atexit.register(listener.stop)
+    return listener
+
+
+class _ExcTextQueueHandler(QueueHandler):
+    """
+    QueueHandler, сохраняющий трассировку исключения отдельно от текста сообщения:
+    так её одинаково выводят и текстовый, и JSON-форматтер в потоке слушателя.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class UpdateContextFilter(logging.Filter):
+    """
+    Добавляет к записи контекст текущего апдейта (update_id, user_id, handler).
+    Выполняется в потоке, где вызван логгер, — пока ContextVar ещё доступен.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stats = current_update_stats.get()
+        record.update_id = stats.update_id if stats else None
+        record.user_id = stats.user_id if stats else None
+        record.handler = stats.handler if stats else None
+        return True
+
+
+class WarningRateLimitFilter(logging.Filter):
+    """
+    Ограничивает частоту WARNING с одного места вызова (файл + строка) «ведром токенов».
+    Сообщения сверх лимита отбрасываются, кроме каждого `sample_every`-го;
+    число подавленных дописывается к следующему пропущенному сообщению этого места.
+    ERROR и выше не ограничиваются.
+    """
+
+    def __init__(self, burst: int, rate_per_sec: float, sample_every: int = 0):
+        super().__init__()
+        self.burst = burst
+        self.rate_per_sec = rate_per_sec
+        self.sample_every = sample_every
+        # (путь, строка) -> [токены, время последнего пополнения, подавлено, сверх лимита]
+        self._sites = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None:
+            site = self._sites[(record.pathname, record.lineno)] = [float(self.burst), now, 0, 0]
+        site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate_per_sec)
+        site[1] = now
+
+        if site[0] >= 1:
+            site[0] -= 1
+        else:
+            site[3] += 1
+            if not self.sample_every or site[3] % self.sample_every:
+                site[2] += 1
+                return False
+
+        if site[2]:
+            record.msg = f"{record.getMessage()} (подавлено похожих сообщений: {site[2]})"
+            record.args = None
+            site[2] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, место вызова, сообщение и контекст апдейта."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": f"{record.funcName}:{record.lineno}",
+            "message": record.getMessage(),
+            "update_id": getattr(record, "update_id", None),
+            "user_id": getattr(record, "user_id", None),
+            "handler": getattr(record, "handler", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
@@ -1,38 +1,113 @@
+from utils.startup import startup_profiler
+
 import asyncio
 import logging
-from aiogram import Dispatcher
-from bot import bot
-from database.engine import init_db
-from services.init_admin import init_admin_user
-from handlers.common_handlers import router as common_router
-from handlers.staff_handlers import router as staff_router
-from middlewares.block_middleware import BlockUserMiddleware
-from logger import setup_logging
+
+with startup_profiler.phase("import: aiogram, bot, config"):
+    from aiogram import Dispatcher
+    from bot import bot
+    from config import Config
+with startup_profiler.phase("import: database"):
+    from database.engine import engine, init_db
+    from database.fast_lookup import fast_lookup
+    from database.fsm_storage import create_fsm_storage
+    from database.query_stats import instrument_slow_queries
+    from services.init_admin import init_admin_user
+with startup_profiler.phase("import: handlers"):
+    from handlers.common_handlers import router as common_router
+    from handlers.staff_handlers import router as staff_router
+with startup_profiler.phase("import: middlewares, utils"):
+    from middlewares.block_middleware import BlockUserMiddleware
+    from middlewares.user_loader_middleware import UserLoaderMiddleware
+    from middlewares.throttling_middleware import AntiFloodMiddleware
+    from middlewares.metrics_middleware import MetricsMiddleware, HandlerNameMiddleware, ApiCallCounterMiddleware
+    from utils.content import warmup_content
+    from services.order_archive import run_orders_archiver
+    from utils.metrics import instrument_engine, run_metrics_summary, start_metrics_server
+    from logger import setup_logging
 
 
 # Инициализация диспетчера и подключение роутеров
-dp = Dispatcher()
+with startup_profiler.phase("dispatcher, middleware, routers"):
+    dp = Dispatcher(storage=create_fsm_storage())
+
+    # Подключаем middleware
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.update.outer_middleware(UserLoaderMiddleware())
+    # Анти-флуд — до фильтров и проверки блокировки, чтобы лишние нажатия не доходили до БД
+    dp.callback_query.outer_middleware(AntiFloodMiddleware())
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    dp.message.middleware(BlockUserMiddleware())
+    dp.callback_query.middleware(BlockUserMiddleware())
+
+    # Метрики: SQL-запросы и вызовы Bot API в рамках апдейта, журнал медленных запросов
+    instrument_engine(engine.sync_engine)
+    instrument_slow_queries(engine.sync_engine)
+    bot.session.middleware(ApiCallCounterMiddleware())
+
+    # Подключаем роутеры
+    dp.include_router(common_router)
+    dp.include_router(staff_router)
+
+# Ссылки удерживают фоновые задачи до остановки бота
+background_tasks = set()
+
+
+def start_background_task(coro) -> asyncio.Task:
+    """Запускает задачу и удерживает ссылку на неё в background_tasks до завершения."""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def deferred_startup():
+    """
+    Некритичная инициализация после старта polling: прогрев кэшей текстов и мок-данных DTC.
+    """
+    with startup_profiler.phase("warmup: info-тексты, мок DTC"):
+        await warmup_content()
+    startup_profiler.log_summary("Отложенная инициализация завершена")
+
+
+@dp.startup()
+async def on_startup():
+    startup_profiler.log_summary("Бот готов к приёму апдейтов")
+    start_background_task(deferred_startup())
 
-# Подключаем middleware
-dp.message.middleware(BlockUserMiddleware())
-dp.callback_query.middleware(BlockUserMiddleware())
 
-# Подключаем роутеры
-dp.include_router(common_router)
-dp.include_router(staff_router)
+@dp.shutdown()
+async def on_shutdown():
+    # Поток соединения aiosqlite быстрого пути не должен держать процесс после остановки
+    await fast_lookup.close()
 
 
 async def main():
     # Настройка логирования
-    setup_logging()
+    with startup_profiler.phase("setup_logging"):
+        setup_logging()
     logger = logging.getLogger(__name__)
 
     try:
         # Инициализация базы данных
-        await init_db()
-        # Создание администратора при первом запуске
-        await init_admin_user()
-        # Запуск бота
+        with startup_profiler.phase("init_db"):
+            await init_db()
+        # Администратор из ADMIN_ID — до polling: иначе его /start из очереди на новой базе
+        # увидел бы роль None и получил бы приглашение к регистрации (один запрос по PK)
+        with startup_profiler.phase("init_admin_user"):
+            await init_admin_user()
+        # Метрики обработчиков: эндпоинт /metrics и сводка в bot.log
+        if Config.METRICS_PORT:
+            with startup_profiler.phase("metrics server"):
+                await start_metrics_server(Config.METRICS_HOST, int(Config.METRICS_PORT))
+        if Config.METRICS_SUMMARY_INTERVAL_SEC:
+            start_background_task(
+                run_metrics_summary(Config.METRICS_SUMMARY_INTERVAL_SEC, Config.METRICS_SUMMARY_TOP_N)
+            )
+        if Config.ORDERS_ARCHIVE_AFTER_DAYS:
+            start_background_task(run_orders_archiver())
+        # Запуск бота; прогрев кэшей — в deferred_startup после старта
         await dp.start_polling(bot)
     except Exception:
         logger.critical("Критическая ошибка при запуске бота", exc_info=True)
@@ -0,0 +1,50 @@
+import time
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from utils.metrics import UpdateStats, current_update_stats, observe_update
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware апдейтов: замеряет время обработки, число SQL-запросов,
+    время БД и вызовы Bot API, затем пишет их в гистограммы (handler, update_type).
+    Контекст апдейта (update_id, user_id, обработчик) также используется логированием.
+    """
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        stats = UpdateStats(update_id=event.update_id, update_type=event.event_type, user_id=user.id if user else None)
+        token = current_update_stats.set(stats)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            observe_update(stats, time.perf_counter() - started, error)
+            current_update_stats.reset(token)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Внутренняя middleware (message / callback_query): вызывается уже после фильтров,
+    поэтому знает выбранный обработчик и записывает его имя в метрики апдейта.
+    """
+    async def __call__(self, handler, event, data):
+        stats = current_update_stats.get()
+        handler_object = data.get("handler")
+        if stats is not None and handler_object is not None:
+            callback = handler_object.callback
+            module = callback.__module__.rsplit(".", 1)[-1]
+            stats.handler = f"{module}.{callback.__name__}"
+        return await handler(event, data)
+
+
+class ApiCallCounterMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: считает вызовы Bot API, сделанные в рамках апдейта."""
+    async def __call__(self, make_request, bot, method):
+        stats = current_update_stats.get()
+        if stats is not None:
+            stats.api_calls += 1
+        return await make_request(bot, method)
@@ -0,0 +1,120 @@
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from config import Config
+from utils.metrics import current_update_stats
+
+
+class TokenBucket:
+    """Корзина токенов: `capacity` нажатий подряд, далее — `rate` нажатий в секунду."""
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now: float) -> bool:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class AntiFloodMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware callback-запросов: отсекает лишние нажатия до фильтров,
+    проверки блокировки и обращений к БД.
+
+    - Частота: корзина токенов на пару (пользователь, правило); правило выбирается по
+      самому длинному префиксу callback_data из Config.THROTTLE_RULES.
+    - Повторы: нажатие той же кнопки (чат, сообщение, callback_data) для префиксов
+      Config.CALLBACK_DEDUP_PREFIXES отбрасывается, пока первое обрабатывается
+      и ещё Config.CALLBACK_DEDUP_WINDOW_SEC после его завершения.
+
+    Отсечённое нажатие получает лишь call.answer, чтобы у кнопки пропали «часики».
+    Состояние хранится в памяти процесса; в кластере апдейты чата всегда попадают
+    к одному воркеру, поэтому этого достаточно.
+    """
+
+    # Очистка заполненных корзин и истёкших ключей — не чаще, чем раз в столько секунд
+    PURGE_INTERVAL_SEC = 60.0
+
+    def __init__(
+            self,
+            rules: Optional[Dict[str, Tuple[float, float]]] = None,
+            dedup_prefixes: Optional[Sequence[str]] = None,
+            dedup_window_sec: Optional[float] = None,
+    ):
+        rules = Config.THROTTLE_RULES if rules is None else rules
+        # Длинные префиксы проверяются первыми; "" совпадает с любыми данными
+        self._rules = sorted(rules.items(), key=lambda item: len(item[0]), reverse=True)
+        self._dedup_prefixes = tuple(Config.CALLBACK_DEDUP_PREFIXES if dedup_prefixes is None else dedup_prefixes)
+        self._dedup_window = Config.CALLBACK_DEDUP_WINDOW_SEC if dedup_window_sec is None else dedup_window_sec
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        # Ключ нажатия -> момент истечения (inf, пока первое нажатие обрабатывается)
+        self._recent: Dict[Tuple[int, int, str], float] = {}
+        self._next_purge = 0.0
+        self.throttled = 0
+        self.duplicates = 0
+
+    def _rule_for(self, data: str) -> Optional[Tuple[str, Tuple[float, float]]]:
+        for prefix, limits in self._rules:
+            if data.startswith(prefix):
+                return prefix, limits
+        return None
+
+    def _purge(self, now: float) -> None:
+        self._next_purge = now + self.PURGE_INTERVAL_SEC
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_full(now)}
+        self._recent = {key: expires for key, expires in self._recent.items() if expires > now}
+
+    @staticmethod
+    def _mark(reason: str) -> None:
+        stats = current_update_stats.get()
+        if stats is not None:
+            stats.handler = f"antiflood.{reason}"
+
+    async def __call__(self, handler, event: CallbackQuery, data):
+        callback_data = event.data or ""
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._purge(now)
+
+        rule = self._rule_for(callback_data)
+        if rule is not None:
+            prefix, (capacity, rate) = rule
+            bucket_key = (event.from_user.id, prefix)
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = TokenBucket(capacity, rate, now)
+            if not bucket.consume(now):
+                self.throttled += 1
+                self._mark("throttled")
+                await event.answer("⏳ Слишком часто, подождите секунду")
+                return None
+
+        if not event.message or not callback_data.startswith(self._dedup_prefixes):
+            return await handler(event, data)
+
+        tap_key = (event.message.chat.id, event.message.message_id, callback_data)
+        if self._recent.get(tap_key, 0.0) > now:
+            self.duplicates += 1
+            self._mark("duplicate")
+            await event.answer()
+            return None
+
+        self._recent[tap_key] = float("inf")
+        try:
+            return await handler(event, data)
+        finally:
+            self._recent[tap_key] = time.monotonic() + self._dedup_window
@@ -0,0 +1,17 @@
+from aiogram import BaseMiddleware
+from database.loaders import UserLoader, current_user_loader
+from database.requests import get_users_dict_batch, USER_COLUMNS
+
+
+class UserLoaderMiddleware(BaseMiddleware):
+    """
+    Middleware, создающая загрузчик профилей пользователей на время одного апдейта.
+    Все вызовы get_user_dict внутри обработчиков объединяются в пакетные запросы
+    и не повторяются для одного и того же пользователя.
+    """
+    async def __call__(self, handler, event, data):
+        token = current_user_loader.set(UserLoader(get_users_dict_batch, list(USER_COLUMNS)))
+        try:
+            return await handler(event, data)
+        finally:
+            current_user_loader.reset(token)
@@ -0,0 +1,38 @@
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import tempfile
+from contextlib import aclosing
+from datetime import date
+
+from database.requests import stream_export_rows
+
+logger = logging.getLogger(__name__)
+
+
+async def export_csv_gz(kind: str, start: date, end: date) -> tuple[str, int]:
+    """
+    Пишет выгрузку за период во временный файл .csv.gz по мере чтения из базы
+    (в памяти — одна пачка строк). CSV с разделителем «;» и BOM — открывается в Excel.
+    Сжатие и запись пачки выполняются в потоке, чтобы не задерживать обработку апдейтов.
+
+    :return: (путь к файлу, число строк без заголовка). Файл удаляет вызывающий код.
+    """
+    fd, path = tempfile.mkstemp(prefix=f"export_{kind}_", suffix=".csv.gz")
+    os.close(fd)
+    rows = 0
+    try:
+        with gzip.open(path, "wt", encoding="utf-8-sig", newline="", compresslevel=6) as file:
+            writer = csv.writer(file, delimiter=";")
+            async with aclosing(stream_export_rows(kind, start, end)) as chunks:
+                writer.writerow(await anext(chunks))
+                async for chunk in chunks:
+                    await asyncio.to_thread(writer.writerows, chunk)
+                    rows += len(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    logger.info(f"Экспорт {kind} за {start}–{end}: {rows} строк, {os.path.getsize(path)} байт")
+    return path, rows
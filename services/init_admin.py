@@ -2,6 +2,7 @@ import os
 from database.models import User
 from sqlalchemy import select
 from database.engine import async_session
+from database.search import REFRESH_USER_SEARCH_BY_TG_ID
 from config import Config
 
 
@@ -37,5 +38,7 @@ async def init_admin_user():
             brand_auto="-"
         )
         session.add(new_admin)
+        await session.flush()
+        await session.execute(REFRESH_USER_SEARCH_BY_TG_ID, {"tg_id": admin_tg_id})
         await session.commit()
         print(f"Администратор с tg_id={admin_tg_id} успешно создан!")
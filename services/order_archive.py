@@ -0,0 +1,32 @@
+import asyncio
+import logging
+
+from config import Config
+from database.requests import archive_closed_orders
+
+logger = logging.getLogger(__name__)
+
+
+async def archive_orders_once() -> int:
+    """Переносит в архив все подходящие закрытые заказы (пачками, каждая — своя транзакция)."""
+    total = 0
+    while True:
+        moved = await archive_closed_orders(Config.ORDERS_ARCHIVE_AFTER_DAYS, Config.ORDERS_ARCHIVE_BATCH)
+        total += moved
+        if moved < Config.ORDERS_ARCHIVE_BATCH:
+            break
+        # Между пачками отдаём базу обработчикам апдейтов
+        await asyncio.sleep(0.1)
+    if total:
+        logger.info(f"В архив перенесено закрытых заказов: {total}")
+    return total
+
+
+async def run_orders_archiver() -> None:
+    """Фоновая задача: архивация при запуске и далее раз в Config.ORDERS_ARCHIVE_INTERVAL_SEC."""
+    while True:
+        try:
+            await archive_orders_once()
+        except Exception:
+            logger.exception("Ошибка архивации заказов")
+        await asyncio.sleep(Config.ORDERS_ARCHIVE_INTERVAL_SEC)
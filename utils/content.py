@@ -0,0 +1,59 @@
+"""
+Ленивые статические материалы бота: тексты из info/ и картинки из img/.
+
+- Тексты читаются с диска при первом обращении и дальше отдаются из памяти.
+- Картинка загружается в Telegram один раз: после первой отправки запоминается её file_id,
+  и повторные отправки не передают файл заново.
+- `warmup_content` заранее читает тексты и мок-данные DTC в отдельном потоке — вызывается
+  в фоне после старта polling, чтобы не задерживать приём апдейтов.
+"""
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Dict, Union
+
+from aiogram.types import FSInputFile, Message
+
+logger = logging.getLogger(__name__)
+
+INFO_FILES = ("info/price.txt", "info/FAQ.txt")
+
+# Путь к картинке -> file_id, полученный при первой отправке
+_photo_file_ids: Dict[str, str] = {}
+
+
+@lru_cache(maxsize=None)
+def read_info_text(path: str) -> str:
+    """Текст файла из info/ (читается один раз за время работы процесса)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def photo(path: str) -> Union[str, FSInputFile]:
+    """file_id уже загруженной картинки или файл для первой загрузки."""
+    return _photo_file_ids.get(path) or FSInputFile(path)
+
+
+async def answer_photo_cached(message: Message, path: str, **kwargs) -> Message:
+    """message.answer_photo с переиспользованием file_id картинки `path`."""
+    sent = await message.answer_photo(photo=photo(path), **kwargs)
+    if path not in _photo_file_ids and sent.photo:
+        _photo_file_ids[path] = sent.photo[-1].file_id
+    return sent
+
+
+def _warmup_sync() -> None:
+    from api.car_api import get_mock_responses
+
+    for path in INFO_FILES:
+        try:
+            read_info_text(path)
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать {path}: {e}")
+    get_mock_responses()
+
+
+async def warmup_content() -> None:
+    """Прогревает кэши текстов и мок-данных DTC в отдельном потоке."""
+    await asyncio.to_thread(_warmup_sync)
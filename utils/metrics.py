@@ -0,0 +1,250 @@
+"""
+Метрики обработчиков бота: время выполнения, запросы к БД, вызовы Bot API и исключения.
+
+Счётчики текущего апдейта хранятся в `current_update_stats` (ContextVar) и заполняются:
+- SQLAlchemy-событиями курсора (`instrument_engine`) — число запросов и время в БД;
+- middleware сессии бота (`middlewares.metrics_middleware.ApiCallCounterMiddleware`) — вызовы Bot API.
+
+По завершении апдейта значения попадают в гистограммы с метками (handler, update_type).
+Гистограммы отдаются в текстовом формате Prometheus (`render_prometheus`, опциональный
+HTTP-эндпоинт `/metrics`) и периодически сводятся в top-N в bot.log.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "autofix"
+
+# Границы корзин гистограмм
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ==============================
+# СЧЁТЧИКИ ТЕКУЩЕГО АПДЕЙТА
+# ==============================
+class UpdateStats:
+    """Затраты на обработку одного апдейта."""
+    __slots__ = ("update_id", "update_type", "user_id", "handler", "db_queries", "db_time", "api_calls")
+
+    def __init__(self, update_id: Optional[int] = None, update_type: str = "unknown", user_id: Optional[int] = None):
+        self.update_id = update_id
+        self.update_type = update_type
+        self.user_id = user_id
+        self.handler = "unhandled"
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.api_calls = 0
+
+
+current_update_stats: ContextVar[Optional[UpdateStats]] = ContextVar("current_update_stats", default=None)
+
+
+def instrument_engine(sync_engine: Engine) -> None:
+    """Подписывает движок на события курсора, чтобы считать запросы и время БД в UpdateStats."""
+
+    # Начало запроса хранится в контексте выполнения: при ошибке after_cursor_execute не вызывается,
+    # и стек на соединении копил бы лишние отметки, сдвигая время последующих запросов
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_start", None)
+        if started is None:
+            return
+        stats = current_update_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+# ==============================
+# ГИСТОГРАММЫ
+# ==============================
+class Histogram:
+    """Гистограмма Prometheus с произвольными метками (накопление без внешних зависимостей)."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по корзинам (+Inf последней), сумма, количество]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def series(self) -> Dict[Tuple[str, ...], Tuple[float, int]]:
+        """{метки: (сумма, количество)}"""
+        return {labels: (s[1], s[2]) for labels, s in self._series.items()}
+
+    def quantile(self, labels: Tuple[str, ...], q: float) -> float:
+        """Оценка квантиля по верхней границе корзины (как histogram_quantile без интерполяции)."""
+        series = self._series.get(labels)
+        if not series or not series[2]:
+            return 0.0
+        rank = q * series[2]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[0]):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class Counter:
+    """Счётчик Prometheus с метками."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], int] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: int = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: Tuple[str, ...]) -> int:
+        return self._values.get(labels, 0)
+
+    def items(self):
+        return self._values.items()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_LABELS = ("handler", "update_type")
+
+HANDLER_DURATION = Histogram(
+    f"{METRIC_PREFIX}_handler_duration_seconds", "Время обработки апдейта обработчиком", _LABELS, DURATION_BUCKETS
+)
+HANDLER_DB_QUERIES = Histogram(
+    f"{METRIC_PREFIX}_handler_db_queries", "Число SQL-запросов за апдейт", _LABELS, COUNT_BUCKETS
+)
+HANDLER_DB_SECONDS = Histogram(
+    f"{METRIC_PREFIX}_handler_db_seconds", "Время выполнения SQL-запросов за апдейт", _LABELS, DURATION_BUCKETS
+)
+HANDLER_API_CALLS = Histogram(
+    f"{METRIC_PREFIX}_handler_api_calls", "Число вызовов Bot API за апдейт", _LABELS, COUNT_BUCKETS
+)
+HANDLER_EXCEPTIONS = Counter(
+    f"{METRIC_PREFIX}_handler_exceptions_total", "Исключения в обработчиках", _LABELS + ("exception",)
+)
+
+_HISTOGRAMS = (HANDLER_DURATION, HANDLER_DB_QUERIES, HANDLER_DB_SECONDS, HANDLER_API_CALLS)
+
+
+def observe_update(stats: UpdateStats, duration: float, exception: Optional[BaseException] = None) -> None:
+    """Записывает затраты завершённого апдейта в гистограммы."""
+    labels = (stats.handler, stats.update_type)
+    HANDLER_DURATION.observe(labels, duration)
+    HANDLER_DB_QUERIES.observe(labels, stats.db_queries)
+    HANDLER_DB_SECONDS.observe(labels, stats.db_time)
+    HANDLER_API_CALLS.observe(labels, stats.api_calls)
+    if exception is not None:
+        HANDLER_EXCEPTIONS.inc(labels + (type(exception).__name__,))
+
+
+def render_prometheus() -> str:
+    """Все метрики в текстовом формате Prometheus (exposition format 0.0.4)."""
+    lines = []
+    for metric in _HISTOGRAMS + (HANDLER_EXCEPTIONS,):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==============================
+# СВОДКА В ЛОГ
+# ==============================
+def top_handlers_summary(top_n: int) -> str:
+    """Текстовая сводка top-N обработчиков по суммарному времени."""
+    durations = HANDLER_DURATION.series()
+    if not durations:
+        return "Метрики обработчиков: апдейтов ещё не было."
+
+    db_queries = HANDLER_DB_QUERIES.series()
+    db_seconds = HANDLER_DB_SECONDS.series()
+    api_calls = HANDLER_API_CALLS.series()
+    errors: Dict[Tuple[str, ...], int] = {}
+    for labels, value in HANDLER_EXCEPTIONS.items():
+        errors[labels[:2]] = errors.get(labels[:2], 0) + value
+
+    top = sorted(durations.items(), key=lambda item: item[1][0], reverse=True)[:top_n]
+    lines = [f"Top-{len(top)} обработчиков по суммарному времени:"]
+    for labels, (total, count) in top:
+        lines.append(
+            f"  {labels[0]} [{labels[1]}]: n={count}, всего={total:.2f}с, "
+            f"ср={total / count * 1000:.1f}мс, p95≤{HANDLER_DURATION.quantile(labels, 0.95) * 1000:.0f}мс, "
+            f"SQL/апдейт={db_queries[labels][0] / count:.1f} ({db_seconds[labels][0] / count * 1000:.1f}мс), "
+            f"API/апдейт={api_calls[labels][0] / count:.1f}, ошибок={errors.get(labels, 0)}"
+        )
+    return "\n".join(lines)
+
+
+async def run_metrics_summary(interval_sec: int, top_n: int) -> None:
+    """Фоновая задача: раз в `interval_sec` пишет сводку top-N обработчиков в bot.log."""
+    while True:
+        await asyncio.sleep(interval_sec)
+        logger.info(top_handlers_summary(top_n))
+
+
+# ==============================
+# HTTP-ЭНДПОИНТ /metrics
+# ==============================
+async def start_metrics_server(host: str, port: int):
+    """
+    Запускает локальный HTTP-сервер с эндпоинтом /metrics.
+    Возвращает aiohttp AppRunner (для остановки через `await runner.cleanup()`).
+    """
+    from aiohttp import web
+
+    async def metrics_view(request):
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_view)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
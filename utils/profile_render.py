@@ -1,8 +1,25 @@
-from database.requests import get_user_dict
+from database.requests import get_user_dict, get_master_rating
 from keybords import keybords as kb
 from aiogram.types import InlineKeyboardMarkup
 
 
+def format_master_rating(rating: dict, with_last: bool = False) -> str:
+    """Средняя оценка мастера для вывода: «4.6 (12 оценок)», с with_last — и последние оценки."""
+    count = rating["count"]
+    if not count:
+        return "нет оценок"
+    if count % 10 == 1 and count % 100 != 11:
+        noun = "оценка"
+    elif 2 <= count % 10 <= 4 and not 12 <= count % 100 <= 14:
+        noun = "оценки"
+    else:
+        noun = "оценок"
+    text = f"{rating['avg']:g} ({count} {noun})"
+    if with_last and rating["last"]:
+        text += f", последние: {' '.join(map(str, rating['last']))}"
+    return text
+
+
 async def render_master_profile(tg_id: int) -> tuple[str, InlineKeyboardMarkup]:
     """Возвращает (текст, клавиатура) для профиля мастера."""
     user_data = await get_user_dict(
@@ -19,13 +36,15 @@ async def render_master_profile(tg_id: int) -> tuple[str, InlineKeyboardMarkup]:
     can_msg = "✅ ВКЛ" if user_data.get("can_messages") else "❌ ВЫКЛ"
     role = user_data["role"]
     reg_date = user_data.get("date", "—")
+    grades = await get_master_rating(tg_id)
 
     text = (
         f"👨‍🔧 <b>Профиль мастера</b>\n\n"
         f"🔹 Имя: {name}\n"
         f"🔸 Должность: {status}\n"
         f"📞 Сот.тел: {contact}\n"
-        f"⭐️ Рейтинг: {rating}\n"
+        f"⭐️ Оценки клиентов: {format_master_rating(grades, with_last=True)}\n"
+        f"🏅 Рейтинг: {rating}\n"
         f"📩 Уведомления: {can_msg}\n"
         f"🔖 Роль: {role}\n"
         f"📅 Регистрация: {reg_date}"
@@ -0,0 +1,46 @@
+"""
+Профилирование запуска бота по фазам.
+
+Фазы (импорты модулей, init_db, регистрация middleware и т.д.) замеряются контекстным
+менеджером `startup_profiler.phase(name)`. Логирование на момент импортов ещё не настроено,
+поэтому длительности накапливаются и пишутся в bot.log одной сводкой — когда бот готов
+принимать апдейты (`log_summary`) и после фоновой отложенной инициализации.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Длительности фаз запуска относительно момента создания профайлера (≈ старт процесса)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def elapsed(self) -> float:
+        """Секунды с момента старта процесса."""
+        return time.perf_counter() - self.started
+
+    def log_summary(self, title: str) -> None:
+        """Пишет в лог накопленные фазы и очищает их (следующая сводка — только новые фазы)."""
+        lines = [f"{title}: {self.elapsed() * 1000:.0f} мс от старта процесса"]
+        for name, duration in self.phases:
+            lines.append(f"  {name:<32} {duration * 1000:8.1f} мс")
+        self.phases.clear()
+        logger.info("\n".join(lines))
+
+
+startup_profiler = StartupProfiler()
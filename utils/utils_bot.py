@@ -37,3 +37,29 @@ async def message_deleter(
                 f"Неожиданная ошибка при удалении {msg_id} в чате {chat_id}: {e}",
                 exc_info=True
             )
+
+
+def parse_uid_list(text: str, limit: int = None) -> List[int]:
+    """
+    Разбирает список UID из сообщения администратора: числа и диапазоны через запятую или пробел.
+    Пример: "12, 15-20 31" -> [12, 15, 16, 17, 18, 19, 20, 31]. Повторы убираются, порядок сохраняется.
+
+    :param text: Текст сообщения.
+    :param limit: Максимум UID (по умолчанию Config.BULK_USERS_MAX).
+    :raises ValueError: Некорректный фрагмент, пустой список или превышение лимита (сообщение — для пользователя).
+    """
+    actual_limit = limit if limit is not None else Config.BULK_USERS_MAX
+    uids = {}
+    for part in text.replace(",", " ").replace(";", " ").split():
+        start, sep, end = part.partition("-")
+        if not start.isdigit() or (sep and not end.isdigit()):
+            raise ValueError(f"Некорректный фрагмент «{part}»")
+        first, last = int(start), int(end) if sep else int(start)
+        if first <= 0 or last < first:
+            raise ValueError(f"Некорректный диапазон «{part}»")
+        if len(uids) + (last - first + 1) > actual_limit:
+            raise ValueError(f"Слишком много UID: не больше {actual_limit} за раз")
+        uids.update(dict.fromkeys(range(first, last + 1)))
+    if not uids:
+        raise ValueError("Список UID пуст")
+    return list(uids)